@@ -0,0 +1,129 @@
+'''
+run a measurement worker in its own process, the GUI process only draws
+
+the TimeDepWorker QThread shares the GIL with the Qt event loop, a long canvas.draw()
+can delay a reading or a Vg edge. AcquisitionProcess has the interface of the worker
+the windows use (new_config / status_update / sequence_finished signals, samples,
+start(), stop(), isRunning()) but runs the real worker in a child process:
+    samples   -> LabAuto.sample_ring.SampleRing in multiprocessing.shared_memory
+    events    -> pipe child -> GUI (new_config, status, finished), re-emitted as signals
+    commands  -> pipe GUI -> child ("stop")
+the child builds its own instruments with factory(*args) (sockets and VISA sessions
+can not be sent to another process), runs worker.run() in its main thread and shuts the
+hardware down as usual; the GUI process waits for it on exit.
+
+    worker = AcquisitionProcess(make_worker, (RESOURCE_ID, LASER_IP, config_queue))
+    window = TimeDepWindow(worker)
+'''
+import atexit
+import multiprocessing
+import os
+import threading
+
+from PyQt5.QtCore import QThread, pyqtSignal
+
+from LabAuto.sample_ring import SampleRing
+from LabAuto.supervisor import get_psutil
+
+SAMPLE_COLUMNS = ("config_idx", "t", "Vd", "Vg", "Id", "Ig")
+
+
+def raise_priority():
+    """Acquisition before drawing when the PC is busy (needs psutil, best effort)."""
+    psutil = get_psutil()
+    if psutil is None:
+        return
+    try:
+        proc = psutil.Process()
+        if os.name == "nt":
+            proc.nice(psutil.HIGH_PRIORITY_CLASS)
+        else:
+            proc.nice(-5)
+    except (psutil.Error, OSError):
+        pass
+
+
+def acquisition_main(factory, args, ring_spec, events, commands):
+    """Child process: build the worker, publish its signals and samples, obey "stop"."""
+    raise_priority()
+    ring = SampleRing.attach(ring_spec)
+    try:
+        worker = factory(*args)
+    except Exception as e:
+        events.send(("status", f"CRITICAL ERROR: {e}"))
+        events.send(("finished",))
+        ring.close()
+        return
+
+    worker.samples = ring
+    # no Qt event loop here: the signals call these directly in the emitting thread
+    worker.new_config.connect(lambda config_idx, label: events.send(("new_config", config_idx, label)))
+    worker.status_update.connect(lambda text: events.send(("status", text)))
+    worker.sequence_finished.connect(lambda: events.send(("finished",)))
+
+    def listen():
+        while True:
+            try:
+                command = commands.recv()
+            except (EOFError, OSError):
+                command = ("stop",) # GUI gone: stop and leave the hardware safe
+            if command[0] == "stop":
+                worker.running = False
+                return
+
+    threading.Thread(target=listen, name="acquisition-commands", daemon=True).start()
+    worker.run()
+    ring.close()
+
+
+class AcquisitionProcess(QThread):
+    """
+    factory: picklable callable (module level function) returning the worker, called in the child
+    args: arguments of factory (picklable)
+    capacity: rows of the shared sample ring
+    """
+    new_config = pyqtSignal(int, str)
+    status_update = pyqtSignal(str)
+    sequence_finished = pyqtSignal()
+
+    def __init__(self, factory, args=(), columns=SAMPLE_COLUMNS, capacity=1 << 18):
+        super().__init__()
+        self.samples = SampleRing.create_shared(columns, capacity)
+        atexit.register(self.samples.close, True)
+        ctx = multiprocessing.get_context("spawn") # same start method on Windows and elsewhere
+        self.events, child_events = ctx.Pipe(duplex=False)
+        child_commands, self.commands = ctx.Pipe(duplex=False)
+        # not a daemon: on exit the GUI waits until the child has shut the hardware down
+        self.process = ctx.Process(target=acquisition_main, name="acquisition",
+                                   args=(factory, args, self.samples.spec(), child_events, child_commands))
+        self.child_ends = (child_events, child_commands)
+
+    def run(self):
+        """Start the child and forward its events as signals until it finishes."""
+        self.process.start()
+        # only the child holds these now, recv() sees EOF if it dies
+        for conn in self.child_ends:
+            conn.close()
+        try:
+            while True:
+                try:
+                    kind, *payload = self.events.recv()
+                except (EOFError, OSError):
+                    self.status_update.emit("Acquisition process ended unexpectedly.")
+                    break
+                if kind == "new_config":
+                    self.new_config.emit(*payload)
+                elif kind == "status":
+                    self.status_update.emit(*payload)
+                elif kind == "finished":
+                    break
+        finally:
+            self.process.join(timeout=30)
+            self.sequence_finished.emit()
+
+    def stop(self):
+        try:
+            self.commands.send(("stop",))
+        except (OSError, ValueError):
+            pass
+        self.wait()
@@ -0,0 +1,135 @@
+'''
+AOTF actuator backends used by the laser server (laser_control.py)
+
+- GUIBackend: drives the "AOTF Controller" window with pyautogui (Windows, the real laser).
+- SimulatedBackend: in-process fake with configurable latency, runs on any machine
+  (benchmarks, testing the server and the calibration routines without the laser PC).
+
+every backend has the same 4 operations:
+    init(force=False)               prepare the controller (called when a client connects),
+                                    force: full re-initialization even if a cached one is valid
+    set_wavelength(channel, value)  value: nm
+    set_power(channel, value)       value: pp (%)
+    set_on(channel, on)             on: bool
+the laser server keeps the channel state (AOTFState) and only calls a backend
+when a value really changes, so set_on() is only called to switch ON<->OFF.
+'''
+import random
+import threading
+import time
+
+
+class AOTFBackend:
+    """Interface of an AOTF actuator."""
+    name = "base"
+    n_channels = 8
+
+    def init(self, force=False):
+        pass
+
+    def set_wavelength(self, channel, value):
+        raise NotImplementedError
+
+    def set_power(self, channel, value):
+        raise NotImplementedError
+
+    def set_on(self, channel, on):
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class GUIBackend(AOTFBackend):
+    """
+    Real laser: clicks the "AOTF Controller" window (LabAuto.laser).
+    pyautogui / pygetwindow are only imported when this backend is created.
+    """
+    name = "gui"
+
+    def __init__(self):
+        from LabAuto import laser
+        self.laser = laser
+        self.grid = None
+
+    def init(self, force=False):
+        # reuses the saved grid if the AOTF window did not move (instant reconnect)
+        self.grid = self.laser.init_AOTF_cached(force=force)
+        self.n_channels = len(self.grid)
+
+    def set_wavelength(self, channel, value):
+        self.laser.change_lambda_function(self.grid, int(channel), str(value))
+
+    def set_power(self, channel, value):
+        self.laser.change_power_function(self.grid, int(channel), str(value))
+
+    def set_on(self, channel, on):
+        # the ON button is a toggle, the server only calls this when the state changes
+        self.laser.press_on_button(self.grid, int(channel))
+
+
+class SimulatedBackend(AOTFBackend):
+    """
+    Fake AOTF for headless machines.
+
+    latency: dict of seconds per operation, e.g. {"wavelength": 0.5, "power": 0.5, "on": 0.1}
+             (missing keys use DEFAULT_LATENCY). Use {} with zeros for benchmarks of the server itself.
+    jitter: relative random spread of each latency (0.1 = +-10 %).
+    max_power_nw: optical power at pp = 100 % for every wavelength (nW), used by optical_power().
+    """
+    name = "sim"
+    DEFAULT_LATENCY = {"init": 0.0, "wavelength": 0.5, "power": 0.5, "on": 0.1}
+
+    def __init__(self, n_channels=8, latency=None, jitter=0.0, max_power_nw=500.0, seed=None):
+        self.n_channels = n_channels
+        self.latency = dict(self.DEFAULT_LATENCY)
+        if latency:
+            self.latency.update(latency)
+        self.jitter = jitter
+        self.max_power_nw = max_power_nw
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.channels = {ch: {"wavelength": None, "power": 0.0, "on": False} for ch in range(n_channels)}
+        self.history = [] # (time.time(), operation, channel, value)
+
+    def _act(self, operation, channel=None, value=None):
+        delay = self.latency.get(operation, 0.0)
+        if delay > 0:
+            if self.jitter:
+                delay *= 1 + self.rng.uniform(-self.jitter, self.jitter)
+            time.sleep(delay)
+        with self.lock:
+            self.history.append((time.time(), operation, channel, value))
+
+    def init(self, force=False):
+        self._act("init")
+
+    def set_wavelength(self, channel, value):
+        self._act("wavelength", channel, value)
+        with self.lock:
+            self.channels[int(channel)]["wavelength"] = float(value)
+
+    def set_power(self, channel, value):
+        self._act("power", channel, value)
+        with self.lock:
+            self.channels[int(channel)]["power"] = float(value)
+
+    def set_on(self, channel, on):
+        self._act("on", channel, bool(on))
+        with self.lock:
+            self.channels[int(channel)]["on"] = bool(on)
+
+    def optical_power(self, wavelength=None):
+        """
+        Simulated optical power (W) reaching the sample: sum of all channels that are ON
+        (only channels at this wavelength, if given). Linear in pp, like the real AOTF at low power.
+        """
+        total_nw = 0.0
+        with self.lock:
+            for ch in self.channels.values():
+                if not ch["on"]:
+                    continue
+                if wavelength is not None and ch["wavelength"] is not None and round(ch["wavelength"]) != round(float(wavelength)):
+                    continue
+                total_nw += self.max_power_nw * ch["power"] / 100.0
+        return total_nw * 1e-9
@@ -0,0 +1,111 @@
+'''
+progress of a time-dependent run, so a crashed run can continue instead of starting over
+
+<data csv stem>_checkpoint.json next to the data file:
+    completed_steps   steps of the sequence fully measured and written
+    csv_bytes         size of the csv when they were written (rows of a half-measured
+                      step after that are cut off when resuming)
+    n_steps / total   the sequence it belongs to (a resume with a changed config is refused)
+    segments          every (re)start: first step, time in the sequence, wall clock
+    finished          the whole sequence was measured
+SequenceExecutor.run(..., checkpoint=) updates it after every step, from the csv writer
+thread once the rows of the step are on disk. the file is replaced atomically.
+
+resuming (time_dep_*.py --resume):
+    checkpoint = Checkpoint.load(filename)
+    checkpoint.check(sequence)              # same sequence?
+    checkpoint.truncate_csv()               # drop the unfinished step
+    actuator.restore(sequence[:checkpoint.completed_steps])
+    executor.run(timeline.start_from(checkpoint.completed_steps), ..., start_step=..., checkpoint=checkpoint)
+'''
+import datetime
+import json
+import os
+from pathlib import Path
+
+
+def checkpoint_path(csv_path):
+    csv_path = Path(csv_path)
+    return csv_path.with_name(csv_path.stem + "_checkpoint.json")
+
+
+class Checkpoint:
+    def __init__(self, csv_path, state):
+        self.csv_path = Path(csv_path)
+        self.path = checkpoint_path(csv_path)
+        self.state = state
+
+    @classmethod
+    def new(cls, csv_path, config_file, sequence):
+        state = {
+            "config_file": str(config_file),
+            "n_steps": len(sequence),
+            "total": sum(float(step["duration"]) for step in sequence),
+            "completed_steps": 0,
+            "csv_bytes": 0,
+            "segments": [],
+            "finished": False,
+        }
+        return cls(csv_path, state)
+
+    @classmethod
+    def load(cls, csv_path):
+        """The checkpoint of a data file, None if there is none."""
+        path = checkpoint_path(csv_path)
+        if not path.exists():
+            return None
+        with open(path) as f:
+            return cls(csv_path, json.load(f))
+
+    @property
+    def completed_steps(self):
+        return self.state["completed_steps"]
+
+    @property
+    def finished(self):
+        return self.state["finished"]
+
+    @property
+    def segment(self):
+        """Number of the current segment (1 = first run)."""
+        return len(self.state["segments"])
+
+    def check(self, sequence):
+        """Raise ValueError if the sequence is not the one of the checkpoint (config changed)."""
+        total = sum(float(step["duration"]) for step in sequence)
+        if len(sequence) != self.state["n_steps"] or abs(total - self.state["total"]) > 1e-6:
+            raise ValueError(f"{self.path.name}: the sequence changed since the interrupted run "
+                             f"({len(sequence)} steps / {total} s, was {self.state['n_steps']} / {self.state['total']} s)")
+
+    def truncate_csv(self):
+        """Cut the csv back to the last completed step (rows of the interrupted step, half lines)."""
+        if self.state["csv_bytes"] is None: # written by a plain csv.writer, position unknown
+            return
+        with open(self.csv_path, "r+b") as f:
+            f.truncate(self.state["csv_bytes"])
+
+    def begin_segment(self, start_step, t_start):
+        self.state["segments"].append({
+            "start_step": start_step,
+            "t_start": t_start,
+            "started_at": datetime.datetime.now().isoformat(timespec="seconds"),
+        })
+        self.save()
+
+    def step_done(self, completed_steps, csv_bytes):
+        """completed_steps steps are written, the csv has csv_bytes (called by the csv writer thread)."""
+        self.state["completed_steps"] = completed_steps
+        self.state["csv_bytes"] = csv_bytes
+        self.save()
+
+    def finish(self):
+        self.state["finished"] = True
+        self.save()
+
+    def save(self):
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp, "w") as f:
+            json.dump(self.state, f, indent=4)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
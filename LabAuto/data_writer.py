@@ -0,0 +1,167 @@
+'''
+csv writer that keeps the disk out of the measurement loop
+
+csv.writer(f).writerow() inside the step loop formats and writes every reading on the
+acquisition thread, a slow disk (or the antivirus scanning the data folder) stalls the
+measurement itself. BackgroundCSVWriter has the same writerow() / writerows() interface,
+it only appends the row to a queue (collections.deque, append / popleft need no lock);
+a background thread formats the rows, writes them and every flush_interval seconds
+flushes and fsyncs the file, so a crash loses at most about flush_interval of data.
+
+    with BackgroundCSVWriter(filename) as writer:
+        writer.writerow(["Time", "I_D"])
+        writer.writerow([t, I_D])          # returns immediately
+        writer.writerows(block)            # list of rows or a 2D numpy array
+        writer.after_rows(callback)        # callback(file position) once the rows above are on disk
+    print(writer.stats())                  # queue depth, rows, write / fsync latency
+'''
+import csv
+import os
+import threading
+import time
+from collections import deque
+
+from LabAuto.telemetry import spread
+
+# kinds of queue entries
+ROW, ROWS, CALL = "row", "rows", "call"
+
+
+class BackgroundCSVWriter:
+    """
+    path: csv file (overwritten, as open(path, 'w'))
+    flush_interval: seconds between flush + fsync of the file
+    fsync: False only flushes to the OS (faster, lost on a power cut)
+    append: add to an existing file (resumed run) instead of overwriting it
+    """
+    def __init__(self, path, flush_interval=1.0, fsync=True, append=False):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.fsync = fsync
+        self.queue = deque()
+        self.wakeup = threading.Event()
+        self.closed = False
+        self.error = None
+        # stats
+        self.rows_in = 0
+        self.rows_written = 0
+        self.max_depth = 0
+        self.write_times = deque(maxlen=1000) # seconds per written batch
+        self.fsync_times = deque(maxlen=1000)
+
+        self.f = open(path, 'a' if append else 'w', newline='')
+        self.writer = csv.writer(self.f)
+        self.thread = threading.Thread(target=self._run, name=f"csv-writer {os.path.basename(str(path))}", daemon=True)
+        self.thread.start()
+
+    # --- acquisition side ---
+    def writerow(self, row):
+        self._put(ROW, row, 1)
+
+    def writerows(self, rows):
+        """rows: list of rows or a 2D numpy array (one entry in the queue)."""
+        self._put(ROWS, rows, len(rows))
+
+    def after_rows(self, callback):
+        """
+        callback(position) on the writer thread once everything queued before is written
+        and flushed (fsynced if fsync), position: file size in bytes at that point.
+        """
+        self._put(CALL, callback, 0)
+
+    def _put(self, kind, item, n):
+        if self.error is not None:
+            raise RuntimeError(f"csv writer for {self.path} failed") from self.error
+        if self.closed:
+            raise ValueError("write to a closed BackgroundCSVWriter")
+        self.queue.append((kind, item))
+        self.rows_in += n
+        depth = len(self.queue)
+        if depth > self.max_depth:
+            self.max_depth = depth
+        if depth == 1:
+            self.wakeup.set()
+
+    # --- background thread ---
+    def _run(self):
+        last_sync = time.perf_counter()
+        try:
+            while True:
+                self.wakeup.wait(self.flush_interval)
+                self.wakeup.clear()
+                self._drain()
+                now = time.perf_counter()
+                if self.closed or now - last_sync >= self.flush_interval:
+                    self._sync()
+                    last_sync = now
+                if self.closed and not self.queue:
+                    break
+        except Exception as e:
+            self.error = e
+            print(f"csv writer for {self.path} failed: {e}")
+        finally:
+            self.f.close()
+
+    def _drain(self):
+        queue = self.queue
+        writer = self.writer
+        while queue:
+            start = time.perf_counter()
+            n = 0
+            # write what is queued now, the next batch is timed separately
+            for _ in range(len(queue)):
+                kind, item = queue.popleft()
+                if kind == ROW:
+                    writer.writerow(item)
+                    n += 1
+                elif kind == ROWS:
+                    rows = item.tolist() if hasattr(item, "tolist") else item
+                    writer.writerows(rows)
+                    n += len(rows)
+                else:
+                    self._sync()
+                    item(self.f.tell())
+            self.rows_written += n
+            self.write_times.append(time.perf_counter() - start)
+
+    def _sync(self):
+        start = time.perf_counter()
+        self.f.flush()
+        if self.fsync:
+            os.fsync(self.f.fileno())
+        self.fsync_times.append(time.perf_counter() - start)
+
+    # --- lifecycle ---
+    def close(self, timeout=None):
+        """Write everything still queued, fsync and close the file."""
+        if not self.closed:
+            self.closed = True
+            self.wakeup.set()
+        self.thread.join(timeout)
+        if self.error is not None:
+            raise RuntimeError(f"csv writer for {self.path} failed") from self.error
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def stats(self):
+        return {
+            "rows_in": self.rows_in,
+            "rows_written": self.rows_written,
+            "queue_depth": len(self.queue),
+            "max_queue_depth": self.max_depth,
+            "write_latency": spread(list(self.write_times)),
+            "fsync_latency": spread(list(self.fsync_times)),
+        }
+
+    def print_stats(self):
+        s = self.stats()
+        line = f"CSV writer: {s['rows_written']} rows, max queue {s['max_queue_depth']}"
+        if s["write_latency"]:
+            line += f", write p99 {s['write_latency']['p99']*1000:.2f} / max {s['write_latency']['max']*1000:.2f} ms"
+        if s["fsync_latency"]:
+            line += f", fsync max {s['fsync_latency']['max']*1000:.1f} ms"
+        print(line)
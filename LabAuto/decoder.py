@@ -0,0 +1,515 @@
+'''
+decoding of optical-encoder runs (time_dep_servo_encode_app.py): recovered bits, bit error
+rate, eye statistics and the effective bit rate
+
+the receiver follows the line_code of the config (LabAuto.line_codes):
+"rz" (default), every bit is a symbol of 4 x bit_duration (T) (LabAuto.sequences.encode_binary_block):
+    0 .. T     Vg on, shutter closed          reference window
+    T .. 2T    Vg on, shutter open for a '1'  light window
+    2T .. 3T   Vg on, shutter closed
+    3T .. 4T   Vg off (return to zero)
+  the matched filter of a bit is mean(I_D in the light window) - mean(I_D in the reference window).
+"nrz", "manchester", "pam4", "pam8", every slot of T has one light level (LabAuto.sequences.line_code_block):
+  the statistic of a slot is mean(I_D in the slot) - mean(I_D in the dark reference before the
+  first slot), the line code decides the symbols from the statistics of their slots. the
+  training symbols (every light level once) before the data count as preamble.
+the slot / symbol starts come from the timeline of the sequence, the samples from the data csv
+(Time is seconds since the sequence start), and every window mean of a run is computed at once
+from a cumulative sum of I_D.
+the light reaches the device later than its step starts (shutter latency, photoresponse):
+the first preamble_bits bits of binary_string (config key, default 8 = the first ASCII
+character) are known to the receiver. the windows are shifted by the delay in 0 .. T that
+matches the preamble best, and the decision threshold / light levels are trained on it.
+the BER is counted on the bits after the preamble.
+
+    python -m LabAuto.decoder data/encoded_10-10_1.csv            # finished run
+    python -m LabAuto.decoder data/encoded_10-10_1.csv --follow   # while it is measured
+    python -m LabAuto.decoder data/encoded_10-10_1.csv --follow --idle-timeout 120
+    python -m LabAuto.decoder data/encoded_10-10_1.csv --plot     # eye diagram
+
+writes <csv stem>_decoded.json next to the data file.
+'''
+import argparse
+import io
+import json
+import time
+from pathlib import Path
+
+import numpy as np
+
+from LabAuto.checkpoint import Checkpoint
+from LabAuto.line_codes import get_line_code
+from LabAuto.live_plot import GrowableArray
+from LabAuto.sequences import encode_sequence
+from LabAuto.timeline import Timeline
+
+SETUP_STEPS = 2 # laser configure, laser on (shutter closed)
+REFERENCE_GUARD = 0.2 # part of the reference window skipped after the Vg switch (transient)
+DEFAULT_PREAMBLE_BITS = 8
+N_LAGS = 41
+N_PHASE = 100
+IDLE_TIMEOUT = 30.0 # s without new samples after which follow() gives up (run stopped / crashed)
+
+
+def window_means(t, y, lo, hi):
+    """mean of y over lo <= t < hi for arrays of windows (any shape), nan for empty ones."""
+    cumsum = np.concatenate(([0.0], np.cumsum(y)))
+    i_lo = np.searchsorted(t, lo, side="left")
+    i_hi = np.searchsorted(t, hi, side="left")
+    n = i_hi - i_lo
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.where(n > 0, (cumsum[i_hi] - cumsum[i_lo]) / n, np.nan)
+
+
+def best_lag(stats, levels, lags):
+    """(lag, polarity +-1) of the (n windows, n lags) statistics that match the known levels best."""
+    levels = np.asarray(levels, dtype=float)
+    if np.ptp(levels) > 0: # correlation with the known levels
+        x = levels - levels.mean()
+        centered = stats - np.nanmean(stats, axis=0)
+        score = np.nansum(x[:, None] * centered, axis=0) / (np.sqrt(np.nansum(centered ** 2, axis=0) * np.sum(x ** 2)) + 1e-300)
+        best = int(np.nanargmax(np.abs(score)))
+    else: # only light windows known: largest mean over its spread
+        mean = np.nanmean(stats, axis=0)
+        score = mean / np.maximum(np.nanstd(stats, axis=0), 1e-9 * np.nanmax(np.abs(mean)) + 1e-300)
+        best = int(np.nanargmax(np.abs(score)))
+    return float(lags[best]), (1 if score[best] >= 0 else -1)
+
+
+def two_means(values, iterations=20):
+    """threshold between the two clusters of values (1-d k-means)."""
+    values = values[np.isfinite(values)]
+    if len(values) == 0:
+        return 0.0
+    threshold = (values.min() + values.max()) / 2
+    for _ in range(iterations):
+        high, low = values[values > threshold], values[values <= threshold]
+        if not len(high) or not len(low):
+            break
+        threshold = (high.mean() + low.mean()) / 2
+    return float(threshold)
+
+
+def binary_entropy(p):
+    if p <= 0 or p >= 1:
+        return 0.0
+    return float(-p * np.log2(p) - (1 - p) * np.log2(1 - p))
+
+
+def bits_to_text(bits):
+    """8-bit ASCII of the recovered bits ('' if not a whole number of bytes)."""
+    if len(bits) == 0 or len(bits) % 8:
+        return ""
+    codes = np.packbits(np.asarray(bits, dtype=np.uint8))
+    return "".join(chr(c) if 32 <= c < 127 else "?" for c in codes)
+
+
+class ReturnToZeroReceiver:
+    """line_code "rz": one statistic per bit, light window minus its own reference window."""
+    name = "rz"
+    bits_per_symbol = 1
+
+    def __init__(self, params):
+        self.T = float(params.get("bit_duration", 1.0))
+        self.bits = np.array([int(b) for b in str(params.get("binary_string", "1010")) if b in "01"], dtype=int)
+        self.symbols = self.bits
+        self.labels = self.bits[:, None] # known level of every statistic
+        offsets = np.asarray(Timeline(encode_sequence(params, None)).offsets)
+        # a '1' is 3 steps + rest, a '0' one step + rest
+        step_index = SETUP_STEPS + np.concatenate(([0], np.cumsum(np.where(self.bits == 1, 4, 2))[:-1])).astype(int)
+        self.starts = offsets[step_index] if len(self.bits) else np.empty(0)
+        self.period = 4 * self.T
+        self.preamble = min(int(params.get("preamble_bits", DEFAULT_PREAMBLE_BITS)), len(self.bits))
+        self.preamble_bits = self.preamble
+
+    @property
+    def n_symbols(self):
+        return len(self.symbols)
+
+    @property
+    def trainable(self):
+        return bool(self.bits[:self.preamble].any())
+
+    def ends(self, lag):
+        """time after which every symbol can be decided."""
+        return self.starts + 2 * self.T + lag
+
+    def _reference(self, t, y, starts):
+        return window_means(t, y, starts + REFERENCE_GUARD * self.T, starts + self.T)
+
+    def statistics(self, t, y, first, last, lag):
+        """(n symbols, 1) statistics of symbols first .. last - 1."""
+        starts = self.starts[first:last]
+        light = window_means(t, y, starts + self.T + lag, starts + 2 * self.T + lag)
+        return (light - self._reference(t, y, starts))[:, None]
+
+    def align(self, t, y):
+        if not self.trainable:
+            return 0.0, 1
+        lags = np.linspace(0.0, self.T, N_LAGS)
+        starts = self.starts[:self.preamble, None]
+        light = window_means(t, y, starts + self.T + lags[None, :], starts + 2 * self.T + lags[None, :])
+        return best_lag(light - self._reference(t, y, starts), self.bits[:self.preamble], lags)
+
+    def train(self, stats):
+        """threshold from the preamble (stats polarity corrected), two-means of all stats without a '1'."""
+        stats = np.asarray(stats, dtype=float)[:, 0]
+        known = self.bits[:min(self.preamble, len(stats))]
+        ones, zeros = stats[:len(known)][known == 1], stats[:len(known)][known == 0]
+        if not len(ones):
+            return two_means(stats)
+        zero_level = np.nanmean(zeros) if len(zeros) else 0.0 # reference corrected: no light -> ~0
+        return float((np.nanmean(ones) + zero_level) / 2)
+
+    def decide(self, stats, model):
+        return (np.asarray(stats)[:, 0] > model).astype(int)
+
+    def symbol_bits(self, symbols):
+        return np.asarray(symbols, dtype=int)
+
+    def transmission_time(self, m):
+        """from the first symbol to the end of symbol m - 1."""
+        return self.starts[m - 1] + self.period - self.starts[0] if m else 0.0
+
+    def fold(self, lag):
+        """(fold starts, known level per fold, reference window per fold, period, sampling window) of the eye."""
+        return self.starts, self.bits, (self.starts + REFERENCE_GUARD * self.T, self.starts + self.T), \
+            self.period, (self.T + lag, 2 * self.T + lag)
+
+
+class SlotReceiver:
+    """line codes of LabAuto.line_codes: one statistic per slot, minus the dark reference of the run."""
+    def __init__(self, params, code):
+        self.code = code
+        self.name = code.name
+        self.bits_per_symbol = code.bits_per_symbol
+        self.T = float(params.get("bit_duration", 1.0))
+        self.bits = np.array([int(b) for b in str(params.get("binary_string", "1010")) if b in "01"], dtype=int)
+        # the training symbols, then the data
+        training = code.training_symbols()
+        self.first_data = len(training)
+        self.symbols = np.concatenate((training, code.symbols(self.bits)))
+        self.labels = code.slot_levels(self.symbols) # (n symbols, slots per symbol)
+        offsets = np.asarray(Timeline(encode_sequence(params, None)).offsets)
+        self.slots = offsets[SETUP_STEPS:SETUP_STEPS + self.labels.size]
+        self.starts = self.slots[::code.slots_per_symbol]
+        self.period = code.slots_per_symbol * self.T
+        # second half of the dark reference at vg_on, before the first slot
+        self.reference = ((offsets[1] + offsets[2]) / 2, offsets[2])
+        preamble_bits = min(int(params.get("preamble_bits", DEFAULT_PREAMBLE_BITS)), len(self.bits))
+        self.preamble = self.first_data + min(-(-preamble_bits // self.bits_per_symbol), len(self.symbols) - self.first_data)
+        self.preamble_bits = min((self.preamble - self.first_data) * self.bits_per_symbol, len(self.bits))
+
+    @property
+    def n_symbols(self):
+        return len(self.symbols)
+
+    @property
+    def trainable(self):
+        return bool(self.labels[:self.preamble].any())
+
+    def ends(self, lag):
+        return self.starts + self.period + lag
+
+    def _baseline(self, t, y):
+        return window_means(t, y, *self.reference)
+
+    def statistics(self, t, y, first, last, lag):
+        """(n symbols, slots per symbol) statistics of symbols first .. last - 1."""
+        k = self.code.slots_per_symbol
+        slots = self.slots[first * k:last * k]
+        stats = window_means(t, y, slots + lag, slots + self.T + lag) - self._baseline(t, y)
+        return stats.reshape(-1, k)
+
+    def align(self, t, y):
+        if not self.trainable:
+            raise ValueError("the preamble has no light slot, use more preamble_bits")
+        lags = np.linspace(0.0, self.T, N_LAGS)
+        slots = self.slots[:self.preamble * self.code.slots_per_symbol, None]
+        stats = window_means(t, y, slots + lags[None, :], slots + self.T + lags[None, :]) - self._baseline(t, y)
+        return best_lag(stats, self.labels[:self.preamble].ravel(), lags)
+
+    def train(self, stats):
+        return self.code.train(np.asarray(stats)[:self.preamble], self.symbols[:self.preamble])
+
+    def decide(self, stats, model):
+        return self.code.decide(stats, model)
+
+    def symbol_bits(self, symbols):
+        """bits of the data symbols (the training symbols dropped)."""
+        return self.code.symbol_bits(np.asarray(symbols)[self.first_data:])
+
+    def transmission_time(self, m):
+        """from the first data symbol to the end of symbol m - 1."""
+        return self.starts[m - 1] + self.period - self.starts[self.first_data] if m > self.first_data else 0.0
+
+    def fold(self, lag):
+        # two slots wide, so the transitions into the next slot show
+        return self.slots, self.labels.ravel(), self.reference, 2 * self.T, (lag, self.T + lag)
+
+
+def make_receiver(params):
+    if not any(b in "01" for b in str(params.get("binary_string", "1010"))):
+        raise ValueError("binary_string has no bits to decode")
+    code = get_line_code(params)
+    return ReturnToZeroReceiver(params) if code is None else SlotReceiver(params, code)
+
+
+def eye_traces(t, y, receiver, lag, polarity, n_phase=N_PHASE):
+    """phase grid (s), (n folds, n_phase) reference-corrected traces and their known levels."""
+    starts, labels, (lo, hi), period, _ = receiver.fold(lag)
+    phase = np.linspace(0.0, period, n_phase, endpoint=False)
+    traces = np.interp(starts[:, None] + phase[None, :], t, y) - np.atleast_1d(window_means(t, y, lo, hi))[:, None]
+    return phase, polarity * traces, labels
+
+
+def eye_statistics(stats, labels, traces=None, trace_labels=None, phase=None, window=None):
+    """per known level the spread of its statistics, the eye height / Q between neighbouring levels
+    and the widest opening of the traces inside the sampling window."""
+    stats, labels = np.asarray(stats, dtype=float).ravel(), np.asarray(labels).ravel()[:np.size(stats)]
+    finite = np.isfinite(stats)
+    stats, labels = stats[finite], labels[finite]
+    levels = np.unique(labels)
+    eye = {"levels": [{"level": int(level), "mean": float(stats[labels == level].mean()),
+                       "std": float(stats[labels == level].std())} for level in levels]}
+    if len(levels) < 2:
+        return eye
+    heights, q = [], []
+    for low, high in zip(levels[:-1], levels[1:]):
+        a, b = stats[labels == low], stats[labels == high]
+        heights.append(b.min() - a.max())
+        spread = a.std() + b.std()
+        q.append((b.mean() - a.mean()) / spread if spread > 0 else float("inf"))
+    eye.update({"height": float(min(heights)), "q_factor": float(min(q))})
+    if traces is not None:
+        trace_levels = np.unique(trace_labels)
+        opening = np.min([traces[trace_labels == high].min(axis=0) - traces[trace_labels == low].max(axis=0)
+                          for low, high in zip(trace_levels[:-1], trace_levels[1:])], axis=0)
+        inside = (phase >= window[0]) & (phase < window[1])
+        if inside.any():
+            best = np.flatnonzero(inside)[np.argmax(opening[inside])]
+            eye.update({"best_phase": float(phase[best]), "opening": float(opening[best])})
+    return eye
+
+
+def decode(t, y, params):
+    """every bit of the run at once: recovered bits, BER, eye statistics and bit rate."""
+    receiver = make_receiver(params)
+    t, y = np.asarray(t, dtype=float), np.asarray(y, dtype=float)
+    lag, polarity = receiver.align(t, y)
+    stats = polarity * receiver.statistics(t, y, 0, receiver.n_symbols, lag)
+    model = receiver.train(stats)
+    symbols = receiver.decide(stats, model)
+    phase, traces, trace_labels = eye_traces(t, y, receiver, lag, polarity)
+    eye = eye_statistics(stats, receiver.labels, traces, trace_labels, phase, receiver.fold(lag)[4])
+    return summarize(receiver, symbols, stats, lag, polarity, model, eye)
+
+
+def summarize(receiver, symbols, stats, lag, polarity, model, eye):
+    recovered = receiver.symbol_bits(symbols)[:len(receiver.bits)]
+    bits, n = receiver.bits, len(recovered)
+    payload = slice(receiver.preamble_bits, n) if n > receiver.preamble_bits else slice(0, n)
+    errors = int(np.sum(recovered[payload] != bits[:n][payload]))
+    n_payload = len(recovered[payload])
+    ber = errors / n_payload if n_payload else float("nan")
+    duration = receiver.transmission_time(len(symbols))
+    raw_rate = n / duration if duration > 0 else 0.0
+    return {
+        "line_code": receiver.name,
+        "bits": "".join(str(b) for b in recovered),
+        "text": bits_to_text(recovered),
+        "sent": "".join(str(b) for b in bits[:n]),
+        "n_bits": n,
+        "preamble_bits": receiver.preamble_bits,
+        "errors": errors,
+        "ber": ber,
+        "lag": lag,
+        "polarity": polarity,
+        "model": None if model is None else np.asarray(model).tolist(),
+        "statistics": np.asarray(stats).tolist(),
+        "eye": eye,
+        "bits_per_second": raw_rate,
+        "effective_bits_per_second": raw_rate * (1 - binary_entropy(ber)) if n_payload else 0.0,
+    }
+
+
+class StreamingDecoder:
+    """
+    decodes the bits while the run is measured: feed() the new samples as they arrive, it
+    returns the bits of the symbols whose windows have passed. the lag and the decision model
+    are fixed once the preamble is complete (needs light in the preamble).
+    """
+    def __init__(self, params):
+        self.receiver = make_receiver(params)
+        if not self.receiver.trainable:
+            raise ValueError("streaming decoding needs light in the preamble bits")
+        self.samples = GrowableArray(2)
+        self.lag = None
+        self.polarity = 1
+        self.model = None
+        self.stats = np.empty((0, self.receiver.labels.shape[1]))
+        self.symbols = np.empty(0, dtype=int)
+
+    @property
+    def recovered(self):
+        return self.receiver.symbol_bits(self.symbols)[:len(self.receiver.bits)]
+
+    def feed(self, t, y):
+        self.samples.extend(np.column_stack((t, y)))
+        if not len(self.samples):
+            return []
+        t, y = self.samples.column(0), self.samples.column(1)
+        receiver = self.receiver
+        if self.lag is None:
+            # the whole preamble is measured, for any lag
+            if t[-1] < receiver.ends(receiver.T)[receiver.preamble - 1]:
+                return []
+            self.lag, self.polarity = receiver.align(t, y)
+        ready = int(np.searchsorted(receiver.ends(self.lag), t[-1], side="right"))
+        first = len(self.symbols)
+        if ready <= first:
+            return []
+        before = len(self.recovered)
+        stats = self.polarity * receiver.statistics(t, y, first, ready, self.lag)
+        self.stats = np.concatenate((self.stats, stats))
+        if self.model is None:
+            self.model = receiver.train(self.stats)
+        self.symbols = np.concatenate((self.symbols, receiver.decide(stats, self.model)))
+        return [int(b) for b in self.recovered[before:]]
+
+    @property
+    def done(self):
+        return len(self.symbols) == self.receiver.n_symbols
+
+    def result(self):
+        receiver = self.receiver
+        eye = eye_statistics(self.stats, receiver.labels[:len(self.stats)])
+        return summarize(receiver, self.symbols, self.stats, self.lag, self.polarity, self.model, eye)
+
+
+def config_path(csv_path):
+    csv_path = Path(csv_path)
+    return csv_path.with_name(csv_path.stem + "_config.json")
+
+
+def read_columns(csv_path, columns=("Time", "I_D")):
+    with open(csv_path, "r") as f:
+        header = f.readline().strip().split(",")
+    data = np.loadtxt(csv_path, delimiter=",", skiprows=1, ndmin=2)
+    return tuple(data[:, header.index(c)] for c in columns)
+
+
+def follow(csv_path, params, poll=0.5, idle_timeout=IDLE_TIMEOUT):
+    """
+    decode csv_path while it is written (the csv writer flushes about every second).
+    stops when the checkpoint says the run finished, or when the csv has not grown for
+    idle_timeout seconds (run stopped or crashed): the result then covers the bits received so far.
+    """
+    decoder = StreamingDecoder(params)
+    n_bits = len(decoder.receiver.bits)
+    last_growth = time.monotonic()
+
+    def idle():
+        if time.monotonic() - last_growth < idle_timeout:
+            return False
+        print(f"no new samples for {idle_timeout:g} s, decoding what was measured", flush=True)
+        return True
+
+    while not Path(csv_path).exists():
+        if idle():
+            return decoder.result()
+        time.sleep(poll)
+    with open(csv_path, "r") as f:
+        header = ""
+        while not header.endswith("\n"):
+            line = f.readline()
+            header += line
+            if line:
+                last_growth = time.monotonic()
+            elif idle():
+                return decoder.result()
+            if not header.endswith("\n"):
+                time.sleep(poll)
+        header = header.strip().split(",")
+        i_t, i_y = header.index("Time"), header.index("I_D")
+        partial = ""
+        while not decoder.done:
+            chunk = f.read()
+            if not chunk:
+                checkpoint = Checkpoint.load(csv_path)
+                if (checkpoint is not None and checkpoint.finished) or idle():
+                    break
+                time.sleep(poll)
+                continue
+            last_growth = time.monotonic()
+            lines, _, partial = (partial + chunk).rpartition("\n")
+            if not lines:
+                continue
+            block = np.loadtxt(io.StringIO(lines), delimiter=",", ndmin=2)
+            if decoder.feed(block[:, i_t], block[:, i_y]):
+                recovered = decoder.recovered
+                print(f"[{len(recovered)}/{n_bits}] {''.join(str(b) for b in recovered)}", flush=True)
+    return decoder.result()
+
+
+def print_result(result):
+    print(f"Recovered: {result['bits']}" + (f"  ({result['text']!r})" if result["text"] else ""))
+    print(f"Sent:      {result['sent']}")
+    print(f"BER: {result['errors']}/{max(result['n_bits'] - result['preamble_bits'], 0)} = {result['ber']:.3g} "
+          f"(after the {result['preamble_bits']} preamble bits, line code {result['line_code']})")
+    model = result["model"]
+    decision = "" if model is None else f", decision {np.array2string(np.asarray(model), precision=3)}"
+    if result["lag"] is None:
+        print("Preamble not received, nothing decoded")
+    else:
+        print(f"Light delay {result['lag']:.3f} s, polarity {result['polarity']:+d}{decision}")
+    eye = result["eye"]
+    if "height" in eye:
+        print(f"Eye: height {eye['height']:.4g}, Q {eye['q_factor']:.2f}"
+              + (f", opening {eye['opening']:.4g} at {eye['best_phase']:.2f} s" if "opening" in eye else ""))
+    print(f"{result['bits_per_second']:.3f} bits/s, effective {result['effective_bits_per_second']:.3f} bits/s")
+
+
+def plot_eye(t, y, params, result):
+    import matplotlib.pyplot as plt
+    receiver = make_receiver(params)
+    phase, traces, labels = eye_traces(t, y, receiver, result["lag"], result["polarity"])
+    colors = plt.get_cmap("viridis")(np.linspace(0, 0.9, max(int(labels.max()) + 1, 2)))
+    fig, ax = plt.subplots()
+    for trace, level in zip(traces, labels):
+        ax.plot(phase, trace, color=colors[level], alpha=0.3, lw=0.8)
+    ax.axvspan(*receiver.fold(result["lag"])[4], color="gold", alpha=0.15)
+    ax.set_xlabel("time in symbol (s)")
+    ax.set_ylabel("I_D - reference (A)")
+    ax.set_title(f"eye diagram, {result['line_code']} (color: sent light level)")
+    plt.show()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="decode an optical-encoder run: bits, BER, eye statistics")
+    parser.add_argument("csv", help="data csv of the run (encoded_<device>_<run>.csv)")
+    parser.add_argument("--config", help="config of the run (default: <csv stem>_config.json)")
+    parser.add_argument("--follow", action="store_true", help="decode while the run is measured")
+    parser.add_argument("--idle-timeout", type=float, default=IDLE_TIMEOUT,
+                        help="--follow: stop after this many seconds without new samples (s)")
+    parser.add_argument("--plot", action="store_true", help="show the eye diagram")
+    args = parser.parse_args()
+
+    with open(args.config or config_path(args.csv), "r") as f:
+        params = json.load(f)
+    if args.follow:
+        result = follow(args.csv, params, idle_timeout=args.idle_timeout)
+    else:
+        t, y = read_columns(args.csv)
+        result = decode(t, y, params)
+    print_result(result)
+
+    csv_path = Path(args.csv)
+    with open(csv_path.with_name(csv_path.stem + "_decoded.json"), "w") as f:
+        json.dump(result, f, indent=4)
+    if args.plot and result["lag"] is not None:
+        plot_eye(*read_columns(args.csv), params, result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+'''
+simulated phototransistor: the I_D a measurement sequence would record, without Keithley, laser or device
+
+used by benchmarks/line_codes.py to compare the line codes of the optical encoder. the model:
+    dark current   dark_on at the highest Vg of the sequence (vg_on), dark_off below, plus a
+                   slow linear drift
+    light          the laser state of the steps: laser_cmd1 power (the "power" of the step is
+                   taken as nW, build the sequence with LabAuto.queue_scheduler.NominalPowers()),
+                   laser_cmd2 on / off, laser_cmd3 toggles the shutter; every command takes
+                   effect after its latency (AOTF power / on latency of
+                   LabAuto.aotf_backend.SimulatedBackend, shutter_latency)
+    photocurrent   responsivity * P(nW) ** alpha, reached with a first order response,
+                   tau_rise when it grows and tau_fall when it decays (traps: slow decay)
+    readings       every reading_time (nplc of both channels + overhead, as LabAuto.planner
+                   estimates it), gaussian noise
+exact between the light changes, so a run of thousands of slots takes milliseconds.
+
+    device = SimulatedDevice(tau_rise=0.05, tau_fall=0.2, noise=2e-9, seed=1)
+    t, i_d = device.measure(sequence, interval=0.04)
+'''
+import numpy as np
+
+from LabAuto.aotf_backend import SimulatedBackend
+from LabAuto.planner import LINE_FREQUENCY, READ_OVERHEAD
+
+
+def reading_time(nplc_a=1.0, nplc_b=1.0):
+    """seconds per reading of both channels (no history, see LabAuto.planner.History.reading_time)."""
+    return (nplc_a + nplc_b) / LINE_FREQUENCY + READ_OVERHEAD
+
+
+class SimulatedDevice:
+    def __init__(self, dark_on=1e-6, dark_off=1e-9, drift=1e-11, responsivity=2e-9, alpha=0.8,
+                 tau_rise=0.05, tau_fall=0.2, noise=2e-9, shutter_latency=0.1,
+                 power_latency=SimulatedBackend.DEFAULT_LATENCY["power"],
+                 on_latency=SimulatedBackend.DEFAULT_LATENCY["on"], seed=None):
+        self.dark_on = dark_on
+        self.dark_off = dark_off
+        self.drift = drift # A/s
+        self.responsivity = responsivity # A / nW**alpha
+        self.alpha = alpha
+        self.tau_rise = tau_rise
+        self.tau_fall = tau_fall
+        self.noise = noise
+        self.shutter_latency = shutter_latency
+        self.power_latency = power_latency
+        self.on_latency = on_latency
+        self.rng = np.random.default_rng(seed)
+
+    def light_events(self, sequence):
+        """[(time, optical power nW)] whenever the light reaching the device changes."""
+        changes = [] # (time, kind, value)
+        t = 0.0
+        for step in sequence:
+            laser_cmd1, laser_cmd2 = step.get("laser_cmd1"), step.get("laser_cmd2")
+            if laser_cmd1 and laser_cmd1.get("power") is not None:
+                changes.append((t + self.power_latency, "power", float(laser_cmd1["power"])))
+            if laser_cmd2:
+                changes.append((t + self.on_latency, "on", bool(laser_cmd2["set_on"])))
+            if step.get("laser_cmd3"):
+                changes.append((t + self.shutter_latency, "shutter", None))
+            t += float(step["duration"])
+        state = {"power": 0.0, "on": False, "shutter": False}
+        events = [(0.0, 0.0)]
+        for time_, kind, value in sorted(changes, key=lambda change: change[0]):
+            state[kind] = (not state["shutter"]) if kind == "shutter" else value
+            events.append((time_, state["power"] if state["on"] and state["shutter"] else 0.0))
+        return events
+
+    def photocurrent(self, sequence, t):
+        """photocurrent at the times t (sorted)."""
+        events = self.light_events(sequence)
+        times = np.array([e[0] for e in events] + [np.inf])
+        targets = self.responsivity * np.array([e[1] for e in events]) ** self.alpha
+        bounds = np.searchsorted(t, times)
+        current = np.zeros_like(t)
+        level = 0.0 # photocurrent at the start of the segment
+        for k in range(len(events)):
+            inside = slice(bounds[k], bounds[k + 1])
+            tau = self.tau_rise if targets[k] > level else self.tau_fall
+            current[inside] = targets[k] + (level - targets[k]) * np.exp(-(t[inside] - times[k]) / tau)
+            if np.isfinite(times[k + 1]):
+                level = targets[k] + (level - targets[k]) * np.exp(-(times[k + 1] - times[k]) / tau)
+        return current
+
+    def measure(self, sequence, interval=None):
+        """(t, I_D) of the whole sequence, one reading every interval (default: reading_time() at NPLC 1)."""
+        offsets = np.concatenate(([0.0], np.cumsum([float(step["duration"]) for step in sequence])))
+        t = np.arange(0.0, offsets[-1], interval or reading_time())
+        vg = np.array([float(step["Vg"]) for step in sequence])[np.searchsorted(offsets, t, side="right") - 1]
+        dark = np.where(vg >= vg.max(), self.dark_on, self.dark_off) + self.drift * t
+        i_d = dark + self.photocurrent(sequence, t) + self.noise * self.rng.standard_normal(len(t))
+        return t, i_d
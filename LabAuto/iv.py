@@ -4,8 +4,10 @@ import pyperclip
 import re
 import time
 from LabAuto.network import Connection
-from PIL import ImageGrab
-from LabAuto.check_state import wait_for_cursor_idle
+from pathlib import Path
+from LabAuto.check_state import wait_for_cursor_idle, is_cursor_loading
+from LabAuto.wait import wait_until, grab_region, region_around, wait_for_region_change, record_wait
+from LabAuto.pixel_watch import PixelWatcher, DEFAULT_POLL_INTERVAL
 
 SCROLL_POSITION = [1700, 500]
 SETTINGS_BOTTON = [360, 160]
@@ -41,11 +43,28 @@ FILE_NAME_BOTTON = [760, 660]
 EXPORT_SELECTED_RUN_BOTTON = [890, 890]
 
 
-def get_window(pattern):
+# what the KickStart GUI is showing, kept by the flows below to skip steps that are already done
+# ("view": "settings" / "graph" / None = unknown). Reset it after touching KickStart by hand.
+GUI_STATE = {"view": None}
+
+SETTINGS_REGION = region_around(SCROLL_POSITION, half_size=100) # redrawn when the settings page opens / scrolls
+SCROLL_STEP = -500 # as the old blind scrolls, the loop below stops at the bottom anyway
+MAX_SCROLLS = 15
+SCROLL_SETTLE = 0.3 # s, a scroll that redraws nothing within this is taken as "at the bottom"
+
+def reset_gui_state():
+    GUI_STATE["view"] = None
+
+def find_window_pattern(pattern):
     windows = gw.getAllWindows()  # get all windows
     matched_windows = [w for w in windows if re.search(pattern, w.title, re.IGNORECASE)]
+    if matched_windows:
+        return matched_windows[0]
+    return None
+
+def get_window(pattern):
+    win = find_window_pattern(pattern)
     try:
-        win = matched_windows[0]
         win.moveTo(0, 0)
         win.activate()
         return True
@@ -53,20 +72,41 @@ def get_window(pattern):
         print('window closed')
         return False
 
+def wait_for_window_pattern(pattern, timeout=30, poll_interval=0.1):
+    """Wait until a window title matches pattern, then move it to (0, 0) and activate it. Returns True/False."""
+    if not wait_until(lambda: find_window_pattern(pattern), timeout, poll_interval, label=f"window open: {pattern}"):
+        return False
+    return get_window(pattern)
+
+def cursor_idle(timeout=30):
+    """wait_for_cursor_idle with a fast poll (the busy cursor usually clears within ~100 ms)."""
+    return bool(wait_until(lambda: not is_cursor_loading(), timeout, poll_interval=0.05, label="cursor idle"))
+
 def move_and_click(coord):
     pyautogui.moveTo(*coord)
     time.sleep(0.5)
     pyautogui.click(*coord)
 
+def click(coord):
+    # no hover delay, for the flows that wait on the GUI state instead
+    pyautogui.click(*coord)
+
 def move_and_double_click(coord):
     pyautogui.moveTo(*coord)
     time.sleep(1)
     pyautogui.doubleClick(*coord)
 
-def scroll_to_bottom():
-    move_and_click(SCROLL_POSITION)
-    for i in range(15):
-        pyautogui.scroll(-500)
+def scroll_to_bottom(max_scrolls=MAX_SCROLLS):
+    """Scroll the settings page until it stops moving (instead of 15 blind scrolls)."""
+    click(SCROLL_POSITION)
+    start = time.perf_counter()
+    for i in range(max_scrolls):
+        before = grab_region(SETTINGS_REGION)
+        pyautogui.scroll(SCROLL_STEP)
+        # not recorded: the last check always ends without a change, that is the expected answer
+        if not wait_for_region_change(SETTINGS_REGION, reference=before, timeout=SCROLL_SETTLE, record=False):
+            break # nothing moved: already at the bottom
+    record_wait("scroll to bottom", time.perf_counter() - start, True)
 
 def fill_box_ctrl_a(content):
     pyperclip.copy(content)
@@ -80,6 +120,54 @@ def fill_box_no_ctrl_a(content):
     pyautogui.hotkey("ctrl", "v")
     pyautogui.press('enter')
 
+def read_box():
+    """Text of the focused edit box (copied through the clipboard), None if nothing was copied."""
+    sentinel = "__empty__"
+    pyperclip.copy(sentinel)
+    pyautogui.hotkey('ctrl', 'a')
+    pyautogui.hotkey('ctrl', 'c')
+    text = wait_until(lambda: pyperclip.paste() != sentinel and pyperclip.paste(), timeout=0.5, poll_interval=0.02, label="read box")
+    return text or None
+
+def same_value(text, value):
+    if text is None:
+        return False
+    try:
+        return float(text) == float(value)
+    except ValueError:
+        return text.strip() == str(value).strip()
+
+def open_settings():
+    """Show the settings page, unless it is already shown."""
+    if GUI_STATE["view"] == "settings":
+        scroll_to_bottom()
+        return
+    before = grab_region(SETTINGS_REGION)
+    click(SETTINGS_BOTTON)
+    wait_for_region_change(SETTINGS_REGION, reference=before, timeout=2)
+    cursor_idle()
+    GUI_STATE["view"] = "settings"
+    scroll_to_bottom()
+
+def set_box(coord, value):
+    """
+    Type value into the edit box at coord, unless it already shows this value.
+    Returns True if it was typed.
+    """
+    click(coord)
+    if same_value(read_box(), value):
+        pyautogui.press('enter')
+        print(f"value {value} already set, skipped")
+        return False
+    fill_box_ctrl_a(value)
+    cursor_idle()
+    return True
+
+def set_panel_value(panel, coord, value):
+    click(panel)
+    cursor_idle()
+    set_box(coord, value)
+    scroll_to_bottom()
 
 def change_vg_range(low, high):
     '''
@@ -87,24 +175,9 @@ def change_vg_range(low, high):
     low: vg start (str)
     high: vg end (str)
     '''
-    move_and_click(SETTINGS_BOTTON)
-    time.sleep(2)
-    scroll_to_bottom()
-
-    move_and_click(GATE_PANEL)
-    wait_for_cursor_idle()
-    move_and_click(GATE_START)
-    fill_box_ctrl_a(low)
-    wait_for_cursor_idle()
-    scroll_to_bottom()
-    time.sleep(1)
-
-    move_and_click(GATE_PANEL)
-    wait_for_cursor_idle()
-    move_and_click(GATE_STOP)
-    fill_box_ctrl_a(high)
-    wait_for_cursor_idle()
-    scroll_to_bottom()
+    open_settings()
+    set_panel_value(GATE_PANEL, GATE_START, low)
+    set_panel_value(GATE_PANEL, GATE_STOP, high)
 
 
 def change_vd_range(low, high):
@@ -113,126 +186,126 @@ def change_vd_range(low, high):
     low: vd start (str)
     high: vd end (str)
     '''
-    move_and_click(SETTINGS_BOTTON)
-    time.sleep(2)
-    scroll_to_bottom()
-
-    move_and_click(DRAIN_PANEL)
-    wait_for_cursor_idle()
-    move_and_click(DRAIN_START)
-    fill_box_ctrl_a(low)
-    wait_for_cursor_idle()
-    scroll_to_bottom()
-    time.sleep(1)
-
-    move_and_click(DRAIN_PANEL)
-    wait_for_cursor_idle()
-    move_and_click(DRAIN_STOP)
-    fill_box_ctrl_a(high)
-    wait_for_cursor_idle()
-    scroll_to_bottom()
+    open_settings()
+    set_panel_value(DRAIN_PANEL, DRAIN_START, low)
+    set_panel_value(DRAIN_PANEL, DRAIN_STOP, high)
 
 def change_idvd_vg_level(voltage): # change vg value for idvd
     '''
     voltage: voltage value (str)
     '''
-    move_and_click(SETTINGS_BOTTON)
-    time.sleep(2)
+    open_settings()
+    click(GATE_PANEL)
+    cursor_idle()
     scroll_to_bottom()
-    move_and_click(GATE_PANEL)
-    scroll_to_bottom()
-    move_and_click(DRIAN_VG_VALUE)
-
-    fill_box_ctrl_a(voltage)
-    wait_for_cursor_idle()
+    set_box(DRIAN_VG_VALUE, voltage)
     scroll_to_bottom()
 
 def change_idvg_vd_level(voltage): # change vd value for idvg
     '''
     voltage: voltage value (str)
     '''
-    move_and_click(SETTINGS_BOTTON)
-    time.sleep(2)
+    open_settings()
+    click(DRAIN_PANEL)
+    cursor_idle()
     scroll_to_bottom()
-    move_and_click(DRAIN_PANEL)
+    set_box(GATE_VD_VALUE, voltage)
     scroll_to_bottom()
-    move_and_click(GATE_VD_VALUE)
 
-    fill_box_ctrl_a(voltage)
-    wait_for_cursor_idle()
-    scroll_to_bottom()
-
-def watch_pixel(x=RUN_BOTTON[0], y=RUN_BOTTON[1], tol=10):
+def watch_pixel(x=RUN_BOTTON[0], y=RUN_BOTTON[1], tol=10, poll_interval=DEFAULT_POLL_INTERVAL, debounce=2, timeout=None, points=None):
     """
-    Monitors the color of a pixel at (x,y).
+    Monitors the color of a pixel at (x,y) (only a small region is grabbed, not the screen).
     Prints when the color changes beyond the tolerance.
     
     x, y : pixel coordinates
     tol  : tolerance (0 = exact match)
+    poll_interval : seconds between two checks
+    debounce : consecutive samples that must show the change
+    timeout : seconds, None = block until the color changes
+    points : list of (x, y) to watch instead of (x, y), the first one that changes is reported
+    Returns the PixelChange (None on timeout).
     """
-    prev_color = None
-
-    while True:
-        screenshot = ImageGrab.grab()
-        color = screenshot.getpixel((x, y))  # (R, G, B)
+    watcher = PixelWatcher(points or [(x, y)], tol=tol, poll_interval=poll_interval, debounce=debounce)
+    change = watcher.wait_for_change(timeout=timeout)
+    if change is not None:
+        print(f"Color changed at {change.point}! {change.old_color} -> {change.new_color} "
+              f"(detected within {change.latency_bound*1000:.0f} ms)")
+    return change
 
-        if prev_color is not None:
-            # Compare with tolerance
-            if any(abs(c1 - c2) > tol for c1, c2 in zip(color, prev_color)):
-                print(f"Color changed! {prev_color} -> {color}")
-                break
-
-        prev_color = color
-        time.sleep(0.5)  # adjust speed as needed
 def click_RUN():
     move_and_double_click(RUN_BOTTON)
     wait_for_cursor_idle()
     time.sleep(1)
     move_and_double_click(GRAPH_BOTTON)
+    GUI_STATE["view"] = "graph"
 
 def run_measurement(): # will detect color change, block if not change
     click_RUN()
     time.sleep(1)
-    watch_pixel()
+    return watch_pixel()
 
 def click_STOP():
     move_and_double_click(STOP_BOTTON)
     time.sleep(3)
 
+EXPORT_FOLDER_TITLE = r'選擇'
+OPEN_FILE_TITLE = r'Open File'
+
 def export_data(folder_path, file_name):
-    move_and_click(EXPORT_BOTTON)
-    wait_for_cursor_idle()
-    move_and_click(PATH_BOTTON)
-    wait_for_cursor_idle()
-    while not get_window(r'選擇'):
-        time.sleep(1)
-    move_and_click(EIDT_PATH_POSITION)
-    fill_box_ctrl_a(folder_path)
-    move_and_click(SELECT_FOLDER_BOTTON)
-    wait_for_cursor_idle()
-    move_and_click(FILE_NAME_BOTTON)
+    click(EXPORT_BOTTON)
+    cursor_idle()
+    click(PATH_BOTTON)
+    cursor_idle()
+    if not wait_for_window_pattern(EXPORT_FOLDER_TITLE):
+        raise RuntimeError("export folder dialog did not open")
+    click(EIDT_PATH_POSITION)
+    fill_box_ctrl_a(str(folder_path))
+    click(SELECT_FOLDER_BOTTON)
+    wait_until(lambda: find_window_pattern(EXPORT_FOLDER_TITLE) is None, timeout=10, label="window closed: export folder")
+    cursor_idle()
+    click(FILE_NAME_BOTTON)
     fill_box_ctrl_a(file_name)
-    move_and_click(EXPORT_SELECTED_RUN_BOTTON)
+    click(EXPORT_SELECTED_RUN_BOTTON)
     print(f'STEP: export data to {folder_path}/{file_name}')
-    wait_for_cursor_idle()
+    cursor_idle()
     
 CHANGE_MEAS_MODE_BOTTON = [415, 65]
 SAVE_PROJ_BOTTON = [890, 580]
 PROJECT_FOLDER_BOTTON = [898, 66]
 KICK_START_FILE_BOTTON = [654, 143]
 
+def current_measurement_mode():
+    """Mode shown in the KickStart title ("KickStart - IDVG" -> "IDVG"), None if unknown."""
+    win = find_window_pattern(r'KickStart - ')
+    if win is None:
+        return None
+    return win.title.split(' - ', 1)[1].strip()
+
+def mode_loaded(mode):
+    current = current_measurement_mode()
+    return current is not None and re.match(rf'{re.escape(mode)}\b', current, re.IGNORECASE) is not None
+
 def change_measurement_mode(meas_mode_path):
-    move_and_click(CHANGE_MEAS_MODE_BOTTON)
-    time.sleep(5)
-    move_and_click(SAVE_PROJ_BOTTON) # save project window, won't show every time
-    while not get_window(r'Open File'):
-        time.sleep(1)
-    time.sleep(1)
-    move_and_click(PROJECT_FOLDER_BOTTON)
+    mode = Path(meas_mode_path).name
+    if mode_loaded(mode):
+        print(f"measurement mode {mode} already loaded, skipped")
+        return
+    click(CHANGE_MEAS_MODE_BOTTON)
+    # the "save project" question only shows up if the project changed
+    if not wait_until(lambda: find_window_pattern(OPEN_FILE_TITLE), timeout=5, poll_interval=0.1, label="window open: Open File"):
+        click(SAVE_PROJ_BOTTON)
+    if not wait_for_window_pattern(OPEN_FILE_TITLE):
+        raise RuntimeError("'Open File' dialog did not open")
+    click(PROJECT_FOLDER_BOTTON)
+    file_list = region_around(KICK_START_FILE_BOTTON, half_size=50)
+    before = grab_region(file_list)
     fill_box_ctrl_a(meas_mode_path)
-    time.sleep(1)
+    wait_for_region_change(file_list, reference=before, timeout=1)
     move_and_double_click(KICK_START_FILE_BOTTON)
-    time.sleep(5)
+    wait_until(lambda: find_window_pattern(OPEN_FILE_TITLE) is None, timeout=10, label="window closed: Open File")
+    wait_until(lambda: mode_loaded(mode), timeout=30, poll_interval=0.1, label="KickStart mode loaded")
+    cursor_idle()
+    reset_gui_state()
     
 
 def filename_generator(material, device_number, measurement_type, condition):
@@ -2,13 +2,33 @@ import numpy as np
 import pygetwindow as gw
 import pyperclip
 import pyautogui
-import time
+import json
+from pathlib import Path
+from LabAuto.profiler import PROFILER
+from LabAuto.wait import (wait_until, wait_for_window, wait_for_window_closed, wait_for_focus,
+                          wait_for_region_change, grab_region, region_around, print_wait_stats)
+
+AOTF_TITLE = "AOTF Controller"
+GRID_CACHE_PATH = Path("calibration") / "aotf_grid.json"
+
+def build_grid():
+    x = np.array([190, 270, 320])
+    y = np.linspace(193, 430, 8)
+
+    fields = ["lambda", "power", "on"]
+
+    grid = {i: {} for i in range(len(y))}
+
+    for i, row_y in enumerate(y):
+        for j, col_x in enumerate(x):
+            grid[i][fields[j]] = (float(col_x), float(row_y))
+    return grid
 
 def init_AOTF():
 
     while True:
         try:
-            win = gw.getWindowsWithTitle("AOTF Controller")
+            win = gw.getWindowsWithTitle(AOTF_TITLE)
             win = win[0]
             win.restore()
             win.moveTo(0, 0)
@@ -17,51 +37,79 @@ def init_AOTF():
         except gw.PyGetWindowException:
             pyautogui.click(win.left, win.top)
     
-    pyautogui.moveTo(200, 500)
-    time.sleep(1)
     pyautogui.click(200, 500)
-    time.sleep(1)
-
-    x = np.array([190, 270, 320])
-    y = np.linspace(193, 430, 8)
-
-    fields = ["lambda", "power", "on"]
-
-    grid = {i: {} for i in range(len(y))}
+    wait_for_focus(AOTF_TITLE)
+
+    return build_grid()
+
+def get_window_geometry(title=AOTF_TITLE):
+    """[left, top, width, height] of the window, None if it doesn't exist or is minimized."""
+    win_list = gw.getWindowsWithTitle(title)
+    if len(win_list) == 0 or win_list[0].isMinimized:
+        return None
+    win = win_list[0]
+    return [win.left, win.top, win.width, win.height]
+
+def save_grid_cache(grid, geometry, path=GRID_CACHE_PATH):
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "w") as f:
+        json.dump({"geometry": geometry, "grid": grid}, f, indent=4)
+
+def load_grid_cache(path=GRID_CACHE_PATH):
+    """Returns (grid, geometry) from the cache file, (None, None) if there is no usable cache."""
+    try:
+        with open(path, "r") as f:
+            cache = json.load(f)
+        grid = {int(ch): {field: tuple(coord) for field, coord in fields.items()}
+                for ch, fields in cache["grid"].items()}
+        return grid, cache["geometry"]
+    except (OSError, ValueError, KeyError, TypeError):
+        return None, None
+
+def init_AOTF_cached(path=GRID_CACHE_PATH, force=False):
+    """
+    Same result as init_AOTF(), but reuses the saved grid when the AOTF window
+    has not moved or been resized since it was saved (only re-activates the window).
+    The full init_AOTF() (click + wait for focus) only runs if the check fails or force=True.
+    """
+    grid, cached_geometry = (None, None) if force else load_grid_cache(path)
+    if grid is not None and get_window_geometry() == cached_geometry:
+        try:
+            gw.getWindowsWithTitle(AOTF_TITLE)[0].activate()
+            if wait_for_focus(AOTF_TITLE, timeout=1.0):
+                return grid
+        except (gw.PyGetWindowException, IndexError) as e:
+            print(f"Cached AOTF grid not usable: {e}")
 
-    for i, row_y in enumerate(y):
-        for j, col_x in enumerate(x):
-            grid[i][fields[j]] = (col_x, row_y)
+    print("Initializing AOTF Controller window...")
+    grid = init_AOTF()
+    save_grid_cache(grid, get_window_geometry(), path)
     return grid
 
 def get_popup_window(window_title, timeout=5.0):
-    start_time = time.time()
-    
-    while time.time() - start_time < timeout:
-        win_list = gw.getWindowsWithTitle(window_title)
-        
-        # 1. Check if the list actually contains a window!
-        if len(win_list) > 0:
-            try:
-                win = win_list[0]
-                win.restore()
-                win.moveTo(0, 0)
-                win.activate()
-                return win  # Success! Break out and return the window.
-            except gw.PyGetWindowException as e:
-                # Catch activation errors if the window is still drawing
-                print(f"Window found but not ready to activate: {e}")
-        
-        # 2. CPU SAVER: Wait 100ms before checking again
-        time.sleep(0.1)
-        
-    # 3. Timeout safeguard
-    print(f"Timeout Error: '{window_title}' never appeared after {timeout} seconds!")
+    win = wait_for_window(window_title, timeout=timeout)
+    if win is None:
+        print(f"Timeout Error: '{window_title}' never appeared after {timeout} seconds!")
+        return None
+
+    def activate():
+        try:
+            win.restore()
+            win.moveTo(0, 0)
+            win.activate()
+            return True
+        except gw.PyGetWindowException as e:
+            # Catch activation errors if the window is still drawing
+            print(f"Window found but not ready to activate: {e}")
+            return False
+
+    if wait_until(activate, timeout=timeout, label=f"activate: {window_title}"):
+        wait_for_focus(window_title, timeout=timeout)
+        return win
     return None
 
 def move_and_click(coord):
-    pyautogui.moveTo(*coord)
-    time.sleep(0.1)
     pyautogui.click(*coord)
 
 def get_coord(grid, channel, field):
@@ -93,70 +141,71 @@ def fill_box_no_ctrl_a(content):
     pyautogui.hotkey("ctrl", "v")
     pyautogui.press('enter')
 
+LAMBDA_POPUP = 'popup wavelength slider.vi'
+POWER_POPUP = 'popup power slider.vi'
+
+def fill_popup(popup_title, edit_coord, ok_coord, value, phase="popup"):
+    '''
+    type value into an opened popup and press OK.
+    returns True when the popup is closed again (the AOTF accepted the value).
+    phase: prefix of the profiler phases (e.g. "change_lambda")
+    '''
+    with PROFILER.phase(f"{phase}.popup_wait"):
+        win = get_popup_window(popup_title)
+    if win is None:
+        raise RuntimeError(f"'{popup_title}' did not open")
+    with PROFILER.phase(f"{phase}.paste"):
+        pyautogui.doubleClick(*edit_coord)
+        fill_box_no_ctrl_a(value)
+    # the popup closes when the value is applied (this replaces the 'important' sleep)
+    with PROFILER.phase(f"{phase}.ok_close"):
+        pyautogui.click(*ok_coord)
+        closed = wait_for_window_closed(popup_title)
+    return bool(closed)
+
 def change_lambda_function(grid, channel, new_lambda_value):
     '''
     channel: int, AOTF output channels (0 ~ 7)
     new_lambda_value: str, the new wavelength value (400 ~ 700)
+    raises RuntimeError if the popup does not close (the AOTF did not accept the value)
     '''
-    lambda_coord = get_coord(grid, channel, "lambda")
-    pyautogui.moveTo(*lambda_coord)
-    time.sleep(0.5)
-    pyautogui.click(*lambda_coord)
-    
-    time.sleep(0.5)
-    get_popup_window('popup wavelength slider.vi')
-    time.sleep(0.5)
-
-    lambda_edit_coord = get_lambda_edit_coord([0,0])
-    pyautogui.moveTo(*lambda_edit_coord)
-    time.sleep(0.5)
-    
-    pyautogui.doubleClick(*lambda_edit_coord)
-    time.sleep(0.5)
-    fill_box_no_ctrl_a(new_lambda_value)
-
-    lambda_ok_coord = get_lambda_ok_coord([0,0])
-    pyautogui.moveTo(*lambda_ok_coord)
-    time.sleep(0.5)
-    pyautogui.click(*lambda_ok_coord)
-    time.sleep(0.5)# important
+    with PROFILER.phase("change_lambda.total"):
+        lambda_coord = get_coord(grid, channel, "lambda")
+        with PROFILER.phase("change_lambda.click"):
+            pyautogui.click(*lambda_coord)
+        if not fill_popup(LAMBDA_POPUP, get_lambda_edit_coord([0,0]), get_lambda_ok_coord([0,0]), new_lambda_value, phase="change_lambda"):
+            raise RuntimeError(f"'{LAMBDA_POPUP}' did not close, wavelength {new_lambda_value} of channel {channel} not applied")
 
 def change_power_function(grid, channel, new_power_value):
     '''
     channel: int, AOTF output channels (0 ~ 7)
     new_power_value: str, the new power value (0 ~ 100) %
+    raises RuntimeError if the popup does not close (the AOTF did not accept the value)
     '''
-    power_coord = get_coord(grid, channel, "power")
-    pyautogui.moveTo(*power_coord)
-    time.sleep(0.5)
-    pyautogui.click(*power_coord)
-
-    power_edit_coord = get_power_edit_coord([0,0])
-
-    time.sleep(0.5)
-    get_popup_window('popup power slider.vi')
-    time.sleep(0.5)
-
-    pyautogui.moveTo(*power_edit_coord)
-    time.sleep(0.5)
-    pyautogui.doubleClick(*power_edit_coord)
-    time.sleep(0.5)
-    fill_box_no_ctrl_a(new_power_value)
-
-    power_ok_coord = get_power_ok_coord([0,0])
-    pyautogui.moveTo(*power_ok_coord)
-    time.sleep(0.5)
-    pyautogui.click(*power_ok_coord)
-    time.sleep(0.5)# important
+    with PROFILER.phase("change_power.total"):
+        power_coord = get_coord(grid, channel, "power")
+        with PROFILER.phase("change_power.click"):
+            pyautogui.click(*power_coord)
+        if not fill_popup(POWER_POPUP, get_power_edit_coord([0,0]), get_power_ok_coord([0,0]), new_power_value, phase="change_power"):
+            raise RuntimeError(f"'{POWER_POPUP}' did not close, power {new_power_value} of channel {channel} not applied")
 
 def press_on_button(grid, channel):
-    on_coord = get_coord(grid, channel, "on")
-    time.sleep(0.5)
-    move_and_click(on_coord)
+    with PROFILER.phase("press_on.total"):
+        on_coord = get_coord(grid, channel, "on")
+        # the button is redrawn when it switches: wait for that instead of a fixed sleep
+        bbox = region_around(on_coord)
+        with PROFILER.phase("press_on.grab"):
+            before = grab_region(bbox)
+        with PROFILER.phase("press_on.click"):
+            move_and_click(on_coord)
+        with PROFILER.phase("press_on.redraw_wait"):
+            wait_for_region_change(bbox, reference=before, timeout=1.0)
 
 if __name__ == "__main__":
-    grid = init_AOTF()
+    grid = init_AOTF_cached()
     change_lambda_function(grid, 0, "660")
     change_power_function(grid, 1, "50")
     press_on_button(grid, 7)
+    print_wait_stats()
+    PROFILER.print_stats()
     
\ No newline at end of file
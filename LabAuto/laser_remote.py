@@ -15,6 +15,7 @@ from .network import Connection
 
 import threading
 import queue
+import time
 
 class LaserController:
     """Asynchronous controller that never blocks the Keithley measurement loop."""
@@ -22,6 +23,7 @@ class LaserController:
         self.conn = Connection.connect(laser_ip, port)
         self.cmd_queue = queue.Queue()
         self.running = True
+        self.offset = None # laser PC clock - this PC clock, see clock_offset()
         
         # Start a dedicated, invisible background thread just for network traffic
         self.worker = threading.Thread(target=self._network_worker, daemon=True)
@@ -62,6 +64,71 @@ class LaserController:
             self.cmd_queue.join() # Wait for the background worker to finish this specific task
             return response_container[0]
 
+    def send_batch(self, items, wait_for_reply=True):
+        """
+        Set several channels in one round trip.
+        items: list of {"channel": .., "wavelength": .., "power": .., "set_on": 0/1} (any subset of the fields)
+        The reply has one result per item: {"channel", "applied", "skipped", "superseded", "not_run"}.
+        """
+        return self.send_cmd({"batch": list(items)}, wait_for_reply=wait_for_reply)
+
+    def clock_offset(self, samples=5):
+        """
+        Laser PC clock minus this PC's clock (seconds), from the sample with the shortest round trip.
+        """
+        best_rtt, best_offset = None, 0.0
+        for _ in range(samples):
+            t_send = time.time()
+            reply = self.send_cmd({"cmd": "TIME"})
+            t_recv = time.time()
+            rtt = t_recv - t_send
+            if best_rtt is None or rtt < best_rtt:
+                best_rtt = rtt
+                best_offset = reply["time"] - (t_send + t_recv) / 2
+        self.offset = best_offset
+        return best_offset
+
+    def upload_schedule(self, events, start_at=None, lead_time=1.0):
+        """
+        Send a whole light timeline, the laser PC runs it on its own clock.
+        events: [{"t": seconds from start, "channel": .., "set_on"/"power"/"wavelength": ..}]
+                (see LabAuto.laser_schedule.build_light_schedule)
+        start_at: epoch on THIS PC's clock, default now + lead_time.
+        Returns (schedule_id, start_at) with start_at on this PC's clock.
+        """
+        if getattr(self, "offset", None) is None:
+            self.clock_offset()
+        if start_at is None:
+            start_at = time.time() + lead_time
+        reply = self.send_cmd({"schedule": {"events": list(events), "start_at": start_at + self.offset}})
+        return reply["schedule_id"], start_at
+
+    def schedule_report(self, schedule_id=None, wait=True, timeout=None):
+        """
+        Planned vs actual edge times of an uploaded schedule, converted to THIS PC's clock.
+        wait: block until the whole schedule has run.
+        """
+        payload = {"cmd": "SCHEDULE_REPORT", "wait": wait, "timeout": timeout}
+        if schedule_id is not None:
+            payload["schedule_id"] = schedule_id
+        report = self.send_cmd(payload)["report"]
+        offset = getattr(self, "offset", None) or 0.0
+        report["start_at"] -= offset
+        for edge in report["edges"]:
+            for key in ("planned", "started", "done"):
+                edge[key] -= offset
+        return report
+
+    def cancel_schedule(self, schedule_id=None):
+        payload = {"cmd": "SCHEDULE_CANCEL"}
+        if schedule_id is not None:
+            payload["schedule_id"] = schedule_id
+        return self.send_cmd(payload)
+
+    def stats(self, reset=False):
+        """Latency statistics of the laser server (per GUI phase, in seconds)."""
+        return self.send_cmd({"cmd": "STATS", "reset": reset})
+
     def close(self):
         self.running = False
         if self.worker.is_alive():
@@ -0,0 +1,116 @@
+'''
+light schedules executed by the laser server against its own clock
+
+instead of one network message per ON/OFF toggle (network + GUI latency on every edge),
+the measurement PC uploads the whole timeline once:
+    {"schedule": {"start_at": <epoch, laser PC clock>, "events": [{"t": 0.0, "channel": 6, "set_on": 1}, ...]}}
+the laser server runs it in a background thread (ScheduleRunner) and records when every
+edge really happened, the client asks for that report at the end of the run.
+'''
+import threading
+import time
+
+
+def build_light_schedule(sequence, keys=("laser_cmd1", "laser_cmd2")):
+    """
+    Convert a measurement sequence (list of steps with "duration" and laser_cmd1/laser_cmd2,
+    as built by basic_block() / encode_binary_block()) into schedule events.
+    Each laser command gets t = start time of its step (seconds from the sequence start).
+    Returns a list of event dicts: {"t": .., "channel": .., "power"/"wavelength"/"set_on": ..}
+    """
+    events = []
+    t = 0.0
+    for step in sequence:
+        for key in keys:
+            cmd = step.get(key)
+            if cmd:
+                event = dict(cmd)
+                event["t"] = t
+                events.append(event)
+        t += float(step["duration"])
+    return events
+
+
+def sleep_until(deadline, stop_event=None, spin=0.002):
+    """
+    Wait until time.perf_counter() >= deadline.
+    Sleeps (or waits on stop_event) until the last few ms, then spins for accuracy.
+    Returns False if stop_event was set before the deadline.
+    """
+    while True:
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            return True
+        if stop_event is not None and stop_event.is_set():
+            return False
+        if remaining > spin:
+            if stop_event is not None:
+                stop_event.wait(min(remaining - spin, 0.1))
+            else:
+                time.sleep(remaining - spin)
+
+
+class ScheduleRunner:
+    """
+    Run schedule events at start_at + t on the local clock (background thread).
+
+    execute: callable(event) -> dict, applies one event (the laser server's apply_command)
+             and returns its result, e.g. {"applied": [...], "skipped": [...]}.
+    """
+    def __init__(self, schedule_id, events, start_at, execute):
+        self.schedule_id = schedule_id
+        self.events = sorted(events, key=lambda e: float(e["t"]))
+        self.start_at = float(start_at)
+        self.execute = execute
+        self.edges = []
+        self.error = None
+        self.stop_event = threading.Event()
+        self.done_event = threading.Event()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def cancel(self):
+        self.stop_event.set()
+
+    def wait(self, timeout=None):
+        return self.done_event.wait(timeout)
+
+    def _run(self):
+        # perf_counter is monotonic and precise: convert the epoch start time once
+        base = time.perf_counter() + (self.start_at - time.time())
+        try:
+            for event in self.events:
+                if not sleep_until(base + float(event["t"]), self.stop_event):
+                    break
+                started = time.time()
+                result = self.execute(event)
+                done = time.time()
+                planned = self.start_at + float(event["t"])
+                self.edges.append({
+                    "t": float(event["t"]),
+                    "channel": event.get("channel"),
+                    "planned": planned,
+                    "started": started,
+                    "done": done,
+                    "late": started - planned,
+                    "result": result,
+                })
+        except Exception as e:
+            self.error = str(e)
+            print(f"Schedule {self.schedule_id} stopped: {e}")
+        finally:
+            self.done_event.set()
+
+    def report(self):
+        return {
+            "schedule_id": self.schedule_id,
+            "start_at": self.start_at,
+            "done": self.done_event.is_set(),
+            "cancelled": self.stop_event.is_set(),
+            "error": self.error,
+            "n_events": len(self.events),
+            "edges": list(self.edges),
+        }
@@ -0,0 +1,70 @@
+class AOTFState:
+    """
+    Last known state of every AOTF channel: wavelength, power and on/off.
+
+    The laser server keeps one instance for its whole lifetime (the laser also
+    stays in its last state when a client disconnects), so a new client that
+    asks for the same wavelength/power again costs nothing.
+
+    - wavelength / power start as None (unknown): the first request is always applied.
+    - on starts as False: all outputs are off when the AOTF Controller starts.
+    """
+    FIELDS = ("wavelength", "power", "on")
+
+    def __init__(self, n_channels=8):
+        self.n_channels = n_channels
+        self.channels = {}
+        self.reset()
+
+    def reset(self, channel=None):
+        """
+        Forget the cached values (e.g. someone clicked the AOTF GUI by hand).
+        channel: int, only forget this channel. None = all channels.
+        """
+        channels = range(self.n_channels) if channel is None else [int(channel)]
+        for ch in channels:
+            self.channels[ch] = {"wavelength": None, "power": None, "on": False}
+
+    @staticmethod
+    def same_value(old, new):
+        """
+        Compare two wavelength/power values that may arrive as str, int or float
+        ("660", 660, 660.0 are the same value).
+        """
+        if old is None or new is None:
+            return False
+        try:
+            return round(float(old), 2) == round(float(new), 2)
+        except (TypeError, ValueError):
+            return str(old) == str(new)
+
+    def get(self, channel, field):
+        return self.channels[int(channel)][field]
+
+    def needs_change(self, channel, field, value):
+        """
+        True if setting field to value would change the channel.
+        field: "wavelength", "power" or "on"
+        """
+        current = self.get(channel, field)
+        if field == "on":
+            return bool(current) != bool(int(value))
+        return not self.same_value(current, value)
+
+    def update(self, channel, field, value):
+        if field == "on":
+            value = bool(int(value))
+        self.channels[int(channel)][field] = value
+
+    def invalidate(self, channel, field):
+        """
+        Mark a value as unknown after a failed GUI operation,
+        so the next request is applied instead of skipped.
+        The on state can't be unknown (it is a toggle), so it is left as is.
+        """
+        if field != "on":
+            self.channels[int(channel)][field] = None
+
+    def snapshot(self):
+        """JSON friendly copy of all channels: {"0": {...}, "1": {...}, ...}"""
+        return {str(ch): dict(values) for ch, values in self.channels.items()}
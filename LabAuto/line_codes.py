@@ -0,0 +1,157 @@
+'''
+line codes of the optical encoder: bits -> light level of every slot of bit_duration, and back
+
+binary_string is sent with the "line_code" of the config (time_dep_servo_encode_app.py):
+    "rz"          (default) LabAuto.sequences.encode_binary_block: 4 x bit_duration per bit,
+                  every bit has its own dark reference and a Vg off rest     0.25 bit / slot
+    "nrz"         one slot per bit, light on for '1', Vg stays on             1 bit / slot
+    "manchester"  two slots per bit, '1' = light then dark, '0' = dark then light: every bit
+                  has a transition and is decided by comparing its halves (no threshold,
+                  insensitive to drift of the dark current)                   0.5 bit / slot
+    "pam4", "pam8" one slot per symbol of 2 / 3 bits, Gray coded on 4 / 8 light levels:
+                  dark + the powers of "pam_powers" (nW, ascending, n_levels - 1 values; by
+                  default evenly spread up to the first power_arr entry and snapped to the
+                  columns of the pp calibration table)                        2 / 3 bits / slot
+the slot codes send training_symbols() (every light level once, ascending) before the data,
+the decoder learns the current of every level from them. they are built by
+LabAuto.sequences.line_code_block and decoded by LabAuto.decoder.
+
+    code = get_line_code(params)
+    levels = code.slot_levels(code.symbols(bits))     # (n symbols, slots per symbol) level indices
+    symbols = code.decide(statistics, code.train(preamble statistics, preamble symbols))
+    bits = code.symbol_bits(symbols)
+'''
+import numpy as np
+
+
+class LineCode:
+    """
+    pulse amplitude modulation on n_levels light levels (level 0: dark), one slot per symbol,
+    Gray coded so that a neighbouring level costs one bit error.
+    """
+    name = "pam"
+    slots_per_symbol = 1
+
+    def __init__(self, n_levels=2):
+        self.n_levels = n_levels
+        self.bits_per_symbol = int(np.log2(n_levels))
+        if 2 ** self.bits_per_symbol != n_levels:
+            raise ValueError(f"{self.name}: the number of levels must be a power of two, not {n_levels}")
+
+    def symbols(self, bits):
+        """symbol values (int) of bits, padded with '0' to a whole number of symbols."""
+        bits = np.asarray(bits, dtype=int)
+        k = self.bits_per_symbol
+        padded = np.concatenate((bits, np.zeros(-len(bits) % k, dtype=int)))
+        return padded.reshape(-1, k) @ (1 << np.arange(k - 1, -1, -1))
+
+    def symbol_bits(self, symbols):
+        k = self.bits_per_symbol
+        symbols = np.asarray(symbols, dtype=int)
+        return ((symbols[:, None] >> np.arange(k - 1, -1, -1)) & 1).ravel()
+
+    def training_symbols(self):
+        """symbols sent before the data: every level once, ascending."""
+        level = np.arange(self.n_levels)
+        return level ^ (level >> 1) # Gray code
+
+    def slot_levels(self, symbols):
+        """(n symbols, slots_per_symbol) light level index of every slot."""
+        gray = np.asarray(symbols, dtype=int)
+        level = gray.copy()
+        shift = gray >> 1
+        while shift.any(): # inverse Gray code
+            level ^= shift
+            shift >>= 1
+        return level[:, None]
+
+    def train(self, stats, symbols):
+        """mean statistic of every level (levels missing in the preamble inter- / extrapolated)."""
+        levels = self.slot_levels(symbols).ravel()
+        stats = np.asarray(stats, dtype=float).ravel()
+        seen = np.unique(levels)
+        means = np.array([np.nanmean(stats[levels == level]) for level in seen])
+        if 0 not in seen: # statistics are baseline corrected: dark is ~0
+            seen, means = np.append(0, seen), np.append(0.0, means)
+        if len(seen) < 2:
+            raise ValueError("the preamble has no light level, use more preamble_bits")
+        everything = np.arange(self.n_levels)
+        return np.where(everything <= seen[-1], np.interp(everything, seen, means),
+                        np.polyval(np.polyfit(seen, means, 1), everything))
+
+    def decide(self, stats, model):
+        """symbols of (n symbols, slots) statistics: nearest trained level."""
+        level = np.argmin(np.abs(np.asarray(stats, dtype=float)[:, :1] - np.asarray(model)[None, :]), axis=1)
+        return level ^ (level >> 1) # Gray code
+
+
+class NRZ(LineCode):
+    name = "nrz"
+
+    def __init__(self):
+        super().__init__(2)
+
+
+class Manchester(LineCode):
+    name = "manchester"
+    slots_per_symbol = 2
+
+    def __init__(self):
+        super().__init__(2)
+
+    def slot_levels(self, symbols):
+        symbols = np.asarray(symbols, dtype=int)
+        return np.column_stack((symbols, 1 - symbols))
+
+    def train(self, stats, symbols):
+        return None
+
+    def decide(self, stats, model):
+        stats = np.asarray(stats, dtype=float)
+        return (stats[:, 0] > stats[:, 1]).astype(int)
+
+
+LINE_CODES = {
+    "nrz": NRZ,
+    "manchester": Manchester,
+    "pam4": lambda: LineCode(4),
+    "pam8": lambda: LineCode(8),
+}
+
+
+def get_line_code(params):
+    """LineCode of the config, None for the return-to-zero encoder ("rz", default)."""
+    name = str(params.get("line_code", "rz")).lower()
+    if name == "rz":
+        return None
+    if name not in LINE_CODES:
+        raise ValueError(f"unknown line_code {name!r}, expected rz or one of {', '.join(LINE_CODES)}")
+    return LINE_CODES[name]()
+
+
+def format_power(power_nw):
+    """nW as a column name of the calibration table ("100" for 100, like the power_arr entries)."""
+    power_nw = float(power_nw)
+    return str(int(power_nw)) if power_nw.is_integer() else str(power_nw)
+
+
+def level_powers(params, power_table, n_levels):
+    """
+    power (column name of the calibration table) of light levels 1 .. n_levels - 1:
+    "pam_powers", else evenly spread up to the first power_arr entry
+    """
+    if "pam_powers" in params:
+        powers = [format_power(p) for p in params["pam_powers"]]
+        if len(powers) != n_levels - 1:
+            raise ValueError(f"pam_powers needs {n_levels - 1} values for {n_levels} levels, got {len(powers)}")
+        return powers
+    top = float(params.get("power_arr", [100])[0])
+    targets = top * np.arange(1, n_levels) / (n_levels - 1)
+    columns = list(getattr(power_table, "columns", []))
+    if not columns:
+        return [format_power(round(p, 1)) for p in targets]
+    available = np.array([float(c) for c in columns])
+    snapped = [str(columns[np.argmin(np.abs(available - p))]) for p in targets]
+    if len(set(snapped)) != len(snapped):
+        raise ValueError(f"the calibration table has no {n_levels - 1} distinct powers up to {top:g} nW, set pam_powers")
+    return snapped
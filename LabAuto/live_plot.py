@@ -0,0 +1,206 @@
+'''
+live matplotlib lines whose redraw cost does not grow with the run length
+
+set_data() with the whole history + relim() + canvas.draw() on every frame gets slower
+the longer a time-dependent run lasts. LivePlot keeps every line in a growable numpy
+buffer and only draws a min/max decimation of it: one (min, max) pair per horizontal
+pixel of the axes, which looks the same as all the points. finished pixel columns are
+cached, a frame only decimates the new samples.
+
+the lines are animated (blitting): a frame restores the saved background (axes, ticks,
+legend) and draws only the lines. a full canvas.draw() happens only when the data leaves
+the current limits; the limits then grow with headroom (x by x_headroom of the span)
+so that happens rarely.
+
+    live = LivePlot(canvas)
+    line = live.add_line(ax, '.-', label='Id')
+    line.extend(t_block, id_block)      # numpy arrays, x increasing
+    live.refresh()                      # once per frame (QTimer)
+'''
+import numpy as np
+
+
+class GrowableArray:
+    """(n, n_columns) float array, capacity doubled when full (amortised O(1) append)."""
+    def __init__(self, n_columns, capacity=4096):
+        self.data = np.empty((capacity, n_columns))
+        self.n = 0
+
+    def extend(self, block):
+        block = np.asarray(block, dtype=float)
+        needed = self.n + len(block)
+        if needed > len(self.data):
+            capacity = len(self.data)
+            while capacity < needed:
+                capacity *= 2
+            grown = np.empty((capacity, self.data.shape[1]))
+            grown[:self.n] = self.data[:self.n]
+            self.data = grown
+        self.data[self.n:needed] = block
+        self.n = needed
+
+    def column(self, i):
+        return self.data[:self.n, i]
+
+    def __len__(self):
+        return self.n
+
+
+def minmax_decimate(x, y, edges):
+    """
+    Min and max of y in every bin of x between edges (x increasing, NaN ignored).
+    Returns (x, y) with two points per non-empty bin: (first x, min), (last x, max).
+    """
+    bounds = np.searchsorted(x, edges)
+    bounds[-1] = np.searchsorted(x, edges[-1], side="right")
+    starts, ends = bounds[:-1], bounds[1:]
+    keep = ends > starts
+    starts, ends = starts[keep], ends[keep]
+    if not len(starts):
+        return np.empty(0), np.empty(0)
+    y = y[:ends[-1]]
+    out_x = np.empty(2 * len(starts))
+    out_y = np.empty(2 * len(starts))
+    out_x[0::2] = x[starts]
+    out_x[1::2] = x[ends - 1]
+    out_y[0::2] = np.fmin.reduceat(y, starts)
+    out_y[1::2] = np.fmax.reduceat(y, starts)
+    return out_x, out_y
+
+
+class LiveLine:
+    """One line of a LivePlot, created by LivePlot.add_line()."""
+    def __init__(self, artist):
+        self.artist = artist
+        self.ax = artist.axes
+        self.data = GrowableArray(2)
+        self.x_range = None # (min, max) of the data
+        self.y_range = None
+        # decimation cache: bins that can not get new samples any more
+        self.bins_key = None
+        self.done_x = np.empty(0)
+        self.done_y = np.empty(0)
+        self.done_upto = 0 # first sample of the open bin
+
+    def extend(self, x, y):
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        if not len(x):
+            return
+        self.data.extend(np.column_stack((x, y)))
+        self.x_range = self._grow(self.x_range, x)
+        self.y_range = self._grow(self.y_range, y)
+
+    @staticmethod
+    def _grow(current, values):
+        if np.all(np.isnan(values)):
+            return current
+        lo, hi = np.nanmin(values), np.nanmax(values)
+        if current is None:
+            return lo, hi
+        return min(current[0], lo), max(current[1], hi)
+
+    def update_artist(self):
+        """Decimate to the current x limits and pixel width of the axes."""
+        if not len(self.data):
+            return
+        x0, x1 = self.ax.get_xlim()
+        n_bins = max(1, int(self.ax.bbox.width))
+        key = (x0, x1, n_bins)
+        if key != self.bins_key:
+            self.bins_key = key
+            self.done_x, self.done_y, self.done_upto = np.empty(0), np.empty(0), 0
+        edges = np.linspace(x0, x1, n_bins + 1)
+        x, y = self.data.column(0), self.data.column(1)
+
+        tail_x, tail_y = minmax_decimate(x[self.done_upto:], y[self.done_upto:], edges)
+        # the bin of the last sample is still open, the ones before it are final
+        open_bin = min(max(np.searchsorted(edges, x[-1], side="right") - 1, 0), n_bins - 1)
+        open_start = np.searchsorted(x, edges[open_bin])
+        if open_start > self.done_upto and len(tail_x) >= 2:
+            self.done_x = np.concatenate((self.done_x, tail_x[:-2]))
+            self.done_y = np.concatenate((self.done_y, tail_y[:-2]))
+            self.done_upto = open_start
+            tail_x, tail_y = tail_x[-2:], tail_y[-2:]
+        self.artist.set_data(np.concatenate((self.done_x, tail_x)), np.concatenate((self.done_y, tail_y)))
+
+
+class LivePlot:
+    """
+    canvas: FigureCanvasQTAgg (any canvas with blitting support)
+    x_headroom: fraction of the x span added at the right when the data reaches the limit
+    y_margin: fraction of the y span added on both sides when the data leaves the limits
+    """
+    def __init__(self, canvas, x_headroom=0.25, y_margin=0.1):
+        self.canvas = canvas
+        self.figure = canvas.figure
+        self.x_headroom = x_headroom
+        self.y_margin = y_margin
+        self.lines = []
+        self.background = None
+        self.limits_set = set() # axes whose limits follow the data already
+        canvas.mpl_connect("draw_event", self._on_draw)
+
+    def add_line(self, ax, *args, **kwargs):
+        artist, = ax.plot([], [], *args, animated=True, **kwargs)
+        line = LiveLine(artist)
+        self.lines.append(line)
+        return line
+
+    def _on_draw(self, event):
+        # full draw (limits changed, resize): new background without the lines, then the lines
+        self.background = self.canvas.copy_from_bbox(self.figure.bbox)
+        self._draw_lines()
+
+    def _draw_lines(self):
+        for line in self.lines:
+            line.ax.draw_artist(line.artist)
+
+    def _fit_limits(self):
+        """Grow the axes limits to the data, True if any changed."""
+        changed = False
+        by_axes = {}
+        for line in self.lines:
+            if line.x_range is not None:
+                by_axes.setdefault(line.ax, []).append(line)
+        for ax, lines in by_axes.items():
+            x_lo = min(line.x_range[0] for line in lines)
+            x_hi = max(line.x_range[1] for line in lines)
+            x0, x1 = ax.get_xlim()
+            first = ax not in self.limits_set
+            if first or x_lo < x0 or x_hi >= x1:
+                span = max(x_hi - x_lo, 1e-9)
+                ax.set_xlim(min(x_lo, x0) if not first else x_lo, x_hi + self.x_headroom * span)
+                changed = True
+
+            y_ranges = [line.y_range for line in lines if line.y_range is not None]
+            if not y_ranges:
+                continue
+            y_lo = min(r[0] for r in y_ranges)
+            y_hi = max(r[1] for r in y_ranges)
+            y0, y1 = ax.get_ylim()
+            if first or y_lo < y0 or y_hi > y1:
+                pad = self.y_margin * (y_hi - y_lo) or abs(y_hi) * self.y_margin or 1e-12
+                ax.set_ylim(y_lo - pad, y_hi + pad)
+                changed = True
+            self.limits_set.add(ax)
+        return changed
+
+    def refresh(self):
+        """Draw the new data: blit the lines, full redraw only if the limits changed."""
+        changed = self._fit_limits()
+        for line in self.lines:
+            line.update_artist()
+        if changed or self.background is None:
+            self.canvas.draw()
+            return
+        self.canvas.restore_region(self.background)
+        self._draw_lines()
+        self.canvas.blit(self.figure.bbox)
+
+    def redraw(self):
+        """Full redraw (new line / legend, end of the run)."""
+        self._fit_limits()
+        for line in self.lines:
+            line.update_artist()
+        self.canvas.draw()
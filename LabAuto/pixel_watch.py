@@ -0,0 +1,135 @@
+'''
+fast pixel watcher: detect a colour change of a few screen points
+
+ImageGrab.grab() of the whole screen every 0.5 s costs tens of ms per frame and
+adds up to 500 ms of latency before a change is seen. PixelWatcher only grabs the
+small bbox around the watched points, at a configurable rate, and reports when
+the change was first seen and when it was confirmed (debounce), so the detection
+latency can be measured.
+
+usage:
+    watcher = PixelWatcher([(325, 1000)], tol=10, poll_interval=0.02, debounce=2)
+    change = watcher.wait_for_change(timeout=600)
+    if change is not None:
+        print(change.point, change.old_color, "->", change.new_color, change.latency_bound)
+'''
+import time
+from collections import deque
+from dataclasses import dataclass
+
+from LabAuto.wait import record_wait
+
+DEFAULT_POLL_INTERVAL = 0.02 # 50 Hz
+MAX_UNION_AREA = 200 * 200   # above this, every point is grabbed as its own 1x1 bbox
+
+
+@dataclass
+class PixelChange:
+    """
+    point: (x, y) that changed
+    old_color / new_color: (R, G, B) before / after
+    last_same: time.perf_counter() of the last sample that still had the old colour
+    first_seen: time of the first sample with the new colour
+    detected: time the change was confirmed (after debounce)
+    """
+    point: tuple
+    old_color: tuple
+    new_color: tuple
+    last_same: float
+    first_seen: float
+    detected: float
+
+    @property
+    def latency_bound(self):
+        """Upper bound of the time between the real change and its detection (seconds)."""
+        return self.detected - self.last_same
+
+    @property
+    def debounce_time(self):
+        return self.detected - self.first_seen
+
+
+def color_changed(color, reference, tol):
+    return any(abs(c1 - c2) > tol for c1, c2 in zip(color, reference))
+
+
+class PixelWatcher:
+    """
+    Watch the colour of one or several screen points.
+
+    points: list of (x, y) screen coordinates
+    tol: per channel tolerance (0 = exact match)
+    poll_interval: seconds between two grabs
+    debounce: number of consecutive samples that must show the new colour
+              (filters a single frame redrawn by the GUI while it repaints)
+    """
+    def __init__(self, points, tol=10, poll_interval=DEFAULT_POLL_INTERVAL, debounce=2):
+        self.points = [(int(x), int(y)) for x, y in points]
+        self.tol = tol
+        self.poll_interval = poll_interval
+        self.debounce = max(1, int(debounce))
+        self.grab_times = deque(maxlen=1000) # seconds per grab, to check the rate is reachable
+
+        xs = [x for x, _ in self.points]
+        ys = [y for _, y in self.points]
+        self.bbox = (min(xs), min(ys), max(xs) + 1, max(ys) + 1)
+        area = (self.bbox[2] - self.bbox[0]) * (self.bbox[3] - self.bbox[1])
+        self.union = area <= MAX_UNION_AREA
+
+    def sample(self):
+        """Returns {point: (R, G, B)} of every watched point."""
+        from PIL import ImageGrab
+        start = time.perf_counter()
+        colors = {}
+        if self.union:
+            image = ImageGrab.grab(bbox=self.bbox).convert("RGB")
+            for x, y in self.points:
+                colors[(x, y)] = image.getpixel((x - self.bbox[0], y - self.bbox[1]))
+        else:
+            for x, y in self.points:
+                colors[(x, y)] = ImageGrab.grab(bbox=(x, y, x + 1, y + 1)).convert("RGB").getpixel((0, 0))
+        self.grab_times.append(time.perf_counter() - start)
+        return colors
+
+    def wait_for_change(self, timeout=None, reference=None):
+        """
+        Block until any watched point changes colour (beyond tol, for debounce samples).
+
+        reference: {point: colour} taken before the action, default: sampled now.
+        timeout: seconds, None = wait forever.
+        Returns a PixelChange, or None on timeout.
+        """
+        start = time.perf_counter()
+        if reference is None:
+            reference = self.sample()
+        last_same = time.perf_counter()
+        candidate = None # (point, first_seen, count)
+
+        while True:
+            colors = self.sample()
+            now = time.perf_counter()
+            changed = [p for p in self.points if color_changed(colors[p], reference[p], self.tol)]
+
+            if not changed:
+                candidate = None
+                last_same = now
+            elif candidate is not None and candidate[0] in changed:
+                candidate = (candidate[0], candidate[1], candidate[2] + 1)
+            else:
+                candidate = (changed[0], now, 1)
+
+            if candidate is not None and candidate[2] >= self.debounce:
+                point = candidate[0]
+                record_wait(f"pixel change: {self.points}", now - start, True)
+                return PixelChange(point, tuple(reference[point]), tuple(colors[point]), last_same, candidate[1], now)
+
+            if timeout is not None and now - start > timeout:
+                record_wait(f"pixel change: {self.points}", now - start, False)
+                print(f"Timeout: no pixel change after {timeout} seconds!")
+                return None
+            time.sleep(self.poll_interval)
+
+    def mean_grab_time(self):
+        if not self.grab_times:
+            return None
+        return sum(self.grab_times) / len(self.grab_times)
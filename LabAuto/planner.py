@@ -0,0 +1,293 @@
+'''
+how long a config queue will take, how many samples it records and how much it writes
+
+nothing in a config says how long it runs: wait_time, deplete_time, laser_stable_time, the
+step durations and the laser / servo command latencies only add up at run time. the planner
+builds the sequence of every config with the app's own builder (LabAuto.sequences), compiles
+it into a LabAuto.timeline.Timeline and replays it with the expected switch latency of every
+step (absolute deadlines: a slow switch only delays the end if its step is too short for it):
+    setup        wait_time + instrument setup (+ lead time of an uploaded light schedule)
+    sequence     timeline total + what the switches push past it
+    samples      per step (time left after the switch) / reading time
+    size         rows x bytes per csv row
+switch latencies (per kind of step commands, p90) and reading times (per nplc, median) come
+from the _timing.json files of earlier runs in data/ (LabAuto.telemetry), defaults when there
+is no history yet. the sweeps (idvg.py, idvd.py, idvg_pulse.py) are estimated from their loop:
+waits + num_points x (delay + reading).
+
+    python -m LabAuto.planner time_dep_servo_app.py config/FORMAL_time_dependent_config_app.json
+    python -m LabAuto.planner idvg.py config/a.json config/b.json --history data --json
+
+    plan = plan_queue("time_dep_app.py", config_files)      # {"duration", "samples", "bytes", "configs"}
+'''
+import argparse
+import datetime
+import json
+import math
+from pathlib import Path
+
+from LabAuto.sequences import SEQUENCE_BUILDERS, build_sequence
+from LabAuto.telemetry import spread
+from LabAuto.timeline import Timeline
+
+LINE_FREQUENCY = 60.0 # Hz, one NPLC = 1 / LINE_FREQUENCY seconds of integration
+READ_OVERHEAD = 0.005 # s, TSP print + VISA round trip of k.measure()
+PULSE_REST_WIDTH = 0.01 # s, the readings at base_vg after the pulse (PulseSampler)
+KEITHLEY_INIT = 3.0 # s, connect + reset + config, once per queue
+CONFIG_SETUP = 1.0 # s, auto zero + settings, every config
+LASER_REPLY = 0.2 # s, laser command that waits for the reply (sweeps)
+SCHEDULE_LEAD = 1.0 # s, lead time of an uploaded light schedule (SCHEDULED_APPS)
+SWEEP_SETTLE = 1.0 # s, the sweeps sleep 1 s at the start (and after the light off)
+
+# switch latency of one command when there is no history
+DEFAULT_SWITCH = {
+    "": 0.005,          # Keithley Vg only
+    "laser_cmd1": 0.01, # laser commands are sent without waiting for the reply
+    "laser_cmd2": 0.01,
+    "laser_cmd3": 0.3,  # servo shutter move
+}
+
+# csv columns written by every app (SequenceExecutor.header() / the sweep writers)
+STATE_COLUMNS = {
+    "time_dep_app.py": ("Light_State",),
+    "time_dep_dark_app.py": (),
+    "time_dep_dark_pulse_app.py": (),
+    "time_dep_servo_app.py": ("Light_State", "Servo_State"),
+    "time_dep_servo_pulse_app.py": ("Light_State", "Servo_State"),
+    "time_dep_servo_encode_app.py": ("Light_State", "Servo_State"),
+}
+PULSE_APPS = ("time_dep_dark_pulse_app.py", "time_dep_servo_pulse_app.py")
+# apps that upload "laser_schedule" configs to the laser PC (QueueRunner(laser_schedule=True))
+SCHEDULED_APPS = {"time_dep_app.py", "time_dep_servo_encode_app.py"}
+SWEEP_APPS = ("idvg.py", "idvd.py", "idvg_pulse.py")
+APPS = tuple(SEQUENCE_BUILDERS) + SWEEP_APPS
+
+# typical formatted width of a csv value: time / constant voltages / currents / states
+VALUE_BYTES = {"Time": 18, "V_D": 4, "V_G": 4, "I_D": 23, "I_G": 23}
+
+
+def reading_key(params):
+    """Reading times are kept per sampler (pulse configs have pulse_width_ms) and nplc of both channels."""
+    return ("pulse" if "pulse_width_ms" in params else "dc", float(params["nplc_a"]), float(params["nplc_b"]))
+
+
+class History:
+    """Switch latencies per kind of step commands, reading times per nplc and csv row sizes of earlier runs."""
+    def __init__(self, folder=Path("data")):
+        self.folder = Path(folder)
+        self.switch = {} # "laser_cmd1+laser_cmd2" ("" = Vg only) -> [s]
+        self.reading = {} # (sampler kind, nplc_a, nplc_b) -> [s per reading]
+        self.row_bytes = {} # csv columns -> [bytes per row]
+        if self.folder.is_dir():
+            for path in sorted(self.folder.glob("*_timing*.json")):
+                try:
+                    self._add(path)
+                except (OSError, ValueError, KeyError, TypeError):
+                    continue # half written / older format
+
+    def _add(self, path):
+        with open(path) as f:
+            timing = json.load(f)
+        for step in timing["steps"]:
+            if "actions" in step and step["switch_latency"] is not None:
+                self.switch.setdefault("+".join(step["actions"]), []).append(step["switch_latency"])
+
+        # the run's config backup and csv are next to it: time_<device>_<run>[_config.json|.csv]
+        stem = path.name.split("_timing")[0]
+        config_backup = self.folder / f"{stem}_config.json"
+        if config_backup.exists():
+            with open(config_backup) as f:
+                params = json.load(f)
+            key = reading_key(params)
+            for step in timing["steps"]:
+                if step.get("rate"):
+                    self.reading.setdefault(key, []).append(1.0 / step["rate"])
+
+        csv_path = self.folder / f"{stem}.csv"
+        samples = timing["summary"]["samples"]
+        # a resumed run (_timing_2.json ...) has more rows in the csv than the first timing file
+        resumed = (self.folder / f"{stem}_timing_2.json").exists()
+        if path.name == f"{stem}_timing.json" and not resumed and csv_path.exists() and samples:
+            with open(csv_path) as f:
+                n_columns = len(f.readline().split(","))
+            rows = samples + 1
+            self.row_bytes.setdefault(n_columns, []).append(csv_path.stat().st_size / rows)
+
+    def switch_latency(self, actions):
+        """Expected (p90) switch latency of a step with these commands."""
+        key = "+".join(sorted(actions))
+        if key in self.switch:
+            return spread(self.switch[key])["p90"]
+        return DEFAULT_SWITCH[""] + sum(DEFAULT_SWITCH[action] for action in actions)
+
+    def reading_time(self, params):
+        """Seconds per reading (median of earlier runs, else nplc of both channels + overhead)."""
+        key = reading_key(params)
+        if key in self.reading:
+            return spread(self.reading[key])["p50"]
+        return (key[1] + key[2]) / LINE_FREQUENCY + READ_OVERHEAD
+
+    def bytes_per_row(self, columns):
+        if len(columns) in self.row_bytes:
+            return spread(self.row_bytes[len(columns)])["p50"]
+        # comma after every value, \r\n at the end
+        return sum(VALUE_BYTES.get(column, 1) for column in columns) + len(columns) + 1
+
+
+def replay(timeline, latencies, reading_time, first_reading_time=None):
+    """
+    Run a timeline on paper: step i starts at max(its deadline, end of step i-1), switches for
+    latencies[i] and takes readings that end before its deadline.
+    Returns (end time, samples).
+    """
+    if first_reading_time is None:
+        first_reading_time = reading_time
+    now = 0.0
+    samples = 0
+    for i in range(len(timeline)):
+        start = max(now, timeline.offsets[i]) + latencies[i]
+        deadline = timeline.offsets[i + 1]
+        left = deadline - start
+        if left >= first_reading_time:
+            samples += 1 + int((left - first_reading_time) // reading_time)
+        now = max(start, deadline)
+    return now, samples
+
+
+def plan_time_dep(app, params, history, power_table=None):
+    timeline = Timeline(build_sequence(app, params, power_table))
+    scheduled = app in SCHEDULED_APPS and bool(params.get("laser_schedule", False))
+    latencies = []
+    for actions in timeline.actions:
+        if scheduled: # the laser PC switches the light, the step only sets Vg (and moves the servo)
+            actions = [action for action in actions if action == "laser_cmd3"]
+        latencies.append(history.switch_latency(actions))
+
+    reading = history.reading_time(params)
+    first_reading = None
+    if app in PULSE_APPS and reading_key(params) not in history.reading:
+        # the first reading of a step is the pulse, the next ones a short pulse at base_vg
+        pulse_width = float(params.get("pulse_width_ms", 5.0)) / 1000.0
+        first_reading = reading + pulse_width
+        reading += PULSE_REST_WIDTH
+    sequence_time, samples = replay(timeline, latencies, reading, first_reading)
+
+    setup = CONFIG_SETUP + int(params.get("wait_time", 0)) + (SCHEDULE_LEAD if scheduled else 0.0)
+    columns = ("Time", "V_D", "V_G", "I_D", "I_G") + STATE_COLUMNS[app]
+    return {
+        "steps": len(timeline),
+        "planned": timeline.total,
+        "setup": setup,
+        "overrun": sequence_time - timeline.total,
+        "duration": setup + sequence_time,
+        "samples": samples,
+        "bytes": (samples + 1) * history.bytes_per_row(columns),
+    }
+
+
+def plan_sweep(app, params, history):
+    reading = history.reading_time(params)
+    setup = CONFIG_SETUP + int(params.get("wait_time", 0))
+    if params.get("deplete_voltage") is not None:
+        setup += int(params.get("deplete_time", 0))
+    if params.get("laser_settings"):
+        # configure + light on, stabilize, light off + 1 s after the sweep
+        setup += 3 * LASER_REPLY + int(params.get("laser_stable_time", 0)) + SWEEP_SETTLE
+    setup += SWEEP_SETTLE
+
+    if app == "idvg.py":
+        per_point = params["source_to_measure_delay"] + reading
+    elif app == "idvd.py":
+        per_point = 0.1 + reading
+    else: # idvg_pulse.py: pulse, reading, rest at base_vg
+        per_point = params.get("pulse_width", 0.005) + reading + params.get("rest_time", 0.1)
+    points = int(params["num_points"])
+    sweep_time = points * per_point
+    columns = ("V_D", "V_G", "I_D", "I_G")
+    return {
+        "steps": points,
+        "planned": sweep_time,
+        "setup": setup,
+        "overrun": 0.0,
+        "duration": setup + sweep_time,
+        "samples": points,
+        "bytes": (points + 1) * history.bytes_per_row(columns),
+    }
+
+
+def plan_config(app, config_file, history=None, power_table=None):
+    """Estimate of one config run by app (script name, e.g. "time_dep_servo_app.py")."""
+    history = history or History()
+    with open(config_file) as f:
+        params = json.load(f)
+    if app in SWEEP_APPS:
+        plan = plan_sweep(app, params, history)
+    elif app in SEQUENCE_BUILDERS:
+        plan = plan_time_dep(app, params, history, power_table)
+    else:
+        raise ValueError(f"unknown app {app}, one of {', '.join(APPS)}")
+    return {"config": str(config_file), "app": app, **plan}
+
+
+def plan_queue(app, config_files, history=None, power_table=None):
+    """Estimate of the whole config_queue of an app: totals and one plan per config."""
+    history = history or History()
+    configs = [plan_config(app, config_file, history, power_table) for config_file in config_files]
+    return {
+        "app": app,
+        "duration": KEITHLEY_INIT + sum(plan["duration"] for plan in configs),
+        "samples": sum(plan["samples"] for plan in configs),
+        "bytes": sum(plan["bytes"] for plan in configs),
+        "history": bool(history.switch or history.reading),
+        "configs": configs,
+    }
+
+
+def format_duration(seconds):
+    seconds = int(math.ceil(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, seconds = divmod(rest, 60)
+    if hours:
+        return f"{hours} h {minutes:02d} min"
+    if minutes:
+        return f"{minutes} min {seconds:02d} s"
+    return f"{seconds} s"
+
+
+def format_size(n_bytes):
+    for unit in ("B", "kB", "MB"):
+        if n_bytes < 1000:
+            return f"{n_bytes:.0f} {unit}" if unit == "B" else f"{n_bytes:.1f} {unit}"
+        n_bytes /= 1000
+    return f"{n_bytes:.1f} GB"
+
+
+def print_plan(plan):
+    print(f"{'config':<45} {'steps':>6} {'setup':>9} {'sequence':>11} {'+overrun':>9} {'samples':>9} {'csv':>9}")
+    for config in plan["configs"]:
+        print(f"{Path(config['config']).name:<45} {config['steps']:>6} {format_duration(config['setup']):>9} "
+              f"{format_duration(config['planned']):>11} {config['overrun']:>8.1f}s "
+              f"{config['samples']:>9} {format_size(config['bytes']):>9}")
+    finish = datetime.datetime.now() + datetime.timedelta(seconds=plan["duration"])
+    print(f"{plan['app']}: {format_duration(plan['duration'])} in total "
+          f"(ends about {finish:%H:%M} if started now), {plan['samples']} samples, {format_size(plan['bytes'])}"
+          + ("" if plan["history"] else " [no timing history, default latencies]"))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="duration, samples and csv size of a config queue")
+    parser.add_argument("app", choices=APPS, help="script that will run the queue")
+    parser.add_argument("configs", nargs="+", help="config files, in queue order")
+    parser.add_argument("--history", default="data", help="folder with the _timing.json files of earlier runs")
+    parser.add_argument("--json", action="store_true", help="print the plan as json")
+    args = parser.parse_args()
+
+    plan = plan_queue(args.app, args.configs, History(args.history))
+    if args.json:
+        print(json.dumps(plan, indent=4))
+    else:
+        print_plan(plan)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+'''
+power table (calibration/pp_df.csv): target power (nW) -> AOTF pp (%) per wavelength
+
+the measurement apps only need to look up one number per step, importing pandas
+just for that costs them a noticeable part of their start-up time. load_power_table()
+reads the csv written by power.py with the csv module and supports the same lookup:
+    power_table.loc[int(wavelength), str(power_nw)]   # float, KeyError if missing
+'''
+import csv
+import math
+from pathlib import Path
+
+POWER_TABLE_PATH = Path("calibration") / "pp_df.csv"
+
+
+def to_float(text):
+    try:
+        return float(text)
+    except ValueError:
+        return math.nan # empty cell (pandas NaN)
+
+
+class PowerTable:
+    """
+    rows: wavelength (int), columns: target power (str, as in the csv header).
+    power_table.loc[wavelength, power] mirrors DataFrame.loc for the apps' get_pp_exact().
+    """
+    def __init__(self, index, columns, values):
+        self.index = list(index)
+        self.columns = list(columns)
+        self.values = {wl: dict(zip(self.columns, row)) for wl, row in zip(self.index, values)}
+
+    @property
+    def loc(self):
+        return self
+
+    def __getitem__(self, key):
+        wavelength, power = key
+        return self.values[wavelength][power]
+
+
+def load_power_table(path=POWER_TABLE_PATH):
+    with open(path, newline="") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        index, values = [], []
+        for row in reader:
+            if not row:
+                continue
+            index.append(int(float(row[0])))
+            values.append([to_float(v) for v in row[1:]])
+    return PowerTable(index, header[1:], values)
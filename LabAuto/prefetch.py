@@ -0,0 +1,68 @@
+'''
+the next config of a queue, prepared while the current one is still measuring
+
+the worker loops did everything for config N+1 after config N had finished: read the json,
+build the sequence (power table lookups), and the laser only got its wavelength / power at
+the first laser_cmd1 step, queued behind the light switching of the run. ConfigPrefetcher
+loads and builds config N+1 on a background thread as soon as config N enters its tail
+(the last steps without any command, see SequenceExecutor.run(on_tail=)) and sends the laser
+settings of the new sequence ahead to channels that are off (LaserActuator.preconfigure),
+so the laser PC has applied them before the wait_time countdown of N+1 is over.
+the first config of the queue is preconfigured when it is loaded, during its own wait_time.
+
+    prefetcher = ConfigPrefetcher(servo_sequence, power_table, laser_actuator)
+    params, sequence = prefetcher.take(config_file)          # prefetched, or loaded now
+    executor.run(..., on_tail=lambda: prefetcher.prefetch(next_config_file))
+'''
+import json
+import os
+import threading
+
+
+class ConfigPrefetcher:
+    """
+    build: sequence builder(params, power_table) of the app (LabAuto.sequences)
+    laser_actuator: LaserActuator to preconfigure, None for the dark apps
+    prepare: callable(config_file, params) -> params, applied before building (e.g. QueueSchedule.prepare)
+    """
+    def __init__(self, build, power_table=None, laser_actuator=None, prepare=None):
+        self.build = build
+        self.power_table = power_table
+        self.laser_actuator = laser_actuator
+        self.prepare = prepare
+        self.thread = None
+        self.prepared = None # (config_file, mtime, params, sequence)
+
+    def _load(self, config_file):
+        mtime = os.path.getmtime(config_file)
+        with open(config_file, "r") as f:
+            params = json.load(f)
+        if self.prepare is not None:
+            params = self.prepare(config_file, params)
+        sequence = self.build(params, self.power_table)
+        if self.laser_actuator is not None:
+            self.laser_actuator.preconfigure(sequence)
+        return config_file, mtime, params, sequence
+
+    def _prefetch(self, config_file):
+        try:
+            self.prepared = self._load(config_file)
+        except Exception as e: # loaded (and reported) again by take()
+            print(f"Prefetch of {config_file} failed: {e}")
+
+    def prefetch(self, config_file):
+        """Load config_file in the background (None: end of the queue, nothing to do). Returns at once."""
+        if config_file is None or self.thread is not None:
+            return
+        self.thread = threading.Thread(target=self._prefetch, args=(config_file,), name="config-prefetch", daemon=True)
+        self.thread.start()
+
+    def take(self, config_file):
+        """(params, sequence) of config_file: the prefetched ones if the file did not change since, else loaded now."""
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        prepared, self.prepared = self.prepared, None
+        if prepared is not None and prepared[0] == config_file and prepared[1] == os.path.getmtime(config_file):
+            return prepared[2], prepared[3]
+        return self._load(config_file)[2:]
@@ -0,0 +1,101 @@
+'''
+per-phase latency profiler (rolling window + histogram)
+
+usage:
+    from LabAuto.profiler import PROFILER
+    with PROFILER.phase("change_lambda.popup_wait"):
+        get_popup_window(...)
+    PROFILER.stats()  # answered by the laser server to {"cmd": "STATS"}
+'''
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# histogram bucket upper edges in ms (the last bucket is everything above)
+DEFAULT_BUCKETS_MS = (5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+
+def percentile(sorted_values, q):
+    """q in [0, 100], nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    idx = min(len(sorted_values) - 1, max(0, int(round(q / 100 * (len(sorted_values) - 1)))))
+    return sorted_values[idx]
+
+
+class PhaseProfiler:
+    """
+    Keeps the last `window` durations of every named phase.
+    Thread safe (the laser server runs schedules in background threads).
+    """
+    def __init__(self, window=500, buckets_ms=DEFAULT_BUCKETS_MS):
+        self.window = window
+        self.buckets_ms = tuple(buckets_ms)
+        self.samples = {} # name -> deque of seconds
+        self.totals = {}  # name -> total count since the last reset
+        self.lock = threading.Lock()
+
+    def record(self, name, seconds):
+        with self.lock:
+            if name not in self.samples:
+                self.samples[name] = deque(maxlen=self.window)
+                self.totals[name] = 0
+            self.samples[name].append(seconds)
+            self.totals[name] += 1
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - start)
+
+    def reset(self):
+        with self.lock:
+            self.samples.clear()
+            self.totals.clear()
+
+    def histogram(self, values):
+        counts = [0] * (len(self.buckets_ms) + 1)
+        for v in values:
+            ms = v * 1000
+            for i, edge in enumerate(self.buckets_ms):
+                if ms <= edge:
+                    counts[i] += 1
+                    break
+            else:
+                counts[-1] += 1
+        return counts
+
+    def stats(self):
+        """
+        {phase: {"count", "total_count", "mean", "p50", "p90", "p99", "max", "histogram"}}
+        times in seconds over the rolling window, histogram counts per bucket of buckets_ms.
+        """
+        with self.lock:
+            snapshot = {name: list(values) for name, values in self.samples.items()}
+            totals = dict(self.totals)
+        result = {}
+        for name, values in sorted(snapshot.items()):
+            ordered = sorted(values)
+            result[name] = {
+                "count": len(values),
+                "total_count": totals[name],
+                "mean": sum(values) / len(values),
+                "p50": percentile(ordered, 50),
+                "p90": percentile(ordered, 90),
+                "p99": percentile(ordered, 99),
+                "max": ordered[-1],
+                "histogram": self.histogram(values),
+            }
+        return result
+
+    def print_stats(self):
+        print(f"{'phase':<36} {'n':>5} {'mean':>9} {'p50':>9} {'p90':>9} {'max':>9}  (ms)")
+        for name, s in self.stats().items():
+            print(f"{name:<36} {s['count']:>5} {s['mean']*1000:>9.1f} {s['p50']*1000:>9.1f} {s['p90']*1000:>9.1f} {s['max']*1000:>9.1f}")
+
+
+PROFILER = PhaseProfiler()
@@ -0,0 +1,214 @@
+'''
+the config queue of the time-dependent apps (time_dep_*.py), one SequenceExecutor run per config
+
+the apps only connect the instruments, choose their actuators / sampler and shut down;
+everything between is the same for all of them and done here, for every config:
+    wait_time countdown, then data/<prefix>_<device_number>_<run_number>.csv and the
+    _config.json backup next to it; an existing file stops the queue instead of being overwritten
+    --resume: a finished run is skipped, an interrupted one continues from its checkpoint
+              (LabAuto.checkpoint) with the actuators restored to its last completed step
+    Keithley nplc / limits / ranges / Vd of the config, outputs off after the run
+    optional light schedule uploaded to the laser PC ("laser_schedule" of the config)
+    rows written by a BackgroundCSVWriter, the next config prefetched in the tail of the run
+    (LabAuto.prefetch), planned vs actual timing in <csv stem>_timing.json (LabAuto.telemetry)
+--reorder runs the queue in the order of LabAuto.queue_scheduler.QueueSchedule.
+
+    runner = QueueRunner(self.k, "time", time_dep_sequence, self.actuators, DCSampler,
+                         power_table=power_table, laser=self.laser, laser_actuator=self.laser_actuator,
+                         resume=self.resume, reorder=self.reorder, status=self.status_update.emit)
+    runner.run(self.config_files, is_running=lambda: self.running,
+               on_config=self.new_config.emit, samples=self.samples)
+'''
+import json
+import time
+from pathlib import Path
+
+from LabAuto.checkpoint import Checkpoint
+from LabAuto.data_writer import BackgroundCSVWriter
+from LabAuto.laser_schedule import build_light_schedule
+from LabAuto.prefetch import ConfigPrefetcher
+from LabAuto.queue_scheduler import QueueSchedule
+from LabAuto.sequence_executor import SequenceExecutor
+from LabAuto.timeline import Timeline
+
+DATA_DIR = Path("data")
+
+
+class QueueRunner:
+    """
+    k: connected Keithley2636B
+    prefix: start of the data file names (time, time_dark, encoded, ...)
+    build: sequence builder(params, power_table) of the app (LabAuto.sequences)
+    actuators: list of Actuator (LabAuto.sequence_executor)
+    sampler: DCSampler / PulseSampler class, built per config with from_params()
+    laser_actuator: LaserActuator of actuators (preconfigured by the prefetcher), None for the dark apps
+    laser_schedule: the app supports "laser_schedule" configs (all light switching on the laser PC)
+    step_message: status of every step, see SequenceExecutor
+    """
+    def __init__(self, k, prefix, build, actuators, sampler, power_table=None, laser=None,
+                 laser_actuator=None, laser_schedule=False, resume=False, reorder=False,
+                 status=None, step_message=None):
+        self.k = k
+        self.prefix = prefix
+        self.build = build
+        self.actuators = list(actuators)
+        self.sampler = sampler
+        self.power_table = power_table
+        self.laser = laser
+        self.laser_actuator = laser_actuator
+        self.laser_schedule = laser_schedule
+        self.resume = resume
+        self.reorder = reorder
+        self.status = status or (lambda message: None)
+        self.step_message = step_message
+
+    def run(self, config_files, is_running, on_config=None, samples=None):
+        """
+        Measure every config of config_files in turn.
+        is_running: callable, False stops the queue (worker.stop())
+        on_config: callable(config_idx, label) when a config starts (the plot adds its line)
+        samples: SampleRing, gets (config_idx, t, Vd, Vg, Id, Ig) of every sample
+        """
+        config_files = list(config_files)
+        # --reorder: the order of the queue (and of the entries of configs with reorder_channels)
+        # with the fewest laser wavelength / power changes, see LabAuto.queue_scheduler
+        prepare = None
+        if self.reorder:
+            schedule = QueueSchedule(config_files, self.build, self.power_table)
+            schedule.print_report()
+            config_files, prepare = schedule.order, schedule.prepare
+
+        # the next config is loaded (and the laser preconfigured) during the tail of the current one
+        prefetcher = ConfigPrefetcher(self.build, self.power_table, self.laser_actuator, prepare=prepare)
+
+        for config_idx, config_file in enumerate(config_files):
+            if not is_running(): break
+            next_config = config_files[config_idx + 1] if config_idx + 1 < len(config_files) else None
+            if not self.run_config(config_idx, config_file, next_config, prefetcher, is_running, on_config, samples):
+                break
+
+    def run_config(self, config_idx, config_file, next_config, prefetcher, is_running, on_config=None, samples=None):
+        """One config of the queue. Returns False if the queue must stop (data file exists)."""
+        k = self.k
+        # before each measurement, auto zero once
+        k.set_auto_zero_once()
+
+        self.status(f"Loading config: {config_file}...")
+        params, sequence = prefetcher.take(config_file)
+
+        # wait time before measure
+        wait_time = params.get("wait_time", 0)
+        for i in range(wait_time, 0, -1):
+            if not is_running(): break
+            self.status(f"Wait ... {i}s")
+            time.sleep(1)
+
+        # data folder for storing data and backup config files
+        DATA_DIR.mkdir(parents=True, exist_ok=True)
+        device_num = params.get('device_number', '0')
+        run_num = int(params.get('run_number', 1))
+        filename = DATA_DIR / f"{self.prefix}_{device_num}_{run_num}.csv"
+        config_backup = DATA_DIR / f"{self.prefix}_{device_num}_{run_num}_config.json"
+
+        # --resume: continue an interrupted run of this config from its checkpoint
+        checkpoint = Checkpoint.load(filename) if self.resume else None
+        if checkpoint is not None and checkpoint.finished:
+            self.status(f"{filename.name} is already complete, skipping.")
+            return True
+
+        # Overwrite Protection: if the filename already exists, then stop the measurement
+        if checkpoint is None and (filename.exists() or config_backup.exists()):
+            error_msg = f"FILE EXISTS ERROR: {filename.name} already exists. Stopping experiment to prevent overwrite!"
+            print(error_msg)
+            self.status(error_msg)
+            return False
+
+        if checkpoint is None:
+            with open(config_backup, "w") as f_back:
+                json.dump(params, f_back, indent=4)
+
+        # set config parameters from config files
+        k.set_nplc('a', params["nplc_a"])
+        k.set_nplc('b', params["nplc_b"])
+        k.set_limit('a', params["current_limit_a"])
+        k.set_limit('b', params["current_limit_b"])
+        k.set_range('a', params["current_range_a"])
+        k.set_range('b', params["current_range_b"])
+        k.enable_output('a', True)
+        k.enable_output('b', True)
+
+        # set constant Vd
+        vd_const = float(params["vd_const"])
+        k.set_Vd(vd_const)
+
+        label = params.get("label", f"Run {run_num}")
+        if on_config is not None:
+            on_config(config_idx, label)
+
+        # progress after every step; a resumed run restores the actuators (light, shutter)
+        # to the last completed step and appends to the csv from there
+        start_step = 0
+        if checkpoint is None:
+            checkpoint = Checkpoint.new(filename, config_file, sequence)
+        else:
+            checkpoint.check(sequence)
+            start_step = checkpoint.completed_steps
+            if start_step > 0:
+                checkpoint.truncate_csv()
+                self.status(f"Resuming {filename.name} at step {start_step+1}/{len(sequence)}...")
+                for actuator in self.actuators:
+                    actuator.restore(sequence[:start_step])
+
+        timeline, schedule_id = self._start_timeline(params, sequence, start_step)
+        executor_options = {} if self.step_message is None else {"step_message": self.step_message}
+        on_sample = None if samples is None else (lambda *row: samples.append((config_idx, *row)))
+        executor = SequenceExecutor(self.sampler.from_params(k, params), self.actuators, vd_const,
+                                    is_running=is_running, on_sample=on_sample, status=self.status,
+                                    **executor_options)
+        # rows are formatted and written on a background thread, not in the measurement loop
+        with BackgroundCSVWriter(filename, append=start_step > 0) as writer:
+            telemetry = executor.run(timeline, writer, label, start_step=start_step, checkpoint=checkpoint,
+                                     on_tail=lambda: prefetcher.prefetch(next_config))
+        if checkpoint.completed_steps == len(sequence):
+            checkpoint.finish()
+        timing_suffix = "_timing.json" if checkpoint.segment == 1 else f"_timing_{checkpoint.segment}.json"
+        telemetry.print_summary(telemetry.save(filename.with_name(filename.stem + timing_suffix), writer=writer.stats()))
+        writer.print_stats()
+
+        if schedule_id is not None:
+            self._save_schedule_report(schedule_id, filename, is_running())
+
+        k.enable_output('a', False)
+        k.enable_output('b', False)
+        return True
+
+    def _start_timeline(self, params, sequence, start_step):
+        """(started Timeline, id of the uploaded light schedule or None)."""
+        timeline = Timeline(sequence)
+        # optional: upload all laser commands at once, the laser PC runs them on its own clock
+        # (no network/GUI latency on every ON/OFF edge)
+        scheduled = (self.laser_schedule and bool(params.get("laser_schedule", False))
+                     and self.laser is not None and start_step == 0)
+        if self.laser_actuator is not None:
+            self.laser_actuator.scheduled = scheduled
+        if not scheduled:
+            return timeline.start_from(start_step), None
+        self.status("Uploading light schedule to the laser PC...")
+        schedule_id, start_time = self.laser.upload_schedule(build_light_schedule(sequence), lead_time=1.0)
+        time.sleep(max(0.0, start_time - time.time()))
+        timeline.start_at_epoch(start_time) # stay on the same timeline as the laser PC
+        return timeline, schedule_id
+
+    def _save_schedule_report(self, schedule_id, filename, completed):
+        """timing of every light edge on the laser PC, in <csv stem>_laser_edges.json."""
+        if not completed:
+            self.laser.cancel_schedule(schedule_id)
+        report = self.laser.schedule_report(schedule_id, wait=True, timeout=10)
+        edges_file = filename.with_name(filename.stem + "_laser_edges.json")
+        with open(edges_file, "w") as f_edges:
+            json.dump(report, f_edges, indent=4)
+        late = [edge["late"] for edge in report["edges"]]
+        if late:
+            print(f"Light schedule: {len(late)} edges, max late {max(late)*1000:.1f} ms")
+        if self.laser_actuator is not None:
+            self.laser_actuator.scheduled = False
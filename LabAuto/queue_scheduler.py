@@ -0,0 +1,238 @@
+'''
+optional reordering of a config queue, so the laser changes wavelength / power less often
+
+a queue runs in the listed order, a power series listed as 660 nm 100 / 532 nm 100 /
+660 nm 300 / 532 nm 300 retunes the AOTF at every config. QueueSchedule counts the
+wavelength / power changes of the laser_cmd1 steps of every config (the laser PC keeps the
+setting of every channel between configs) and looks for an order, allowed by the
+constraints of the configs, that needs fewer of them:
+    "after": ["FORMAL_a.json", ...]   run only after these configs of the queue (file names)
+    "independent": true              may be moved past other runs of the same device (by
+                                     default the runs of one device_number keep their order)
+    "reorder_channels": true         the channel_arr / wavelength_arr / power_arr entries may
+                                     run in another order inside every cycle
+the order is a greedy search from every possible first config; the listed order is kept
+unless another one needs strictly fewer changes.
+
+    schedule = QueueSchedule(config_files, servo_sequence, power_table)
+    schedule.order                                    # config files in run order
+    params = schedule.prepare(config_file, params)    # entries in the chosen order (ConfigPrefetcher prepare=)
+
+    python -m LabAuto.queue_scheduler time_dep_servo_app.py config/a.json config/b.json
+'''
+import argparse
+import itertools
+import json
+from pathlib import Path
+
+from LabAuto.sequences import SEQUENCE_BUILDERS
+
+WAVELENGTH_COST = 2.0 # AOTF retune + settling
+POWER_COST = 1.0
+ENTRY_KEYS = ("channel_arr", "wavelength_arr", "power_arr")
+MAX_PERMUTED_ENTRIES = 6 # all orders of up to 6 entries are tried, greedy above
+
+
+class NominalPowers:
+    """Power table stand-in without calibration: the nW value itself (same value <=> same pp)."""
+    class _Loc:
+        def __getitem__(self, key):
+            return float(key[1])
+
+    loc = _Loc()
+
+
+def laser_changes(sequence, state):
+    """Cost of the laser_cmd1 steps of sequence from state {channel: {key: value}} (updated in place)."""
+    cost = 0.0
+    for step in sequence:
+        laser_cmd1 = step.get("laser_cmd1")
+        if not laser_cmd1:
+            continue
+        current = state.setdefault(laser_cmd1["channel"], {})
+        for key, value in laser_cmd1.items():
+            if key != "channel" and current.get(key) != value:
+                cost += WAVELENGTH_COST if key == "wavelength" else POWER_COST
+                current[key] = value
+    return cost
+
+
+def settings(sequence):
+    """Multiset of the laser settings of a sequence (a reordering must not change it)."""
+    return sorted(tuple(sorted((k, str(v)) for k, v in step["laser_cmd1"].items()))
+                  for step in sequence if step.get("laser_cmd1"))
+
+
+def permute_entries(params, order):
+    params = dict(params)
+    for key in ENTRY_KEYS:
+        if key in params:
+            params[key] = [params[key][i] for i in order]
+    params["channel_order"] = list(order)
+    return params
+
+
+class QueueSchedule:
+    """
+    config_files: the queue as listed
+    build: sequence builder of the app (LabAuto.sequences)
+    power_table: calibration, None compares the nominal nW values
+    """
+    def __init__(self, config_files, build, power_table=None):
+        self.config_files = list(config_files)
+        self.build = build
+        self.power_table = power_table if power_table is not None else NominalPowers()
+        self.params = []
+        for config_file in self.config_files:
+            with open(config_file, "r") as f:
+                self.params.append(json.load(f))
+        self.predecessors = self._constraints()
+        self.entry_orders = {} # config index -> entry order (only if not the listed one)
+        self.memo = {} # (config index, state, reorder) -> _config_cost()
+
+        listed = list(range(len(self.config_files)))
+        self.listed_cost = self._cost(listed, reorder=False)[0] if self._allowed(listed) else None
+        self.indices, self.cost = self._search()
+        self.order = [self.config_files[i] for i in self.indices]
+
+    # --- constraints ---
+    def _constraints(self):
+        names = {}
+        for i, config_file in enumerate(self.config_files):
+            names.setdefault(Path(config_file).name, i)
+            names.setdefault(Path(config_file).stem, i)
+        predecessors = [set() for _ in self.config_files]
+        for j, params in enumerate(self.params):
+            for name in params.get("after", []):
+                if name not in names:
+                    print(f"Warning: {Path(self.config_files[j]).name} runs after {name}, which is not in the queue.")
+                    continue
+                predecessors[j].add(names[name])
+            for i in range(j):
+                same_device = str(self.params[i].get("device_number")) == str(params.get("device_number"))
+                if same_device and not (self.params[i].get("independent") or params.get("independent")):
+                    predecessors[j].add(i)
+        return predecessors
+
+    def _allowed(self, indices):
+        placed = set()
+        for i in indices:
+            if not self.predecessors[i] <= placed:
+                return False
+            placed.add(i)
+        return True
+
+    # --- cost ---
+    def _config_cost(self, i, state, reorder=True):
+        """(cost, state after, entry order) of config i from state, with its best entry order."""
+        key = (i, tuple(sorted((channel, tuple(sorted(values.items()))) for channel, values in state.items())), reorder)
+        if key not in self.memo:
+            self.memo[key] = self._best_entry_order(i, state, reorder)
+        cost, after, order = self.memo[key]
+        return cost, {channel: dict(values) for channel, values in after.items()}, order
+
+    def _best_entry_order(self, i, state, reorder):
+        params = self.params[i]
+        n = len(params.get("wavelength_arr", []))
+        candidates = [None]
+        if reorder and params.get("reorder_channels") and n > 1:
+            if n <= MAX_PERMUTED_ENTRIES:
+                candidates += [order for order in itertools.permutations(range(n)) if list(order) != list(range(n))]
+            else:
+                candidates.append(self._greedy_entries(params, state))
+        reference = settings(self.build(params, self.power_table))
+        best = None
+        for order in candidates:
+            sequence = self.build(params if order is None else permute_entries(params, order), self.power_table)
+            if order is not None and settings(sequence) != reference:
+                continue # the app does not run every entry (encoder), keep the listed one
+            after = {channel: dict(values) for channel, values in state.items()}
+            cost = laser_changes(sequence, after)
+            if best is None or cost < best[0]:
+                best = (cost, after, order)
+        return best
+
+    def _greedy_entries(self, params, state):
+        """Next entry = the one with the fewest changes from the current settings (long arrays)."""
+        state = {channel: dict(values) for channel, values in state.items()}
+        left = list(range(len(params["wavelength_arr"])))
+        order = []
+        while left:
+            def entry_cost(i):
+                one = permute_entries(dict(params, cycle_number=1), [i])
+                return laser_changes(self.build(one, self.power_table), {c: dict(v) for c, v in state.items()})
+            i = min(left, key=lambda i: (entry_cost(i), i))
+            laser_changes(self.build(permute_entries(dict(params, cycle_number=1), [i]), self.power_table), state)
+            order.append(i)
+            left.remove(i)
+        return tuple(order)
+
+    def _cost(self, indices, reorder=True):
+        state = {}
+        total = 0.0
+        entry_orders = {}
+        for i in indices:
+            cost, state, order = self._config_cost(i, state, reorder)
+            total += cost
+            if order is not None:
+                entry_orders[i] = order
+        return total, entry_orders
+
+    # --- search ---
+    def _greedy(self, first):
+        order = [first]
+        state = self._config_cost(first, {})[1]
+        left = [i for i in range(len(self.config_files)) if i != first]
+        while left:
+            placed = set(order)
+            ready = [i for i in left if self.predecessors[i] <= placed]
+            if not ready:
+                raise ValueError("the \"after\" / device order constraints of the queue form a cycle")
+            best = min(ready, key=lambda i: (self._config_cost(i, state)[0], i))
+            state = self._config_cost(best, state)[1]
+            order.append(best)
+            left.remove(best)
+        return order
+
+    def _search(self):
+        listed = list(range(len(self.config_files)))
+        best_indices, best_cost = None, None
+        if self.listed_cost is not None:
+            best_indices = listed
+            best_cost, self.entry_orders = self._cost(listed)
+        for first in listed:
+            if self.predecessors[first]:
+                continue
+            indices = self._greedy(first)
+            cost, entry_orders = self._cost(indices)
+            if best_cost is None or cost < best_cost:
+                best_indices, best_cost, self.entry_orders = indices, cost, entry_orders
+        if best_indices is None:
+            raise ValueError("the \"after\" / device order constraints of the queue form a cycle")
+        return best_indices, best_cost
+
+    def prepare(self, config_file, params):
+        """params of config_file with its entries in the chosen order (unchanged if none)."""
+        for i, listed_file in enumerate(self.config_files):
+            if listed_file == config_file and i in self.entry_orders:
+                return permute_entries(params, self.entry_orders[i])
+        return params
+
+    def print_report(self):
+        listed = "not allowed" if self.listed_cost is None else f"{self.listed_cost:g}"
+        print(f"Queue order: {self.cost:g} laser changes (listed order: {listed})")
+        for n, i in enumerate(self.indices):
+            entries = f", entries {list(self.entry_orders[i])}" if i in self.entry_orders else ""
+            print(f"  {n + 1}. {Path(self.config_files[i]).name}{entries}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="order of a config queue with the fewest laser wavelength / power changes")
+    parser.add_argument("app", choices=tuple(SEQUENCE_BUILDERS), help="script that will run the queue")
+    parser.add_argument("configs", nargs="+", help="config files, in the listed order")
+    args = parser.parse_args()
+    QueueSchedule(args.configs, SEQUENCE_BUILDERS[args.app]).print_report()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+'''
+ring buffer of samples shared between a measurement worker (QThread) and the GUI
+
+a pyqtSignal per sample is a queued cross-thread call plus a python slot call, the GUI
+work grows with the sample rate (the apps only emitted every 0.2 s to keep up, so the
+plot skipped most of the data). SampleRing is a preallocated numpy array written by the
+worker; the GUI reads every new row as one block on a QTimer at a fixed frame rate.
+
+one writer, one reader, no lock: the writer fills the row first and then publishes it by
+incrementing `count` (one aligned 8-byte store), the reader only reads rows
+below the count it saw. if the reader falls more than `capacity` rows behind, the oldest
+rows are overwritten and reported as dropped.
+
+    ring = SampleRing(columns=("config_idx", "t", "Vd", "Vg", "Id", "Ig"))
+    ring.append((config_idx, t, vd, vg, i_d, i_g))          # worker
+    cursor, block, dropped = ring.read(cursor)              # GUI timer, block: (n, 6) array
+
+the ring can live in multiprocessing.shared_memory (count in an int64 header in front
+of the rows), so an acquisition process can publish to a GUI process the same way
+(see LabAuto.acquisition_process):
+    ring = SampleRing.create_shared(columns)       # GUI process, pass ring.spec() to the child
+    ring = SampleRing.attach(spec)                 # acquisition process
+'''
+import numpy as np
+
+
+HEADER_BYTES = 8 # int64: rows ever written
+
+
+class SampleRing:
+    """
+    columns: names of the values of one row (all stored as float)
+    capacity: rows kept, the reader must read at least this often
+    buffer: memory to use (shared memory), default a private bytearray
+    """
+    def __init__(self, columns, capacity=1 << 16, buffer=None):
+        self.columns = tuple(columns)
+        self.capacity = capacity
+        self.shm = None
+        if buffer is None:
+            buffer = bytearray(self.nbytes(len(self.columns), capacity))
+        self.header = np.ndarray((1,), dtype=np.int64, buffer=buffer)
+        self.data = np.ndarray((capacity, len(self.columns)), dtype=float, buffer=buffer, offset=HEADER_BYTES)
+
+    @staticmethod
+    def nbytes(n_columns, capacity):
+        return HEADER_BYTES + capacity * n_columns * 8
+
+    @classmethod
+    def create_shared(cls, columns, capacity=1 << 16):
+        from multiprocessing import shared_memory
+        shm = shared_memory.SharedMemory(create=True, size=cls.nbytes(len(columns), capacity))
+        ring = cls(columns, capacity, shm.buf)
+        ring.shm = shm
+        ring.header[0] = 0
+        return ring
+
+    @classmethod
+    def attach(cls, spec):
+        """spec: ring.spec() of a ring made by create_shared() (another process)."""
+        from multiprocessing import shared_memory
+        shm = shared_memory.SharedMemory(name=spec["name"])
+        ring = cls(spec["columns"], spec["capacity"], shm.buf)
+        ring.shm = shm
+        return ring
+
+    def spec(self):
+        return {"name": self.shm.name, "columns": self.columns, "capacity": self.capacity}
+
+    def close(self, unlink=False):
+        """Release the shared memory (unlink: the creating process, when nobody uses it any more)."""
+        if self.shm is None:
+            return
+        # numpy views keep the buffer exported, drop them first
+        self.header = self.data = None
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+        self.shm = None
+
+    @property
+    def count(self):
+        """Rows ever written."""
+        return int(self.header[0])
+
+    def append(self, row):
+        count = int(self.header[0])
+        self.data[count % self.capacity] = row
+        # publish after the row is complete
+        self.header[0] = count + 1
+
+    def read(self, cursor):
+        """
+        Rows written since cursor (value returned by the previous read, 0 at the start).
+        Returns (new cursor, (n, n_columns) array copy, number of rows lost to an overrun).
+        """
+        count = self.count
+        dropped = 0
+        if count - cursor > self.capacity:
+            dropped = count - self.capacity - cursor
+            cursor = count - self.capacity
+        if count == cursor:
+            return cursor, self.data[:0].copy(), 0
+        start = cursor % self.capacity
+        end = count % self.capacity
+        if start < end:
+            block = self.data[start:end].copy()
+        else:
+            block = np.concatenate((self.data[start:], self.data[:end]))
+        # rows overwritten while copying (writer lapped the reader meanwhile) are not trusted
+        overrun = self.count - self.capacity - cursor
+        if overrun > 0:
+            block = block[overrun:]
+            dropped += overrun
+        return count, block, dropped
@@ -2,13 +2,16 @@ import os
 import subprocess
 import sys
 from LabAuto.network import create_server, Connection
-import signal
 import platform
 
 import threading
+from LabAuto.supervisor import Supervisor
+from LabAuto.warm_pool import WarmPool
 
-processes = {}  # {script_name: subprocess.Popen}
+supervisor = Supervisor()  # every script started by this server (thread safe)
+launch_lock = threading.Lock()  # "already running?" check + start is one step for all client threads
 SERVER_SCRIPT_NAME = None  # will be set when needed
+warm_pool = None  # WarmPool, see enable_warm_pool()
 
 
 def set_server_name(name: str):
@@ -17,12 +20,25 @@ def set_server_name(name: str):
     SERVER_SCRIPT_NAME = name
 
 
-def run_script(script_name: str):
+def enable_warm_pool(size: int = 1, capture: bool = False):
+    """
+    Keep `size` interpreters with the heavy imports loaded, RUN with "warm": true uses them.
+    capture: the warm workers have no terminal window, their output is kept for TAIL.
+    """
+    global warm_pool
+    if warm_pool is None:
+        warm_pool = WarmPool(size=size, output="pipe" if capture else None)
+        warm_pool.start()
+    return warm_pool
+
+
+def run_script(script_name: str, capture: bool = False, warm: bool = False):
     """
     Start a Python script if not already running.
     Assumes the script is in the same folder as the server.
+    capture: run it without a terminal window, its output is kept for TAIL.
+    warm: hand it to a pre-warmed interpreter (enable_warm_pool() first), starts in well under a second.
     """
-    global processes
     full_path = os.path.join(os.path.abspath('.'), script_name)
 
     if script_name == SERVER_SCRIPT_NAME:
@@ -31,44 +47,55 @@ def run_script(script_name: str):
     if not os.path.exists(full_path):
         return {"status": "error", "message": "SCRIPT_NOT_FOUND"}
 
-    if script_name in processes and processes[script_name].poll() is None:
-        return {"status": "error", "message": "SCRIPT_ALREADY_RUNNING"}
-    
-    python_executable = sys.executable
-    # choose method based on OS
-    system = platform.system()
-
-    if system == "Darwin":  # macOS
-        applescript = f'''
-        tell application "iTerm"
-            create window with default profile
-            tell current window
-                tell current session
-                    write text "{python_executable} {full_path}"
+    with launch_lock:
+        if supervisor.is_running(script_name):
+            return {"status": "error", "message": "SCRIPT_ALREADY_RUNNING"}
+
+        python_executable = sys.executable
+
+        if warm and warm_pool is not None:
+            proc = warm_pool.run(full_path)
+            supervisor.add(script_name, proc, captured=warm_pool.output == "pipe")
+            return {"status": "ok", "message": f"{script_name} started (warm)", "pid": proc.pid}
+
+        if capture:
+            mp = supervisor.start_captured(script_name, [python_executable, full_path], cwd=os.path.abspath('.'))
+            return {"status": "ok", "message": f"{script_name} started", "pid": mp.proc.pid}
+
+        # choose method based on OS
+        system = platform.system()
+
+        if system == "Darwin":  # macOS
+            applescript = f'''
+            tell application "iTerm"
+                create window with default profile
+                tell current window
+                    tell current session
+                        write text "{python_executable} {full_path}"
+                    end tell
                 end tell
             end tell
-        end tell
-        '''
-        proc = subprocess.Popen(
-            ["osascript", "-e", applescript],
-            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
-        )
-
-    # elif system == "Windows":
-    #     proc = subprocess.Popen(
-    #     ["conda", "run", "-n", "myenv", "python", full_path],
-    #     creationflags=subprocess.CREATE_NEW_CONSOLE
-    # )
-    elif system == "Windows": 
-        proc = subprocess.Popen( [python_executable, full_path], creationflags=subprocess.CREATE_NEW_CONSOLE )
-
-
-    else:  # Linux
-        proc = subprocess.Popen(
-            ["gnome-terminal", "--", python_executable, full_path]
-        )
-
-    processes[script_name] = proc
+            '''
+            proc = subprocess.Popen(
+                ["osascript", "-e", applescript],
+                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+            )
+
+        # elif system == "Windows":
+        #     proc = subprocess.Popen(
+        #     ["conda", "run", "-n", "myenv", "python", full_path],
+        #     creationflags=subprocess.CREATE_NEW_CONSOLE
+        # )
+        elif system == "Windows": 
+            proc = subprocess.Popen( [python_executable, full_path], creationflags=subprocess.CREATE_NEW_CONSOLE )
+
+
+        else:  # Linux
+            proc = subprocess.Popen(
+                ["gnome-terminal", "--", python_executable, full_path]
+            )
+
+        supervisor.add(script_name, proc)
     return {"status": "ok", "message": f"{script_name} started"}
 
 
@@ -76,19 +103,10 @@ def kill_script(script_name: str):
     """
     Kill a running Python script.
     """
-    global processes
-
     if script_name == SERVER_SCRIPT_NAME:
         return {"status": "error", "message": "CANNOT_KILL_SERVER"}
 
-    if script_name in processes:
-        proc = processes[script_name]
-        if proc.poll() is None:  # still running
-            if platform.system() == "Windows":
-                subprocess.call(["taskkill", "/F", "/T", "/PID", str(proc.pid)])
-            else:  # macOS / Linux
-                os.kill(proc.pid, signal.SIGTERM)
-        del processes[script_name]
+    if supervisor.stop(script_name):
         return {"status": "ok", "message": f"{script_name} killed"}
 
     return {"status": "error", "message": "SCRIPT_NOT_RUNNING"}
@@ -96,9 +114,31 @@ def kill_script(script_name: str):
 
 def kill_all_scripts():
     """Kill all tracked scripts."""
-    for name in list(processes.keys()):
-        kill_script(name)
+    supervisor.stop_all()
     return {"status": "ok", "message": "ALL_STOPPED"}
+
+
+def script_status(script_name: str):
+    """alive / exit code / uptime / CPU % / RSS (MB) of one script."""
+    mp = supervisor.get(script_name)
+    if mp is None:
+        return {"status": "error", "message": "SCRIPT_NOT_FOUND"}
+    return {"status": "ok", "process": mp.status()}
+
+
+def list_scripts():
+    return {"status": "ok", "processes": supervisor.list()}
+
+
+def tail_script(script_name: str, lines: int = 50, stream=None):
+    """Last printed lines of a script started with capture (stream: "stdout" / "stderr" / None)."""
+    mp = supervisor.get(script_name)
+    if mp is None:
+        return {"status": "error", "message": "SCRIPT_NOT_FOUND"}
+    if not mp.captured:
+        return {"status": "error", "message": "OUTPUT_NOT_CAPTURED"}
+    return {"status": "ok", "lines": mp.tail(int(lines), stream), "alive": mp.alive()}
+
 def handle_client(conn: Connection):
     """
     Handle a single TCP client connection.
@@ -118,11 +158,20 @@ def handle_client(conn: Connection):
             target = data.get("target", "")
 
             if cmd_type == "RUN":
-                response = run_script(target)
+                response = run_script(target, capture=data.get("capture", False), warm=data.get("warm", False))
 
             elif cmd_type == "KILL":
                 response = kill_script(target)
 
+            elif cmd_type == "STATUS":
+                response = script_status(target)
+
+            elif cmd_type == "LIST":
+                response = list_scripts()
+
+            elif cmd_type == "TAIL":
+                response = tail_script(target, data.get("lines", 50), data.get("stream"))
+
             elif cmd_type == "QUIT":
                 # Just stop THIS CLIENT, not the server
                 response = {"status": "ok", "message": "Client disconnected"}
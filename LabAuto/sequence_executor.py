@@ -0,0 +1,330 @@
+'''
+one measurement loop for every time-dependent app (time_dep_*.py)
+
+a sequence step is {"Vg": .., "duration": .., optional "laser_cmd1" / "laser_cmd2" / "laser_cmd3"}.
+SequenceExecutor runs it on a LabAuto.timeline.Timeline (absolute deadlines):
+    at the step start  -> every actuator applies its part of the step (Keithley Vg, laser, servo)
+    until the deadline -> the sampler takes readings, written to the csv with the actuator states
+the apps only build the sequence and choose their actuators / sampler (the config queue
+around the runs is LabAuto.queue_runner.QueueRunner):
+    time_dep_app             VgActuator, LaserActuator                 DCSampler
+    time_dep_dark_app        VgActuator                                DCSampler
+    time_dep_dark_pulse_app  -                                         PulseSampler (sets Vg itself)
+    time_dep_servo_app       VgActuator, LaserActuator, ServoActuator  DCSampler
+    time_dep_servo_pulse_app LaserActuator, ServoActuator              PulseSampler (sets Vg itself)
+    time_dep_servo_encode_app VgActuator, LaserActuator, ServoActuator DCSampler
+'''
+import time
+
+from LabAuto.telemetry import StepTelemetry
+
+
+class Actuator:
+    """
+    Something switched at the start of a step.
+    columns: names of the state columns it adds to every csv row.
+    """
+    columns = ()
+
+    def apply(self, step):
+        pass
+
+    def state(self):
+        return ()
+
+    def shutdown(self):
+        """Bring the hardware to a safe state (end of the run or error)."""
+        pass
+
+    def restore(self, steps):
+        """Bring the hardware to the state after steps (resumed run, see LabAuto.checkpoint)."""
+        pass
+
+
+class VgActuator(Actuator):
+    """Keithley gate voltage, only written when it changes."""
+    def __init__(self, k):
+        self.k = k
+        self.applied = None
+
+    def apply(self, step):
+        if step["Vg"] != self.applied:
+            self.k.set_Vg(step["Vg"])
+            self.applied = step["Vg"]
+
+    def restore(self, steps):
+        self.applied = None # set again by the next step
+
+
+class LaserActuator(Actuator):
+    """
+    laser_cmd1 (wavelength / power) and laser_cmd2 (set_on) of a step, sent without waiting for the reply.
+    scheduled: the laser PC runs an uploaded light schedule, only the light state is tracked here.
+    preconfigured: laser_cmd1 sent ahead by preconfigure() (next config), not sent again by apply()
+    """
+    columns = ("Light_State",)
+
+    def __init__(self, laser, status=None):
+        self.laser = laser
+        self.status = status or (lambda message: None)
+        self.light_state = 0 # 0: dark, 1: light
+        self.channel = None
+        self.scheduled = False
+        self.preconfigured = {} # channel -> laser_cmd1
+
+    def apply(self, step):
+        laser_cmd1 = step.get("laser_cmd1")
+        laser_cmd2 = step.get("laser_cmd2")
+        if laser_cmd1:
+            self.status("Configuring laser...")
+            sent_ahead = self.preconfigured.pop(laser_cmd1["channel"], None) == laser_cmd1
+            if not self.scheduled and not sent_ahead:
+                self.laser.send_cmd(laser_cmd1, wait_for_reply=False)
+        if laser_cmd2:
+            self.status("Toggling laser ON/OFF...")
+            self.channel = laser_cmd2["channel"]
+            if not self.scheduled:
+                self.laser.send_cmd(laser_cmd2, wait_for_reply=False)
+            # the intent of the light state, so the csv knows what is happening
+            self.light_state = int(laser_cmd2["set_on"])
+
+    def state(self):
+        return (self.light_state,)
+
+    def preconfigure(self, steps):
+        """
+        Send the first laser_cmd1 of every channel used by steps now, in one batch (the next
+        config, while the current one is in its tail or waiting). The channel that is on is left alone.
+        """
+        items = {}
+        for step in steps:
+            laser_cmd1 = step.get("laser_cmd1")
+            if laser_cmd1 and laser_cmd1["channel"] not in items:
+                items[laser_cmd1["channel"]] = laser_cmd1
+        if self.light_state and self.channel in items:
+            del items[self.channel]
+        if not items:
+            return
+        self.laser.send_batch(list(items.values()), wait_for_reply=False)
+        self.preconfigured.update(items)
+
+    def restore(self, steps):
+        # last power / wavelength command of every channel and the last ON/OFF command
+        self.preconfigured.clear()
+        settings = {}
+        last_switch = None
+        for step in steps:
+            laser_cmd1 = step.get("laser_cmd1")
+            if laser_cmd1:
+                settings[(laser_cmd1["channel"], tuple(sorted(k for k in laser_cmd1 if k != "channel")))] = laser_cmd1
+            if step.get("laser_cmd2"):
+                last_switch = step["laser_cmd2"]
+        self.status("Restoring laser state...")
+        for laser_cmd1 in settings.values():
+            self.laser.send_cmd(laser_cmd1)
+        if last_switch is not None:
+            self.channel = last_switch["channel"]
+            self.laser.send_cmd(last_switch)
+            self.light_state = int(last_switch["set_on"])
+
+    def shutdown(self):
+        # stop the measurement -> turn off the light
+        if self.light_state and self.channel is not None:
+            self.laser.send_cmd({"channel": self.channel, "set_on": 0}, wait_for_reply=False)
+            self.light_state = 0
+
+
+class ServoActuator(Actuator):
+    """Physical shutter, laser_cmd3 toggles it."""
+    columns = ("Servo_State",)
+
+    def __init__(self, servo, status=None):
+        self.servo = servo
+        self.status = status or (lambda message: None)
+        self.servo_state = 0 # 0: blocked, 1: unblocked
+
+    def apply(self, step):
+        if step.get("laser_cmd3"):
+            self.status("Toggling Physical Shutter...")
+            if self.servo:
+                self.servo.toggle_light()
+            self.servo_state = 1 - self.servo_state
+
+    def state(self):
+        return (self.servo_state,)
+
+    def restore(self, steps):
+        self.servo_state = sum(1 for step in steps if step.get("laser_cmd3")) % 2
+        if self.servo and bool(self.servo.is_on) != bool(self.servo_state):
+            self.status("Restoring physical shutter...")
+            self.servo.toggle_light()
+
+    def shutdown(self):
+        if self.servo and self.servo.is_on:
+            self.status("Closing physical shutter...")
+            self.servo.toggle_light() # Force it back to the OFF angle
+
+
+class DCSampler:
+    """One Keithley reading at the applied Vg. sample() returns (recorded Vg, I_D, I_G) or None."""
+    def __init__(self, k):
+        self.k = k
+
+    @classmethod
+    def from_params(cls, k, params):
+        return cls(k)
+
+    def start_step(self, step):
+        pass
+
+    def sample(self, step):
+        reading = self.k.measure()
+        if reading is None or len(reading) != 2 or reading[0] is None:
+            return None
+        return step["Vg"], reading[0], reading[1]
+
+
+class PulseSampler:
+    """
+    Single-pulse relaxation: the first reading of a step is a pulse to the step Vg
+    (pulse_width seconds), then the current is tracked at base_vg.
+    """
+    def __init__(self, k, base_vg=0.0, pulse_width=0.005, debug=True):
+        self.k = k
+        self.base_vg = base_vg
+        self.pulse_width = pulse_width
+        self.debug = debug
+        self.pulse_fired = False
+
+    @classmethod
+    def from_params(cls, k, params):
+        """base_vg (V) and pulse_width_ms of the config."""
+        return cls(k, float(params.get("base_vg", 0.0)), float(params.get("pulse_width_ms", 5.0)) / 1000.0)
+
+    def start_step(self, step):
+        self.pulse_fired = False
+
+    def sample(self, step):
+        if not self.pulse_fired:
+            reading = self.k.measure_pulsed_vg(step["Vg"], self.base_vg, self.pulse_width)
+            if self.debug:
+                print(f"DEBUG: Pulse fired. Target: {step['Vg']}V, Width: {self.pulse_width}s. Reading = {reading}")
+            self.pulse_fired = True
+            recorded_vg = step["Vg"] # Record the spike in the CSV
+        else:
+            reading = self.k.measure_pulsed_vg(self.base_vg, self.base_vg, 0.01)
+            recorded_vg = self.base_vg # Record the resting voltage in the CSV
+        if reading is None or len(reading) != 2 or reading[0] is None:
+            return None
+        return recorded_vg, reading[0], reading[1]
+
+
+class SequenceExecutor:
+    """
+    sampler: DCSampler / PulseSampler
+    actuators: list of Actuator, applied in this order at every step start
+    is_running: callable, False stops the run (worker.stop())
+    on_sample: callable(t, Vd, Vg, Id, Ig), every sample (e.g. SampleRing.append for the plot),
+               or at most every emit_interval seconds if it is slow (a Qt signal)
+    status: callable(str), status line of the GUI
+    step_message: format of the status at every step, fields: label, n, total, vg
+    """
+    def __init__(self, sampler, actuators, vd_const, is_running, on_sample=None, status=None,
+                 emit_interval=0.0, step_message="[{label}] Step {n}/{total}: Measuring..."):
+        self.sampler = sampler
+        self.actuators = list(actuators)
+        self.vd_const = vd_const
+        self.is_running = is_running
+        self.on_sample = on_sample
+        self.status = status or (lambda message: None)
+        self.emit_interval = emit_interval
+        self.step_message = step_message
+
+    def header(self):
+        columns = ["Time", "V_D", "V_G", "I_D", "I_G"]
+        for actuator in self.actuators:
+            columns.extend(actuator.columns)
+        return columns
+
+    def run(self, timeline, writer, label="", start_step=0, checkpoint=None, on_tail=None):
+        """
+        Execute the steps of a started timeline, rows go to writer (csv.writer / BackgroundCSVWriter).
+        start_step: first step (resumed run: no csv header, the timeline started with start_from())
+        checkpoint: LabAuto.checkpoint.Checkpoint, updated after every completed step
+        on_tail: callable, called once (must return at once) when the remaining steps have no
+                 laser / servo command any more, e.g. ConfigPrefetcher.prefetch of the next config
+        Returns the StepTelemetry of the run (planned vs actual timing).
+        """
+        telemetry = StepTelemetry(timeline)
+        # first step after the last one with a command
+        tail_start = max((i + 1 for i, actions in enumerate(timeline.actions) if actions), default=0)
+        if start_step == 0:
+            writer.writerow(self.header())
+        if checkpoint is not None:
+            checkpoint.begin_segment(start_step, timeline.offsets[start_step])
+            self._checkpoint(writer, checkpoint, start_step)
+        # hot loop: look everything up once
+        sampler_sample = self.sampler.sample
+        vd_const = self.vd_const
+        is_running = self.is_running
+        on_sample = self.on_sample
+        emit_interval = self.emit_interval
+        total = len(timeline)
+
+        for step_idx in range(start_step, total):
+            step = timeline.steps[step_idx]
+            if not is_running(): break
+            timeline.wait_step_start(step_idx)
+            telemetry.start_step(step_idx)
+
+            for actuator in self.actuators:
+                actuator.apply(step)
+            telemetry.switched()
+            if on_tail is not None and step_idx >= tail_start:
+                on_tail()
+                on_tail = None
+            self.sampler.start_step(step)
+            self.status(self.step_message.format(label=label, n=step_idx + 1, total=total, vg=step["Vg"]))
+
+            # the actuator states only change at the step start
+            states = [value for actuator in self.actuators for value in actuator.state()]
+            last_emit_time = time.perf_counter()
+            # only start a reading that ends before the deadline, the next step waits for the rest
+            while timeline.fits(step_idx):
+                if not is_running(): break
+                with timeline.measuring():
+                    result = sampler_sample(step)
+                if result is None:
+                    continue
+                vg, I_D, I_G = result
+                t = timeline.now()
+                # always update data to csv file
+                writer.writerow([t, vd_const, vg, I_D, I_G, *states])
+                telemetry.count_sample()
+
+                if on_sample is not None:
+                    current_t = time.perf_counter()
+                    if current_t - last_emit_time >= emit_interval:
+                        on_sample(t, vd_const, vg, I_D, I_G)
+                        last_emit_time = current_t
+
+            if checkpoint is not None and is_running():
+                self._checkpoint(writer, checkpoint, step_idx + 1)
+
+        if on_tail is not None and is_running(): # no command-free tail
+            on_tail()
+        telemetry.finish()
+        return telemetry
+
+    @staticmethod
+    def _checkpoint(writer, checkpoint, completed_steps):
+        """Record completed_steps once the rows written so far are on disk."""
+        after_rows = getattr(writer, "after_rows", None)
+        if after_rows is not None:
+            after_rows(lambda csv_bytes: checkpoint.step_done(completed_steps, csv_bytes))
+        else:
+            checkpoint.step_done(completed_steps, None)
+
+    def shutdown(self):
+        for actuator in self.actuators:
+            actuator.shutdown()
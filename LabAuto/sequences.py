@@ -0,0 +1,212 @@
+'''
+measurement sequences of the time-dependent apps, built from their JSON config
+
+a sequence is a list of steps {"Vg": .., "duration": .., optional "laser_cmd1" / "laser_cmd2" /
+"laser_cmd3"} (see LabAuto.timeline). the apps and LabAuto.planner build it with the same
+functions, so a duration estimate is made from the sequence that will actually run.
+
+    sequence = build_sequence("time_dep_servo_app.py", params, power_table)
+'''
+import numpy as np
+
+from LabAuto.line_codes import get_line_code, level_powers
+
+
+def get_pp_exact(power_table, wavelength, power_nw):
+    if power_table is None: # no calibration (the apps warn once), durations do not depend on it
+        return None
+    try:
+        return float(power_table.loc[int(wavelength), str(power_nw)])
+    except KeyError:
+        print(f"Warning: Cannot convert {power_nw}nW to PP for {wavelength}nm.")
+        return None
+
+
+def basic_block(power_table, channel_idx, wavelength, target_power, vg_on, vg_off, duration_1, duration_2, duration_3, duration_4, on_off_number, servo_time=None):
+    """
+    One period at a channel / wavelength / power: dark, configure the laser, then on_off_number light pulses.
+    servo_time: the laser stays on and the physical shutter (laser_cmd3) makes the pulses instead
+    """
+    pp = get_pp_exact(power_table, wavelength, target_power)
+
+    sequence_steps = [
+        {"Vg": vg_off, "duration": duration_1},
+        {"Vg": vg_on, "duration": duration_2, "laser_cmd1": {"channel": channel_idx, "power": pp}}]
+
+    if servo_time:
+        sequence_steps.append({"Vg": vg_on, "duration": duration_3, "laser_cmd2": {"channel": channel_idx, "set_on": 1}})
+        for i in range(on_off_number):
+            sequence_steps.append({"Vg": vg_on, "duration": servo_time, "laser_cmd3": 1})
+            sequence_steps.append({"Vg": vg_on, "duration": servo_time, "laser_cmd3": 1})
+        sequence_steps.append({"Vg": vg_on, "duration": duration_4, "laser_cmd2": {"channel": channel_idx, "set_on": 0}})
+    else:
+        for i in range(on_off_number):
+            sequence_steps.append({"Vg": vg_on, "duration": duration_3, "laser_cmd2": {"channel": channel_idx, "set_on": 1}})
+            sequence_steps.append({"Vg": vg_on, "duration": duration_4, "laser_cmd2": {"channel": channel_idx, "set_on": 0}})
+
+    return sequence_steps
+
+
+def dark_block(vg_on, vg_off, duration_1, duration_2):
+    return [
+        {"Vg": vg_off, "duration": duration_1},
+        {"Vg": vg_on, "duration": duration_2}]
+
+
+def encode_binary_block(power_table, channel_idx, wavelength, target_power, vg_on, vg_off, bit_duration, binary_string):
+    """
+    Translates a string of 1s and 0s into a hardware measurement sequence.
+    1 = Vg ON + Light ON
+    0 = Vg ON + Light OFF
+    """
+    pp = get_pp_exact(power_table, wavelength, target_power)
+    sequence_steps = []
+
+    # Configure the Laser Power ONCE before the transmission starts
+    sequence_steps.append({"Vg": vg_off, "duration": 5, "laser_cmd1": {"channel": channel_idx, "power": pp}})
+    sequence_steps.append({"Vg": vg_off, "duration": 5, "laser_cmd2": {"channel": channel_idx, "set_on": 1}})
+
+    for bit in str(binary_string):
+        if bit == '1':
+            # Bit 1: Apply Vg, the shutter opens for the second third and closes for the last one
+            sequence_steps.append({"Vg": vg_on, "duration": bit_duration})
+            sequence_steps.append({"Vg": vg_on, "duration": bit_duration, "laser_cmd3": {"channel": channel_idx, "on": 1}})
+            sequence_steps.append({"Vg": vg_on, "duration": bit_duration, "laser_cmd3": {"channel": channel_idx, "on": 1}})
+        elif bit == '0':
+            # Bit 0: Apply Vg, but keep the Light OFF
+            sequence_steps.append({"Vg": vg_on, "duration": bit_duration * 3})
+        else:
+            continue
+
+        # --- THE RETURN-TO-ZERO (REST) STATE ---
+        sequence_steps.append({"Vg": vg_off, "duration": bit_duration})
+
+    sequence_steps.append({"Vg": vg_off, "duration": 5, "laser_cmd2": {"channel": channel_idx, "set_on": 0}})
+    return sequence_steps
+
+
+def line_code_block(power_table, channel_idx, wavelength, powers, vg_on, vg_off, slot_duration, levels):
+    """
+    One slot of slot_duration per entry of levels (LabAuto.line_codes): 0 = dark, k = powers[k - 1] (nW).
+    The laser stays on, the shutter (laser_cmd3 toggles it) opens for a light slot and laser_cmd1
+    changes the power between light levels. Vg stays on from the dark reference to one dark slot
+    after the last one (the photoresponse of the last slot is still measured at vg_on).
+    """
+    pps = [get_pp_exact(power_table, wavelength, power) for power in powers]
+    sequence_steps = []
+
+    # Configure the Laser ONCE, then a dark reference at vg_on (shutter closed)
+    sequence_steps.append({"Vg": vg_off, "duration": 5, "laser_cmd1": {"channel": channel_idx, "power": pps[-1]}})
+    sequence_steps.append({"Vg": vg_on, "duration": 5, "laser_cmd2": {"channel": channel_idx, "set_on": 1}})
+
+    shutter_open, power_level = False, len(pps)
+    for level in levels:
+        step = {"Vg": vg_on, "duration": slot_duration}
+        if level and level != power_level:
+            step["laser_cmd1"] = {"channel": channel_idx, "power": pps[level - 1]}
+            power_level = level
+        if bool(level) != shutter_open:
+            step["laser_cmd3"] = {"channel": channel_idx, "on": int(bool(level))}
+            shutter_open = bool(level)
+        sequence_steps.append(step)
+
+    guard_step = {"Vg": vg_on, "duration": slot_duration}
+    if shutter_open:
+        guard_step["laser_cmd3"] = {"channel": channel_idx, "on": 0}
+    sequence_steps.append(guard_step)
+    sequence_steps.append({"Vg": vg_off, "duration": 5, "laser_cmd2": {"channel": channel_idx, "set_on": 0}})
+    return sequence_steps
+
+
+def _light_arrays(params, channels=(0, 3, 6), wavelengths=(450, 532, 660), powers=(100, 100, 100)):
+    """channel / wavelength / power of every period, as the config tables give them."""
+    channel_arr = np.array(params.get("channel_arr", list(channels))).astype(int).astype(str)
+    wavelength_arr = np.array(params.get("wavelength_arr", list(wavelengths))).astype(int)
+    power_arr = np.array(params.get("power_arr", list(powers))).astype(int).astype(str)
+    return channel_arr, wavelength_arr, power_arr
+
+
+def light_sequence(params, power_table, servo_time=None):
+    """cycle_number x (every wavelength of the config), then a final dark rest."""
+    sequence = []
+    channel_arr, wavelength_arr, power_arr = _light_arrays(params)
+    cycles = int(params["cycle_number"])
+    on_off_number = int(params.get("on_off_number", 1))
+    for c in range(cycles):
+        for i in range(len(wavelength_arr)):
+            sequence.extend(basic_block(
+                power_table, channel_arr[i], wavelength_arr[i], power_arr[i],
+                params["vg_on"], params["vg_off"],
+                params["duration_1"], params["duration_2"],
+                params["duration_3"], params["duration_4"],
+                on_off_number=on_off_number,
+                servo_time=servo_time
+            ))
+    sequence.append({"Vg": params['vg_off'], "duration": params['duration_1']})
+    return sequence
+
+
+def time_dep_sequence(params, power_table):
+    return light_sequence(params, power_table)
+
+
+def servo_sequence(params, power_table):
+    return light_sequence(params, power_table, servo_time=params["servo_time"])
+
+
+def dark_sequence(params, power_table=None):
+    sequence = []
+    channel_arr, wavelength_arr, power_arr = _light_arrays(params)
+    for c in range(int(params["cycle_number"])):
+        for i in range(len(wavelength_arr)):
+            sequence.extend(dark_block(params["vg_on"], params["vg_off"], params["duration_1"], params["duration_2"]))
+    sequence.append({"Vg": params['vg_off'], "duration": params['duration_1']})
+    return sequence
+
+
+def dark_pulse_sequence(params, power_table=None):
+    """Alternate between Vg_off and Vg_on, no light."""
+    sequence = []
+    for c in range(int(params.get("cycle_number", 1))):
+        sequence.append({"Vg": params["vg_off"], "duration": params["duration_1"]})
+        sequence.append({"Vg": params["vg_on"], "duration": params["duration_2"]})
+    # Return to resting state at the end
+    sequence.append({"Vg": params['vg_off'], "duration": params['duration_1']})
+    return sequence
+
+
+def encode_sequence(params, power_table):
+    """binary_string of the config on the first channel / wavelength with its line_code, then a final rest."""
+    channel_arr, wavelength_arr, power_arr = _light_arrays(params, channels=(6,), wavelengths=(660,), powers=(100,))
+    code = get_line_code(params)
+    if code is None:
+        sequence = encode_binary_block(
+            power_table, channel_arr[0], wavelength_arr[0], power_arr[0],
+            params["vg_on"], params["vg_off"],
+            params.get("bit_duration", 1.0), params.get("binary_string", "1010")
+        )
+    else:
+        bits = [int(b) for b in str(params.get("binary_string", "1010")) if b in "01"]
+        symbols = np.concatenate((code.training_symbols(), code.symbols(bits)))
+        sequence = line_code_block(
+            power_table, channel_arr[0], wavelength_arr[0], level_powers(params, power_table, code.n_levels),
+            params["vg_on"], params["vg_off"],
+            params.get("bit_duration", 1.0), code.slot_levels(symbols).ravel()
+        )
+    sequence.append({"Vg": params['vg_off'], "duration": 2.0})
+    return sequence
+
+
+# app script -> sequence builder(params, power_table)
+SEQUENCE_BUILDERS = {
+    "time_dep_app.py": time_dep_sequence,
+    "time_dep_dark_app.py": dark_sequence,
+    "time_dep_dark_pulse_app.py": dark_pulse_sequence,
+    "time_dep_servo_app.py": servo_sequence,
+    "time_dep_servo_pulse_app.py": servo_sequence,
+    "time_dep_servo_encode_app.py": encode_sequence,
+}
+
+
+def build_sequence(app, params, power_table=None):
+    return SEQUENCE_BUILDERS[app](params, power_table)
@@ -0,0 +1,212 @@
+'''
+supervisor of the scripts started by the script manager (LabAuto/script_manager.py)
+
+every child is kept with its Popen, and (when started with capture=True) its
+stdout/stderr lines in ring buffers, read by one background thread per stream.
+status() reports if it is alive, its exit code, uptime and CPU / memory use,
+so a remote operator can follow a run without opening its terminal.
+
+CPU / RSS need psutil (optional, imported when first needed): without it they are None.
+'''
+import os
+import signal
+import subprocess
+import threading
+import time
+from collections import deque
+
+DEFAULT_BUFFER_LINES = 2000
+
+
+def get_psutil():
+    try:
+        import psutil
+        return psutil
+    except ImportError:
+        return None
+
+
+def terminate_tree(proc):
+    """Kill a child and everything it started (the terminal / conda wrappers)."""
+    if os.name == "nt":
+        subprocess.call(["taskkill", "/F", "/T", "/PID", str(proc.pid)])
+        return
+    # macOS / Linux: list the descendants before the parent dies (they are reparented then)
+    pids = [proc.pid]
+    psutil = get_psutil()
+    if psutil is not None:
+        try:
+            pids += [child.pid for child in psutil.Process(proc.pid).children(recursive=True)]
+        except psutil.Error:
+            pass
+    try:
+        if os.getpgid(proc.pid) == proc.pid: # started with start_new_session: the whole group
+            os.killpg(proc.pid, signal.SIGTERM)
+    except OSError:
+        pass
+    for pid in pids:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except OSError:
+            pass # already exited
+
+
+class ManagedProcess:
+    """
+    One supervised child.
+    captured: stdout/stderr are pipes read into `lines` (time, stream, text),
+              otherwise the child writes into its own terminal window and tail() is empty.
+    """
+    def __init__(self, name, proc, captured=False, buffer_lines=DEFAULT_BUFFER_LINES):
+        self.name = name
+        self.proc = proc
+        self.captured = captured
+        self.started = time.time()
+        self.ended = None
+        self.lines = deque(maxlen=buffer_lines)
+        self.n_lines = {"stdout": 0, "stderr": 0}
+        self.lock = threading.Lock()
+        self.ps = None
+        self.children = {} # {pid: psutil.Process}
+        self.readers = []
+
+        psutil = get_psutil()
+        if psutil is not None:
+            try:
+                self.ps = psutil.Process(proc.pid)
+                self.ps.cpu_percent(None) # first call only starts the measurement
+            except psutil.Error:
+                self.ps = None
+
+        if captured:
+            for stream_name, stream in (("stdout", proc.stdout), ("stderr", proc.stderr)):
+                t = threading.Thread(target=self._read, args=(stream_name, stream), daemon=True)
+                t.start()
+                self.readers.append(t)
+
+    def _read(self, stream_name, stream):
+        for line in iter(stream.readline, ""):
+            with self.lock:
+                self.lines.append((time.time(), stream_name, line.rstrip("\r\n")))
+                self.n_lines[stream_name] += 1
+        stream.close()
+
+    def alive(self):
+        alive = self.proc.poll() is None
+        if not alive and self.ended is None:
+            self.ended = time.time()
+        return alive
+
+    def resources(self):
+        """(cpu %, rss MB) of the child and its own children, (None, None) without psutil."""
+        if self.ps is None:
+            return None, None
+        psutil = get_psutil()
+        try:
+            found = self.ps.children(recursive=True)
+        except psutil.Error:
+            return None, None
+        # STATUS / LIST of several clients run on their own threads: the Process objects are shared state
+        with self.lock:
+            try:
+                # keep the Process objects: cpu_percent() measures since the previous call on the same object
+                for child in found:
+                    if child.pid not in self.children:
+                        self.children[child.pid] = child
+                        child.cpu_percent(None)
+                cpu = self.ps.cpu_percent(None)
+                rss = self.ps.memory_info().rss
+            except psutil.Error:
+                return None, None
+            for pid, child in list(self.children.items()):
+                try:
+                    cpu += child.cpu_percent(None)
+                    rss += child.memory_info().rss
+                except psutil.Error:
+                    del self.children[pid] # child exited
+        return cpu, rss / 1e6
+
+    def status(self):
+        alive = self.alive()
+        cpu, rss = self.resources() if alive else (None, None)
+        end = time.time() if alive else self.ended
+        with self.lock:
+            n_lines = dict(self.n_lines)
+        return {
+            "name": self.name,
+            "pid": self.proc.pid,
+            "alive": alive,
+            "returncode": self.proc.returncode,
+            "started": self.started,
+            "uptime": end - self.started,
+            "cpu_percent": cpu,
+            "rss_mb": rss,
+            "captured": self.captured,
+            "lines": n_lines,
+        }
+
+    def tail(self, n=50, stream=None):
+        """Last n captured lines, stream: "stdout", "stderr" or None for both."""
+        with self.lock:
+            lines = [l for l in self.lines if stream is None or l[1] == stream]
+        return [{"time": t, "stream": s, "text": text} for t, s, text in lines[-n:]]
+
+
+class Supervisor:
+    """
+    Thread safe registry of the scripts started by the script manager
+    (several clients are served by different threads).
+    """
+    def __init__(self, buffer_lines=DEFAULT_BUFFER_LINES):
+        self.buffer_lines = buffer_lines
+        self.processes = {} # {name: ManagedProcess}
+        self.lock = threading.Lock()
+
+    def is_running(self, name):
+        with self.lock:
+            mp = self.processes.get(name)
+        return mp is not None and mp.alive()
+
+    def add(self, name, proc, captured=False):
+        mp = ManagedProcess(name, proc, captured, self.buffer_lines)
+        with self.lock:
+            self.processes[name] = mp
+        return mp
+
+    def start_captured(self, name, args, cwd=None):
+        """Start args without a terminal window, stdout/stderr go to the ring buffer."""
+        env = dict(os.environ)
+        env["PYTHONUNBUFFERED"] = "1"    # lines arrive when printed, not when the pipe buffer is full
+        env["PYTHONIOENCODING"] = "utf-8"
+        proc = subprocess.Popen(
+            args, cwd=cwd, env=env,
+            stdout=subprocess.PIPE, stderr=subprocess.PIPE, stdin=subprocess.DEVNULL,
+            text=True, encoding="utf-8", errors="replace", bufsize=1,
+            start_new_session=os.name != "nt", # own process group, terminate_tree kills all of it
+        )
+        return self.add(name, proc, captured=True)
+
+    def get(self, name):
+        with self.lock:
+            return self.processes.get(name)
+
+    def stop(self, name):
+        """Kill a child. Returns False if it is unknown."""
+        with self.lock:
+            mp = self.processes.pop(name, None)
+        if mp is None:
+            return False
+        if mp.alive():
+            terminate_tree(mp.proc)
+        return True
+
+    def stop_all(self):
+        with self.lock:
+            names = list(self.processes)
+        for name in names:
+            self.stop(name)
+
+    def list(self):
+        with self.lock:
+            items = list(self.processes.values())
+        return [mp.status() for mp in items]
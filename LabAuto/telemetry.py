@@ -0,0 +1,114 @@
+'''
+planned vs actual timing of every executed step of a sequence (sidecar of the data csv)
+
+for every step:
+    planned_start / actual_start / late      when the step should have and did start (s from the sequence start)
+    actions                                  the commands of the step (laser_cmd1 / 2 / 3, none = only Vg)
+    switch_latency                           how long switching took (Keithley Vg + laser / servo commands)
+    samples / rate                           number of readings written and achieved readings per second
+    planned_end / actual_end / end_error     when the step should have and did end
+the summary gives the percentiles of the lateness and the switching latency,
+so a timing regression shows up after every run (time_<device>_<run>_timing.json).
+
+usage (inside the step loop of a time-dependent app):
+    telemetry = StepTelemetry(timeline)
+    telemetry.start_step(i)      # after timeline.wait_step_start(i)
+    telemetry.switched()         # after the switching (Keithley Vg, laser, servo)
+    telemetry.count_sample()     # every written reading
+    telemetry.finish()           # after the loop
+    telemetry.save(path)
+'''
+import json
+
+from LabAuto.profiler import percentile
+
+
+def spread(values):
+    """{"p50", "p90", "p99", "max", "mean"} of a list of seconds (None if empty)."""
+    values = [v for v in values if v is not None]
+    if not values:
+        return None
+    ordered = sorted(values)
+    return {
+        "p50": percentile(ordered, 50),
+        "p90": percentile(ordered, 90),
+        "p99": percentile(ordered, 99),
+        "max": ordered[-1],
+        "mean": sum(values) / len(values),
+    }
+
+
+class StepTelemetry:
+    """Timing of every step executed on a LabAuto.timeline.Timeline."""
+    def __init__(self, timeline):
+        self.timeline = timeline
+        self.steps = []
+        self.current = None
+
+    def start_step(self, i):
+        now = self.timeline.now()
+        self._close(now)
+        self.current = {
+            "step": i,
+            "planned_start": self.timeline.offsets[i],
+            "actual_start": now,
+            "late": now - self.timeline.offsets[i],
+            "actions": sorted(self.timeline.actions[i]),
+            "switch_latency": None,
+            "samples": 0,
+            "planned_end": self.timeline.offsets[i + 1],
+        }
+
+    def switched(self):
+        self.current["switch_latency"] = self.timeline.now() - self.current["actual_start"]
+
+    def count_sample(self):
+        self.current["samples"] += 1
+
+    def _close(self, now):
+        step = self.current
+        if step is None:
+            return
+        step["actual_end"] = now
+        step["end_error"] = now - step["planned_end"]
+        measuring = now - step["actual_start"] - (step["switch_latency"] or 0.0)
+        step["rate"] = step["samples"] / measuring if measuring > 0 else None
+        self.steps.append(step)
+        self.current = None
+
+    def finish(self):
+        """Close the last step (call right after the step loop)."""
+        self._close(self.timeline.now())
+
+    def summary(self):
+        rates = [s["rate"] for s in self.steps if s["rate"] is not None]
+        return {
+            "n_steps": len(self.steps),
+            "n_planned": len(self.timeline),
+            "planned_total": self.timeline.total,
+            "actual_total": self.steps[-1]["actual_end"] if self.steps else None,
+            "samples": sum(s["samples"] for s in self.steps),
+            "late": spread([s["late"] for s in self.steps]),
+            "switch_latency": spread([s["switch_latency"] for s in self.steps]),
+            "end_error": spread([s["end_error"] for s in self.steps]),
+            "rate_min": min(rates) if rates else None,
+            "rate_mean": sum(rates) / len(rates) if rates else None,
+        }
+
+    def save(self, path, **extra):
+        """extra: more sections of the json, e.g. writer=BackgroundCSVWriter.stats()"""
+        summary = self.summary()
+        with open(path, "w") as f:
+            json.dump({"summary": summary, **extra, "steps": self.steps}, f, indent=4)
+        return summary
+
+    def print_summary(self, summary=None):
+        s = summary or self.summary()
+        if not s["n_steps"]:
+            return
+        late = s["late"]
+        line = (f"Timing: {s['n_steps']} steps, end {(s['actual_total'] - s['planned_total'])*1000:+.1f} ms vs plan, "
+                f"start late p50 {late['p50']*1000:.1f} / p99 {late['p99']*1000:.1f} / max {late['max']*1000:.1f} ms")
+        if s["switch_latency"]:
+            line += f", switch p50 {s['switch_latency']['p50']*1000:.1f} / max {s['switch_latency']['max']*1000:.1f} ms"
+        print(line)
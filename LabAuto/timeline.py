@@ -0,0 +1,111 @@
+'''
+compiled measurement timeline: absolute deadlines on time.perf_counter()
+
+the time-dependent apps build a sequence (list of steps with "Vg", "duration" and
+optional laser_cmd1 / laser_cmd2 / laser_cmd3, see LabAuto.sequences).
+running it with `step_end = time.time() + duration` after switch_source() returns adds the
+laser / servo latency to every step, over hundreds of steps the run drifts by seconds.
+
+Timeline compiles the sequence once into arrays of start offsets and Vg, with the
+actions of every step attached, and gives every step an absolute deadline
+t0 + sum(previous durations): a slow switch shortens its own step instead of
+shifting all the following ones, so the last step ends on schedule.
+
+usage:
+    timeline = Timeline(sequence)
+    timeline.start()                     # or start_at_epoch(start_at) to follow the laser PC schedule
+    for i in range(len(timeline)):
+        timeline.wait_step_start(i)
+        switch_source(timeline.vg[i], **timeline.actions[i])
+        while timeline.fits(i):          # room for one more measurement before the deadline
+            with timeline.measuring():
+                reading = k.measure()
+            t = timeline.now()           # seconds since the sequence start
+        timeline.wait_step_end(i)
+'''
+import time
+from array import array
+from contextlib import contextmanager
+
+from LabAuto.laser_schedule import sleep_until
+
+ACTION_KEYS = ("laser_cmd1", "laser_cmd2", "laser_cmd3")
+
+
+class Timeline:
+    """
+    steps: the original step dicts
+    offsets: array of step start times (s from the sequence start), len(steps) + 1 (last = total)
+    vg: array of the gate voltage of every step
+    actions: per step {key: command} (only the keys in ACTION_KEYS that are set)
+    """
+    def __init__(self, sequence, action_keys=ACTION_KEYS):
+        self.steps = list(sequence)
+        self.offsets = array('d', [0.0])
+        self.vg = array('d')
+        self.actions = []
+        for step in sequence:
+            self.offsets.append(self.offsets[-1] + float(step["duration"]))
+            self.vg.append(float(step["Vg"]))
+            self.actions.append({key: step[key] for key in action_keys if step.get(key)})
+        self.t0 = None
+        self.measure_time = 0.0 # running estimate of one measurement (s), see measuring()
+
+    def __len__(self):
+        return len(self.vg)
+
+    @property
+    def total(self):
+        return self.offsets[-1]
+
+    def start(self, t0=None):
+        """t0: time.perf_counter() of the sequence start, default now."""
+        self.t0 = time.perf_counter() if t0 is None else t0
+        return self
+
+    def start_from(self, i):
+        """Start now at step i, as if steps 0..i-1 had just run (resumed run)."""
+        return self.start(time.perf_counter() - self.offsets[i])
+
+    def start_at_epoch(self, start_at):
+        """Start at an epoch time (time.time()), e.g. the start of a light schedule."""
+        return self.start(time.perf_counter() + (start_at - time.time()))
+
+    def now(self):
+        """Seconds since the sequence start."""
+        return time.perf_counter() - self.t0
+
+    def step_start(self, i):
+        return self.t0 + self.offsets[i]
+
+    def step_end(self, i):
+        """Absolute deadline (time.perf_counter()) of step i."""
+        return self.t0 + self.offsets[i + 1]
+
+    def remaining(self, i):
+        return self.step_end(i) - time.perf_counter()
+
+    def late(self, i):
+        """How late step i starts now (s, negative = early)."""
+        return time.perf_counter() - self.step_start(i)
+
+    def wait_step_start(self, i, stop_event=None):
+        return sleep_until(self.step_start(i), stop_event)
+
+    def wait_step_end(self, i, stop_event=None):
+        return sleep_until(self.step_end(i), stop_event)
+
+    def fits(self, i):
+        """True while one more measurement ends before the deadline of step i."""
+        return time.perf_counter() + self.measure_time < self.step_end(i)
+
+    @contextmanager
+    def measuring(self, weight=0.2):
+        """Time one measurement, keeps a moving average in measure_time."""
+        start = time.perf_counter()
+        yield
+        elapsed = time.perf_counter() - start
+        if self.measure_time == 0.0:
+            self.measure_time = elapsed
+        else:
+            self.measure_time += weight * (elapsed - self.measure_time)
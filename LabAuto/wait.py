@@ -0,0 +1,143 @@
+'''
+condition based waits for GUI automation (instead of fixed time.sleep)
+
+every wait polls a condition until it is true or the timeout is reached,
+and records how long it actually took in WAIT_LOG, so the timeouts can be
+tuned with real numbers (see get_wait_stats()).
+
+pygetwindow / PIL are imported inside the functions,
+so this module can also be imported on a machine without a GUI.
+'''
+import threading
+import time
+from collections import deque
+
+DEFAULT_TIMEOUT = 5.0
+DEFAULT_POLL_INTERVAL = 0.05 # seconds between two checks
+
+WAIT_LOG = deque(maxlen=2000) # (label, seconds, success)
+WAIT_LOG_LOCK = threading.Lock() # the schedule threads of the laser server record while STATS reads
+
+
+def record_wait(label, seconds, success):
+    with WAIT_LOG_LOCK:
+        WAIT_LOG.append((label, seconds, success))
+
+
+def reset_wait_stats():
+    with WAIT_LOG_LOCK:
+        WAIT_LOG.clear()
+
+
+def wait_until(condition, timeout=DEFAULT_TIMEOUT, poll_interval=DEFAULT_POLL_INTERVAL, label="wait", record=True):
+    """
+    Poll condition() until it returns something truthy.
+
+    Parameters:
+        condition (callable): no argument, returns the result (truthy = done).
+        timeout (float): maximum seconds to wait.
+        poll_interval (float): seconds between checks.
+        label (str): name used in WAIT_LOG.
+        record (bool): False for checks where the timeout is an expected answer
+                       (e.g. "did it still move?"): nothing goes to WAIT_LOG and nothing is printed.
+
+    Returns:
+        the truthy result of condition(), or None if the timeout was reached.
+    """
+    start = time.perf_counter()
+    while True:
+        result = condition()
+        elapsed = time.perf_counter() - start
+        if result:
+            if record:
+                record_wait(label, elapsed, True)
+            return result
+        if elapsed > timeout:
+            if record:
+                record_wait(label, elapsed, False)
+                print(f"Timeout: '{label}' not reached after {timeout} seconds!")
+            return None
+        time.sleep(poll_interval)
+
+
+def find_window(title):
+    import pygetwindow as gw
+    win_list = gw.getWindowsWithTitle(title)
+    if len(win_list) > 0:
+        return win_list[0]
+    return None
+
+
+def wait_for_window(title, timeout=DEFAULT_TIMEOUT, poll_interval=DEFAULT_POLL_INTERVAL):
+    """Wait until a window with this title exists. Returns the window or None."""
+    return wait_until(lambda: find_window(title), timeout, poll_interval, label=f"window open: {title}")
+
+
+def wait_for_window_closed(title, timeout=DEFAULT_TIMEOUT, poll_interval=DEFAULT_POLL_INTERVAL):
+    """Wait until no window with this title exists. Returns True or None."""
+    return wait_until(lambda: find_window(title) is None, timeout, poll_interval, label=f"window closed: {title}")
+
+
+def is_focused(title):
+    import pygetwindow as gw
+    win = gw.getActiveWindow()
+    return win is not None and title in win.title
+
+
+def wait_for_focus(title, timeout=DEFAULT_TIMEOUT, poll_interval=DEFAULT_POLL_INTERVAL):
+    """Wait until the active (foreground) window title contains title. Returns True or None."""
+    return wait_until(lambda: is_focused(title), timeout, poll_interval, label=f"focus: {title}")
+
+
+def grab_region(bbox):
+    """
+    bbox: (left, top, right, bottom) in screen pixels
+    Returns the raw RGB bytes of that region (cheap to compare).
+    """
+    from PIL import ImageGrab
+    return ImageGrab.grab(bbox=bbox).convert("RGB").tobytes()
+
+
+def region_around(coord, half_size=10):
+    """Small bbox centred on a screen coordinate (e.g. a button)."""
+    x, y = int(coord[0]), int(coord[1])
+    return (x - half_size, y - half_size, x + half_size, y + half_size)
+
+
+def wait_for_region_change(bbox, reference=None, timeout=DEFAULT_TIMEOUT, poll_interval=DEFAULT_POLL_INTERVAL, record=True):
+    """
+    Wait until the pixels inside bbox differ from reference.
+    reference: bytes from grab_region(bbox) taken BEFORE the action (e.g. a click).
+               If None, it is taken now.
+    record: see wait_until.
+    Returns True or None.
+    """
+    if reference is None:
+        reference = grab_region(bbox)
+    return wait_until(lambda: grab_region(bbox) != reference, timeout, poll_interval,
+                      label=f"region change: {bbox}", record=record)
+
+
+def get_wait_stats():
+    """
+    Summary of WAIT_LOG per label.
+    Returns {label: {"count", "timeouts", "mean", "max"}} (seconds).
+    """
+    with WAIT_LOG_LOCK:
+        waits = list(WAIT_LOG)
+    stats = {}
+    for label, seconds, success in waits:
+        s = stats.setdefault(label, {"count": 0, "timeouts": 0, "total": 0.0, "max": 0.0})
+        s["count"] += 1
+        s["total"] += seconds
+        s["max"] = max(s["max"], seconds)
+        if not success:
+            s["timeouts"] += 1
+    for s in stats.values():
+        s["mean"] = s.pop("total") / s["count"]
+    return stats
+
+
+def print_wait_stats():
+    for label, s in sorted(get_wait_stats().items()):
+        print(f"{label:<50} n={s['count']:<5} mean={s['mean']*1000:7.1f} ms  max={s['max']*1000:7.1f} ms  timeouts={s['timeouts']}")
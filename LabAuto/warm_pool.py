@@ -0,0 +1,162 @@
+'''
+pool of pre-warmed Python interpreters to start measurement scripts quickly
+
+a cold start of idvg.py / the time_dep apps spends seconds importing PyQt5,
+matplotlib, pandas, pyvisa and loading the VISA library before the first point.
+a warm worker does all that in advance and then waits for ONE job on stdin:
+    {"script": "idvg.py", "args": [], "cwd": "..."}
+it runs the script as __main__ (runpy, like `python idvg.py`) and exits when the script ends.
+the pool starts a new worker right after handing one out, so the next run is warm too.
+
+usage:
+    pool = WarmPool(size=1)
+    proc = pool.run("idvg.py")   # subprocess.Popen of the worker now running idvg.py
+
+worker (started by the pool):
+    python -m LabAuto.warm_pool --worker
+'''
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+# imported by every worker before it is handed a job (missing ones are skipped)
+DEFAULT_PRELOAD = (
+    "numpy",
+    "pandas",
+    "PyQt5.QtWidgets",
+    "PyQt5.QtCore",
+    "matplotlib.figure",
+    "matplotlib.backends.backend_qt5agg",
+    "pyvisa",
+    "keithley.keithley",
+    "LabAuto.laser_remote",
+)
+READY = "WARM_READY"
+
+
+def preload(modules=DEFAULT_PRELOAD, visa=True):
+    """Import modules (and open the VISA library once). Returns {module: seconds or error}."""
+    import importlib
+    timings = {}
+    for name in modules:
+        start = time.perf_counter()
+        try:
+            importlib.import_module(name)
+            timings[name] = time.perf_counter() - start
+        except Exception as e:
+            timings[name] = f"{type(e).__name__}: {e}"
+    if visa and "pyvisa" in sys.modules:
+        start = time.perf_counter()
+        try:
+            # loads the VISA library: Keithley2636B.connect() reuses it
+            sys.modules["pyvisa"].ResourceManager().list_resources()
+            timings["visa_discovery"] = time.perf_counter() - start
+        except Exception as e:
+            timings["visa_discovery"] = f"{type(e).__name__}: {e}"
+    return timings
+
+
+def worker_main(modules=DEFAULT_PRELOAD):
+    """Runs inside a warm worker: preload, say READY, wait for one job, run it as __main__."""
+    import runpy
+    timings = preload(modules)
+    print(f"{READY} {json.dumps(timings)}", flush=True)
+
+    line = sys.stdin.readline()
+    if not line:
+        return # pool closed
+    job = json.loads(line)
+    if os.name == "nt" and os.environ.get("WARM_POOL_CONSOLE"):
+        # the job came through a pipe, give the script its console back (for input())
+        sys.stdin = open("CONIN$")
+
+    if job.get("cwd"):
+        os.chdir(job["cwd"])
+    script = os.path.abspath(job["script"])
+    sys.argv = [script] + list(job.get("args", []))
+    sys.path.insert(0, os.path.dirname(script))
+    print(f"[warm] running {job['script']} (handed over {time.time() - job['sent']:.3f}s after the request)", flush=True)
+    runpy.run_path(script, run_name="__main__")
+
+
+class WarmPool:
+    """
+    Keeps `size` idle warm workers.
+
+    output: where the scripts print
+        "console": own console window per worker (Windows, like the terminal launch)
+        "pipe": stdout/stderr pipes, must be read (capture, see LabAuto.supervisor)
+        "inherit": the terminal of this process
+        default: "console" on Windows, else "inherit"
+    """
+    def __init__(self, size=1, cwd=None, output=None, modules=DEFAULT_PRELOAD):
+        self.size = size
+        self.cwd = cwd or os.path.abspath('.')
+        if output is None:
+            output = "console" if os.name == "nt" else "inherit"
+        self.output = output
+        self.modules = modules
+        self.idle = [] # Popen of started workers, oldest first
+        self.lock = threading.Lock()
+
+    def _spawn(self):
+        env = dict(os.environ)
+        env["PYTHONUNBUFFERED"] = "1"
+        env["PYTHONIOENCODING"] = "utf-8"
+        kwargs = {"stdin": subprocess.PIPE, "cwd": self.cwd, "env": env,
+                  "text": True, "encoding": "utf-8", "errors": "replace", "bufsize": 1}
+        if self.output == "console":
+            env["WARM_POOL_CONSOLE"] = "1"
+            kwargs["creationflags"] = subprocess.CREATE_NEW_CONSOLE
+        elif self.output == "pipe":
+            kwargs.update(stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        args = [sys.executable, "-m", "LabAuto.warm_pool", "--worker"]
+        if self.modules != DEFAULT_PRELOAD:
+            args += ["--modules", ",".join(self.modules)]
+        return subprocess.Popen(args, **kwargs)
+
+    def fill(self):
+        """Start workers until `size` are idle (they warm up in the background)."""
+        with self.lock:
+            self.idle = [p for p in self.idle if p.poll() is None]
+            while len(self.idle) < self.size:
+                self.idle.append(self._spawn())
+
+    start = fill
+
+    def run(self, script, args=()):
+        """
+        Hand script to the oldest warm worker (a cold one is started if none is left)
+        and start its replacement. Returns the worker's Popen.
+        Only sends the job, the worker starts it as soon as its preload is finished.
+        """
+        with self.lock:
+            self.idle = [p for p in self.idle if p.poll() is None]
+            proc = self.idle.pop(0) if self.idle else self._spawn()
+        job = {"script": script, "args": list(args), "cwd": self.cwd, "sent": time.time()}
+        proc.stdin.write(json.dumps(job) + "\n")
+        proc.stdin.flush()
+        proc.stdin.close()
+        threading.Thread(target=self.fill, daemon=True).start()
+        return proc
+
+    def close(self):
+        """Stop the idle workers (closing stdin makes them exit)."""
+        with self.lock:
+            idle, self.idle = self.idle, []
+        for proc in idle:
+            try:
+                proc.stdin.close()
+            except OSError:
+                pass
+
+
+if __name__ == "__main__":
+    if "--worker" in sys.argv:
+        modules = DEFAULT_PRELOAD
+        if "--modules" in sys.argv:
+            modules = tuple(m for m in sys.argv[sys.argv.index("--modules") + 1].split(",") if m)
+        worker_main(modules)
@@ -1,9 +1,6 @@
 import streamlit as st
 import json
-import pandas as pd
-import numpy as np
 # import matplotlib.pyplot as plt
-import plotly.graph_objects as go
 from pathlib import Path
 import os
 import subprocess 
@@ -356,6 +353,7 @@ with tab_power:
         pass 
 
     data_col1, data_col2, data_col3 = st.columns(3)
+    import pandas as pd  # only needed from here on (deferred, see benchmarks/startup.py)
     
     with data_col1:
         st.markdown("**1. `pp_df.csv` (Percent Power)**")
@@ -395,6 +393,11 @@ with tab_plot:
     )
 
     if uploaded_data_files:
+        # plotly / pandas / numpy are only imported once files are uploaded
+        import numpy as np
+        import pandas as pd
+        import plotly.graph_objects as go
+
         # Initialize an Interactive Plotly Figure
         fig = go.Figure()
         plot_type = None
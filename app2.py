@@ -6,10 +6,15 @@ from tabs.power import render_power_tab
 from tabs.plotter import render_plotter_tab
 from tabs.encoder import render_encoder_tab
 from tabs.pulse import render_vg_pulse_tab
+from tabs.helper import set_warm_start
 
 st.set_page_config(page_title="Lab Auto", layout="wide")
 st.title("🔬 Lab Automation")
 
+warm_start = st.sidebar.checkbox("⚡ Warm start", value=False,
+                                 help="Keep a Python interpreter with PyQt5 / matplotlib / pandas / pyvisa loaded, scripts start in well under a second.")
+set_warm_start(warm_start)
+
 tab_time_dep, tab_idvg, tab_idvd, tab_power, tab_plot, tab_encoder, tab_vg_pulse = st.tabs([
     "⚡ Time-Dependent", 
     "📈 Id-Vg Sweep",
@@ -0,0 +1,129 @@
+'''
+achievable bit rate of the optical-encoder line codes against the simulated device
+
+    python benchmarks/line_codes.py                               # every line code, slots of 2 s .. 0.05 s
+    python benchmarks/line_codes.py nrz manchester --bits 512
+    python benchmarks/line_codes.py --tau-fall 0.5 --noise 5e-9   # slower / noisier device
+    python benchmarks/line_codes.py --max-ber 1e-3
+    python benchmarks/line_codes.py pam4 pam8 --power-latency 0.05  # PAM with a faster power setting
+    python benchmarks/line_codes.py --history                     # ... and append the results to the history
+
+every line code sends the same random bits (after an 8 bit preamble) at every slot duration
+(bit_duration of the config) through LabAuto.device_model.SimulatedDevice and LabAuto.decoder.
+achievable = the highest bits/s with a BER at or below --max-ber; the errors are counted on
+--bits bits, so a BER below 1 / bits reads as 0.
+with --history the results are appended to benchmarks/line_codes_history.csv (not tracked by
+git) with the date and git commit, so a decoder change that costs bit rate shows up next to
+the commit that made it.
+'''
+import argparse
+import csv
+import datetime
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from LabAuto.aotf_backend import SimulatedBackend  # noqa: E402
+from LabAuto.decoder import decode  # noqa: E402
+from LabAuto.device_model import SimulatedDevice, reading_time  # noqa: E402
+from LabAuto.line_codes import LINE_CODES  # noqa: E402
+from LabAuto.queue_scheduler import NominalPowers  # noqa: E402
+from LabAuto.sequences import encode_sequence  # noqa: E402
+
+HISTORY_PATH = Path(__file__).resolve().parent / "line_codes_history.csv"
+
+CODES = ["rz", *LINE_CODES]
+SLOTS = [2.0, 1.0, 0.5, 0.25, 0.1, 0.05]
+PREAMBLE = "01011001" # 'Y'
+
+
+def encoder_params(code, slot, bits, power):
+    return {
+        "line_code": code, "bit_duration": slot, "binary_string": bits,
+        "preamble_bits": len(PREAMBLE), "vg_on": 1.0, "vg_off": -1.0,
+        "channel_arr": [6], "wavelength_arr": [660], "power_arr": [power],
+    }
+
+
+def run_code(code, slot, bits, device, interval, power):
+    """decoder result of one simulated run."""
+    params = encoder_params(code, slot, bits, power)
+    t, i_d = device.measure(encode_sequence(params, NominalPowers()), interval)
+    return decode(t, i_d, params)
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def append_history(rows, path=HISTORY_PATH):
+    new_file = not path.exists()
+    with open(path, "a", newline="") as f:
+        writer = csv.writer(f)
+        if new_file:
+            writer.writerow(["date", "commit", "code", "slot_s", "bits", "bits_per_s", "ber", "effective_bits_per_s",
+                             "tau_rise", "tau_fall", "noise"])
+        writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="achievable bits/s of the encoder line codes on the simulated device")
+    parser.add_argument("codes", nargs="*", default=CODES, help=f"line codes ({', '.join(CODES)})")
+    parser.add_argument("--slots", type=float, nargs="+", default=SLOTS, help="slot durations (s)")
+    parser.add_argument("--bits", type=int, default=256, help="random bits after the preamble")
+    parser.add_argument("--max-ber", type=float, default=1e-2)
+    parser.add_argument("--power", type=float, default=300.0, help="top light level (nW)")
+    parser.add_argument("--tau-rise", type=float, default=0.05)
+    parser.add_argument("--tau-fall", type=float, default=0.2)
+    parser.add_argument("--power-latency", type=float, default=SimulatedBackend.DEFAULT_LATENCY["power"],
+                        help="laser power change (s), sets the PAM levels")
+    parser.add_argument("--noise", type=float, default=2e-9, help="current noise of a reading (A)")
+    parser.add_argument("--nplc", type=float, default=0.1, help="nplc of both channels (reading interval)")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--history", action="store_true", help=f"append the results to {HISTORY_PATH.name}")
+    args = parser.parse_args()
+    unknown = [code for code in args.codes if code not in CODES]
+    if unknown:
+        parser.error(f"unknown line code {', '.join(unknown)} (choose from {', '.join(CODES)})")
+
+    rng = np.random.default_rng(args.seed)
+    bits = PREAMBLE + "".join(str(b) for b in rng.integers(0, 2, args.bits))
+    interval = reading_time(args.nplc, args.nplc)
+    print(f"{args.bits} bits, reading every {interval*1000:.1f} ms, tau rise {args.tau_rise} s / fall {args.tau_fall} s")
+    print(f"{'code':<11} {'slot (s)':>8} {'bits/s':>8} {'BER':>8} {'effective':>10} {'Q':>7}")
+
+    date = datetime.datetime.now().isoformat(timespec="seconds")
+    commit = git_commit()
+    history = []
+    achievable = {}
+    for code in args.codes:
+        for slot in sorted(args.slots, reverse=True):
+            device = SimulatedDevice(tau_rise=args.tau_rise, tau_fall=args.tau_fall, noise=args.noise,
+                                     power_latency=args.power_latency, seed=args.seed)
+            result = run_code(code, slot, bits, device, interval, args.power)
+            rate, ber = result["bits_per_second"], result["ber"]
+            q = result["eye"].get("q_factor", float("nan"))
+            print(f"{code:<11} {slot:>8g} {rate:>8.2f} {ber:>8.3g} {result['effective_bits_per_second']:>10.2f} {q:>7.2f}")
+            history.append([date, commit, code, slot, args.bits, f"{rate:.4f}", f"{ber:.5f}",
+                            f"{result['effective_bits_per_second']:.4f}", args.tau_rise, args.tau_fall, args.noise])
+            if ber <= args.max_ber and rate > achievable.get(code, (0.0, None))[0]:
+                achievable[code] = (rate, slot)
+
+    print(f"\nachievable at BER <= {args.max_ber:g}:")
+    for code in args.codes:
+        rate, slot = achievable.get(code, (0.0, None))
+        print(f"  {code:<11} " + (f"{rate:7.2f} bits/s (slot {slot:g} s)" if slot else "none of the slots"))
+
+    if history and args.history:
+        append_history(history)
+        print(f"appended to {os.path.relpath(HISTORY_PATH, ROOT)}")
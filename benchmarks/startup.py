@@ -0,0 +1,204 @@
+'''
+start-up time of the app entry points (import cost and window construction before anything is measured)
+
+    python benchmarks/startup.py                      # every entry point, 5 runs each
+    python benchmarks/startup.py --history            # ... and append the results to the history
+    python benchmarks/startup.py idvg time_dep_app -n 10
+    python benchmarks/startup.py --budget 1.5         # exit code 1 if an entry point starts slower than 1.5 s
+    python benchmarks/startup.py --profile idvg       # per-module cumulative import cost (python -X importtime)
+
+every run imports the module in a fresh interpreter and, for the GUI apps, builds the
+window on the offscreen Qt platform with an idle worker (no instrument is connected),
+so the imports deferred to _setup_ui (matplotlib) are counted. an entry point that
+fails to start counts as a failure (exit code 1), not as a skipped one.
+with --history the results are appended to benchmarks/startup_history.csv (not tracked
+by git) with the date and git commit, so a slower start-up shows up next to the change
+that caused it.
+'''
+import argparse
+import csv
+import datetime
+import os
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+HISTORY_PATH = Path(__file__).resolve().parent / "startup_history.csv"
+
+ENTRY_POINTS = [
+    "idvg",
+    "idvd",
+    "idvg_pulse",
+    "time_dep_app",
+    "time_dep_dark_app",
+    "time_dep_dark_pulse_app",
+    "time_dep_servo_app",
+    "time_dep_servo_pulse_app",
+    "time_dep_servo_encode_app",
+    "power",
+    "verify_power",
+    "laser_control",
+]
+
+# window class of the GUI entry points, built with an idle worker after the import
+WINDOWS = {
+    "idvg": "AutoIdVgWindow",
+    "idvd": "AutoIdVdWindow",
+    "idvg_pulse": "AutoIdVgWindow",
+    "time_dep_app": "TimeDepWindow",
+    "time_dep_dark_app": "TimeDepWindow",
+    "time_dep_dark_pulse_app": "TimeDepWindow",
+    "time_dep_servo_app": "TimeDepWindow",
+    "time_dep_servo_pulse_app": "TimeDepWindow",
+    "time_dep_servo_encode_app": "TimeDepWindow",
+}
+
+WINDOW_CODE = '''
+from PyQt5.QtWidgets import QApplication
+from LabAuto.sample_ring import SampleRing
+from {module} import {window}
+
+class Signal:
+    def connect(self, slot):
+        pass
+
+class IdleWorker:
+    """the signals / methods the windows use, without instruments or a thread."""
+    def __init__(self):
+        self.samples = SampleRing(columns=("config_idx", "t", "Vd", "Vg", "Id", "Ig"))
+    def __getattr__(self, name):
+        return Signal()
+    def start(self):
+        pass
+    def isRunning(self):
+        return False
+
+app = QApplication([])
+window = {window}(IdleWorker())
+app.processEvents()
+'''
+
+
+def startup_code(module):
+    """Code run by the fresh interpreter: the import, then the window for the GUI apps."""
+    if module in WINDOWS:
+        return WINDOW_CODE.format(module=module, window=WINDOWS[module])
+    return f"import {module}"
+
+
+def startup_seconds(module):
+    """Wall time of the start-up of module in a fresh interpreter, None if it fails."""
+    env = dict(os.environ)
+    env["QT_QPA_PLATFORM"] = "offscreen"
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", startup_code(module)], cwd=ROOT, env=env,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    elapsed = time.perf_counter() - start
+    if result.returncode != 0:
+        last_line = result.stderr.strip().splitlines()[-1] if result.stderr.strip() else "unknown error"
+        print(f"  {module}: start-up failed ({last_line})")
+        return None
+    return elapsed
+
+
+def baseline_seconds(runs):
+    """Start-up of a bare interpreter, subtracted to get the cost of the module itself."""
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run([sys.executable, "-c", "pass"], cwd=ROOT)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def profile_imports(module, top=25):
+    """
+    Per-module cumulative import time of one entry point (python -X importtime).
+    Returns [(cumulative seconds, self seconds, package)] of the top level imports, slowest first.
+    """
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=ROOT,
+                            stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        # "import time:       self [us] |  cumulative | imported package"
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        try:
+            self_us, cumulative_us, name = line[len("import time:"):].split("|")
+            rows.append((int(cumulative_us) / 1e6, int(self_us) / 1e6, name.rstrip()))
+        except ValueError:
+            continue
+    # indentation of the name = nesting level, keep the modules imported directly by the entry point
+    # (and the entry point itself) so the cumulative times do not count twice
+    levels = {name: len(name) - len(name.lstrip()) for _, _, name in rows}
+    top_level = min(levels.values()) if levels else 0
+    direct = [(c, s, name.strip()) for c, s, name in rows if levels[name] <= top_level + 2]
+    return sorted(direct, reverse=True)[:top]
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                              stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def append_history(rows, path=HISTORY_PATH):
+    new_file = not path.exists()
+    with open(path, "a", newline="") as f:
+        writer = csv.writer(f)
+        if new_file:
+            writer.writerow(["date", "commit", "python", "module", "runs", "median_s", "min_s", "baseline_s"])
+        writer.writerows(rows)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="start-up time of the app entry points")
+    parser.add_argument("modules", nargs="*", default=ENTRY_POINTS)
+    parser.add_argument("-n", "--runs", type=int, default=5)
+    parser.add_argument("--budget", type=float, default=None, help="maximum median start-up time (s), net of the bare interpreter")
+    parser.add_argument("--profile", metavar="MODULE", default=None, help="per-module import cost of one entry point")
+    parser.add_argument("--history", action="store_true", help=f"append the results to {HISTORY_PATH.name}")
+    args = parser.parse_args()
+
+    if args.profile:
+        print(f"{'cumulative (ms)':>16} {'self (ms)':>10}  module")
+        for cumulative, self_time, name in profile_imports(args.profile):
+            print(f"{cumulative*1000:>16.1f} {self_time*1000:>10.1f}  {name}")
+        sys.exit(0)
+
+    baseline = baseline_seconds(args.runs)
+    print(f"bare interpreter: {baseline*1000:.0f} ms (subtracted below)")
+    date = datetime.datetime.now().isoformat(timespec="seconds")
+    commit = git_commit()
+    python = f"{sys.version_info.major}.{sys.version_info.minor}"
+    history = []
+    over_budget = []
+    failed = []
+
+    for module in args.modules:
+        times = [startup_seconds(module) for _ in range(args.runs)]
+        if any(t is None for t in times):
+            failed.append(module)
+            continue
+        median = statistics.median(times) - baseline
+        fastest = min(times) - baseline
+        print(f"{module:<28} median {median*1000:7.0f} ms   min {fastest*1000:7.0f} ms")
+        history.append([date, commit, python, module, args.runs, f"{median:.4f}", f"{fastest:.4f}", f"{baseline:.4f}"])
+        if args.budget is not None and median > args.budget:
+            over_budget.append(module)
+
+    if history and args.history:
+        append_history(history)
+        print(f"appended to {os.path.relpath(HISTORY_PATH, ROOT)}")
+
+    if failed:
+        print(f"failed to start: {', '.join(failed)}")
+    if over_budget:
+        print(f"over the {args.budget} s budget: {', '.join(over_budget)}")
+    if failed or over_budget:
+        sys.exit(1)
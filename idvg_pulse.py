@@ -3,15 +3,13 @@ import time
 import csv
 import os
 import json
-import pandas as pd
 import numpy as np
 from PyQt5.QtWidgets import QApplication, QWidget, QVBoxLayout, QLabel
 from PyQt5.QtCore import QThread, pyqtSignal
-from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
-from matplotlib.figure import Figure
 
 from keithley.keithley import Keithley2636B
 from LabAuto.laser_remote import LaserController
+from LabAuto.power_table import load_power_table
 
 from pathlib import Path
 
@@ -96,6 +94,17 @@ class AutoIdVgWorker(QThread):
                 self.status_update.emit(params["label"])
                 self.new_sweep.emit(step_idx, params["label"])
 
+                ### Prepare Light (if specified): wavelength / power are queued now, the laser PC
+                # applies them during the dark waits below (light still off), only the switch on is left after them
+                if params.get("laser_settings") and laser:
+                    laser_settings = params["laser_settings"]
+                    power_table = load_power_table(Path("calibration") / "pp_df.csv")
+                    pp = get_pp_exact(power_table, int(laser_settings['wavelength']), int(laser_settings['power']))
+                    cmd = {"channel": laser_settings['channel'], "wavelength": laser_settings['wavelength'], "power": pp}
+                    current_channel = cmd["channel"]
+                    self.status_update.emit("Configuring Laser")
+                    laser.send_cmd(cmd, wait_for_reply=False)
+
                 wait_time = params.get("wait_time", 0)
                 if wait_time > 0:
                     for i in range(wait_time, 0, -1):
@@ -117,18 +126,10 @@ class AutoIdVgWorker(QThread):
                             self.status_update.emit(f"Depleting at {dep_v}V for {i}s")
                             time.sleep(1)
 
-                ### Prepare Light (if specified)
-                if params.get("laser_settings") and laser:
-                    laser_settings = params["laser_settings"]
-                    power_table = pd.read_csv(Path("calibration") / "pp_df.csv", index_col=0)
-                    pp = get_pp_exact(power_table, int(laser_settings['wavelength']), int(laser_settings['power']))
-                    cmd = {"channel": laser_settings['channel'], "wavelength": laser_settings['wavelength'], "power": pp}
-                    current_channel = cmd["channel"]
-                    self.status_update.emit("Configuring Laser")
-                    laser.send_cmd(cmd, wait_for_reply=True)
-                    
+                ### Light ON (if specified)
+                if current_channel is not None:
                     self.status_update.emit("Turning Light ON...")
-                    laser.send_cmd({"channel": current_channel, "on": 1}, wait_for_reply=True)
+                    laser.send_cmd({"channel": current_channel, "set_on": 1}, wait_for_reply=True)
                     
                     laser_stable_time = int(params.get('laser_stable_time', 0))
                     for i in range(laser_stable_time, 0, -1):
@@ -182,7 +183,7 @@ class AutoIdVgWorker(QThread):
                 # --- Clean up step ---
                 if params.get('laser_settings') and laser and current_channel is not None:
                     self.status_update.emit(f"Sweep done. Turning OFF Laser Ch {current_channel}...")
-                    laser.send_cmd({"channel": current_channel, "on": 1}, wait_for_reply=True)
+                    laser.send_cmd({"channel": current_channel, "set_on": 0}, wait_for_reply=True)
                     current_channel = None
                     time.sleep(1)
                         
@@ -206,7 +207,7 @@ class AutoIdVgWorker(QThread):
                 
             if laser:
                 if current_channel is not None:
-                    laser.send_cmd({"channel": current_channel, "on": 1}, wait_for_reply=False)
+                    laser.send_cmd({"channel": current_channel, "set_on": 0}, wait_for_reply=False)
                 laser.close()
             if k:
                 k.shutdown()
@@ -232,7 +233,7 @@ class AutoIdVgWindow(QWidget):
         
         self.last_draw_time = time.time()
 
-        self._setup_ui()
+        self._setup_status()
         
         self.worker.new_sweep.connect(self.add_sweep_line)
         self.worker.new_data.connect(self.update_plot)
@@ -240,8 +241,9 @@ class AutoIdVgWindow(QWidget):
         self.worker.sequence_finished.connect(self.on_finished)
         
         self.worker.start()
+        self._setup_ui()
 
-    def _setup_ui(self):
+    def _setup_status(self):
         layout = QVBoxLayout()
         self.setLayout(layout)
 
@@ -249,6 +251,13 @@ class AutoIdVgWindow(QWidget):
         self.status_label.setStyleSheet("color: blue; font-size: 14px; font-weight: bold;")
         layout.addWidget(self.status_label)
 
+    def _setup_ui(self):
+        # matplotlib (Qt backend) is only imported here, the worker is already
+        # connecting to the instruments meanwhile (its signals wait for the event loop)
+        from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
+        from matplotlib.figure import Figure
+        layout = self.layout()
+
         self.figure = Figure(figsize=(8, 6))
         self.canvas = FigureCanvas(self.figure)
         layout.addWidget(self.canvas)
@@ -1,19 +1,228 @@
+import argparse
+import threading
 import time
-from LabAuto.laser import init_AOTF, get_coord, change_power_function, move_and_click, press_on_button, change_lambda_function
+from LabAuto.aotf_backend import GUIBackend, SimulatedBackend
+from LabAuto.laser_state import AOTFState
+from LabAuto.laser_schedule import ScheduleRunner
+from LabAuto.profiler import PROFILER
+from LabAuto.wait import get_wait_stats, reset_wait_stats
 from LabAuto.network import create_server, Connection
 
-def run_laser_server(host="0.0.0.0", port=5001):
-    grid = init_AOTF()
-    server_socket = create_server(host, port)
-    
+def apply_field(backend, state, channel, field, value):
+    """
+    Set one field of one channel through the backend, unless it already has this value.
+    field: "wavelength", "power" or "on" (value 0/1 for "on")
+    Returns "applied" or "skipped".
+    """
+    if not state.needs_change(channel, field, value):
+        return "skipped"
+    with PROFILER.phase(f"backend.{field}"):
+        if field == "wavelength":
+            state.invalidate(channel, field)
+            backend.set_wavelength(channel, value)
+        elif field == "power":
+            state.invalidate(channel, field)
+            backend.set_power(channel, value)
+        else:
+            backend.set_on(channel, bool(int(value)))
+    state.update(channel, field, value)
+    return "applied"
+
+def apply_command(backend, state, data):
+    """
+    Apply one laser command, skipping everything the channel already has.
+    - wavelength / power: only typed into the popup if the value changed.
+    - set_on: 0/1, idempotent. Only clicks the ON button if the state changes.
+    - on: legacy toggle (old clients send {"on": 1} for both ON and OFF).
+    Returns (applied, skipped): lists of field names.
+    """
+    applied, skipped = [], []
+    channel_recv = data.get("channel")
+    # FIXED BUG: Used 'is not None' because Channel 0 evaluates to False in standard 'if' statements!
+    if channel_recv is None:
+        return applied, skipped
+    channel = int(channel_recv)
+
+    requested = [("wavelength", data.get("wavelength")), ("power", data.get("power"))]
+    if data.get("set_on") is not None:
+        requested.append(("on", data.get("set_on")))
+    elif data.get("on") is not None:
+        requested.append(("on", int(not state.get(channel, "on"))))
+
+    for field, value in requested:
+        if value is None:
+            continue
+        if apply_field(backend, state, channel, field, value) == "applied":
+            applied.append(field)
+        else:
+            skipped.append(field)
+
+    return applied, skipped
+
+def plan_batch(items):
+    """
+    Turn a list of per-channel commands into the cheapest order of GUI operations.
+    - a later item overrides an earlier one for the same channel/field (only the last value is typed).
+    - outputs switched OFF first, so no wrong light is emitted while other channels change.
+    - then wavelength/power popups channel by channel from the top row to the bottom row
+      (the lambda and power buttons of a row are next to each other: short pointer moves).
+    - outputs switched ON last, when their wavelength/power are already correct.
+    Inside a batch "on" and "set_on" both mean set (not toggle).
+    Returns (operations, superseded):
+        operations: list of (channel, field, value, [item indices])
+        superseded: list of (item index, field) that were overridden by a later item
+    """
+    final = {} # (channel, field) -> (value, [item indices])
+    superseded = []
+    for idx, item in enumerate(items):
+        if item.get("channel") is None:
+            continue
+        channel = int(item["channel"])
+        on_value = item.get("set_on", item.get("on"))
+        for field, value in (("wavelength", item.get("wavelength")), ("power", item.get("power")), ("on", on_value)):
+            if value is None:
+                continue
+            key = (channel, field)
+            if key in final:
+                for old_idx in final[key][1]:
+                    superseded.append((old_idx, field))
+            final[key] = (value, [idx])
+
+    def op(key):
+        value, indices = final[key]
+        return (key[0], key[1], value, indices)
+
+    channels = sorted({ch for ch, _ in final})
+    offs = [op((ch, "on")) for ch in channels if (ch, "on") in final and not int(final[(ch, "on")][0])]
+    edits = [op((ch, field)) for ch in channels for field in ("wavelength", "power") if (ch, field) in final]
+    ons = [op((ch, "on")) for ch in channels if (ch, "on") in final and int(final[(ch, "on")][0])]
+    return offs + edits + ons, superseded
+
+def apply_batch(backend, state, items):
+    """
+    Apply a list of channel commands in one go (see plan_batch for the order).
+    Stops at the first GUI error, the remaining operations are reported as "not_run".
+    Returns the reply: {"response": "ACK"/"ERROR", "results": [per item {"channel", "applied", "skipped", ...}]}
+    """
+    results = [{"channel": item.get("channel"), "applied": [], "skipped": [], "superseded": [], "not_run": []} for item in items]
+    operations, superseded = plan_batch(items)
+    for idx, field in superseded:
+        results[idx]["superseded"].append(field)
+
+    error = None
+    for channel, field, value, indices in operations:
+        if error is not None:
+            for idx in indices:
+                results[idx]["not_run"].append(field)
+            continue
+        try:
+            outcome = apply_field(backend, state, channel, field, value)
+        except Exception as e:
+            error = f"channel {channel} {field}: {e}"
+            for idx in indices:
+                results[idx]["error"] = str(e)
+            continue
+        for idx in indices:
+            results[idx][outcome].append(field)
+
+    if error is not None:
+        return {"response": "ERROR", "message": error, "results": results}
+    return {"response": "ACK", "results": results}
+
+def handle_state_command(state, data):
+    """
+    Commands that only touch the state cache / statistics (no GUI clicks).
+    - {"cmd": "STATS", "reset": false}: rolling latency histograms of every phase (LabAuto.profiler).
+    - {"cmd": "STATE"}: reply with the cached state of every channel.
+    - {"cmd": "RESET_STATE", "channel": 3}: forget the cache (channel optional),
+      use it after changing the AOTF GUI by hand.
+    """
+    cmd = data.get("cmd")
+    if cmd == "STATS":
+        # per-phase latency of the GUI automation + actual duration of every wait
+        reply = {"response": "STATS", "stats": PROFILER.stats(), "waits": get_wait_stats()}
+        if data.get("reset"):
+            PROFILER.reset()
+            reset_wait_stats()
+        return reply
+    if cmd == "STATE":
+        return {"response": "STATE", "state": state.snapshot()}
+    if cmd == "RESET_STATE":
+        state.reset(data.get("channel"))
+        return {"response": "ACK", "state": state.snapshot()}
+    return {"response": "ERROR", "message": f"Invalid command: {cmd}"}
+
+SCHEDULE_COMMANDS = ("TIME", "SCHEDULE_REPORT", "SCHEDULE_CANCEL")
+
+def start_schedule(schedules, schedule, execute):
+    """
+    Start an uploaded light schedule in the background.
+    schedule: {"events": [{"t": .., "channel": .., ...}], "start_at": epoch} or "start_in": seconds from now
+    schedules: dict schedule_id -> ScheduleRunner of this server
+    """
+    if schedule.get("start_at") is not None:
+        start_at = float(schedule["start_at"])
+    else:
+        start_at = time.time() + float(schedule.get("start_in", 0.0))
+    schedule_id = len(schedules) + 1
+    schedules[schedule_id] = ScheduleRunner(schedule_id, schedule["events"], start_at, execute).start()
+    late = time.time() - start_at
+    if late > 0:
+        print(f"Schedule {schedule_id} received {late:.3f}s after its start time, first events will be late.")
+    return {"response": "ACK", "schedule_id": schedule_id, "start_at": start_at, "n_events": len(schedule["events"])}
+
+def handle_schedule_command(schedules, data):
+    """
+    - {"cmd": "TIME"}: laser PC clock, used by the client to convert its start time.
+    - {"cmd": "SCHEDULE_REPORT", "schedule_id": n, "wait": true, "timeout": 60}: planned vs actual edge times.
+    - {"cmd": "SCHEDULE_CANCEL", "schedule_id": n}: stop before the remaining events.
+    schedule_id defaults to the last uploaded schedule.
+    """
+    cmd = data.get("cmd")
+    if cmd == "TIME":
+        return {"response": "TIME", "time": time.time()}
+
+    schedule_id = data.get("schedule_id", len(schedules))
+    runner = schedules.get(schedule_id)
+    if runner is None:
+        return {"response": "ERROR", "message": f"Unknown schedule: {schedule_id}"}
+    if cmd == "SCHEDULE_CANCEL":
+        runner.cancel()
+        runner.wait(timeout=5.0)
+    elif data.get("wait"):
+        runner.wait(timeout=data.get("timeout"))
+    return {"response": "SCHEDULE_REPORT", "report": runner.report()}
+
+def run_laser_server(host="0.0.0.0", port=5001, backend=None, server_socket=None):
+    """
+    backend: AOTFBackend, default GUIBackend (the real AOTF Controller window).
+    server_socket: already listening socket (optional, see start_simulated_server).
+    """
+    if backend is None:
+        backend = GUIBackend()
+    backend.init()
+    state = AOTFState(n_channels=backend.n_channels)
+    if server_socket is None:
+        server_socket = create_server(host, port)
+
+    # schedules run in their own threads: one GUI/backend operation at a time
+    lock = threading.Lock()
+    schedules = {}
+
+    def execute_locked(event):
+        with lock:
+            applied, skipped = apply_command(backend, state, event)
+        return {"applied": applied, "skipped": skipped}
+
     try:
         # OUTER LOOP: Keeps the server alive forever
         while True:
             print("\nWaiting for Electrical Computer to connect...")
-            grid = init_AOTF()
+            with lock:
+                backend.init()
             conn, addr = Connection.accept(server_socket)
             print(f"Connected to client at {addr}")
-            
+
             try:
                 # INNER LOOP: Handles the active connection
                 while True:
@@ -22,41 +231,78 @@ def run_laser_server(host="0.0.0.0", port=5001):
                     except Exception as e:
                         print(f"Electrical computer disconnected (Receive Error): {e}")
                         break # Break inner loop, go back to waiting for new connection
-                    
+
                     if not data:
                         continue
-                        
-                    channel_recv = data.get("channel")
-                    wavelength_recv = data.get("wavelength")
-                    power_recv = data.get("power")
-                    on_recv = data.get("on")
-                    
+
+                    # every reply inside the try: a bad message (or a failed send) drops its client, not the server
                     try:
-                        # FIXED BUG: Used 'is not None' because Channel 0 evaluates to False in standard 'if' statements!
-                        if channel_recv is not None and wavelength_recv is not None: 
-                            change_lambda_function(grid, int(channel_recv), str(wavelength_recv))
-                            time.sleep(1)
-                            
-                        if channel_recv is not None and power_recv is not None:
-                            change_power_function(grid, int(channel_recv), str(power_recv))
-                            time.sleep(1)
-                            
-                        if channel_recv is not None and on_recv is not None:
-                            press_on_button(grid, int(channel_recv))
-                            
-                        # Tell the Electrical Computer we are finished clicking
-                        conn.send_json({"response": "ACK"})
-                        
+                        if data.get("cmd") in SCHEDULE_COMMANDS:
+                            conn.send_json(handle_schedule_command(schedules, data))
+
+                        elif data.get("cmd") == "REINIT":
+                            # full re-initialization of the AOTF window (ignores the cached grid)
+                            with lock:
+                                backend.init(force=True)
+                            conn.send_json({"response": "ACK"})
+
+                        elif "cmd" in data:
+                            conn.send_json(handle_state_command(state, data))
+
+                        elif "schedule" in data:
+                            conn.send_json(start_schedule(schedules, data["schedule"], execute_locked))
+
+                        elif "batch" in data:
+                            with lock:
+                                reply = apply_batch(backend, state, data["batch"])
+                            conn.send_json(reply)
+                            if reply["response"] == "ERROR":
+                                print(f"Error during batch GUI automation: {reply['message']}")
+                                break # Drop this connection, same as a failed single command
+
+                        else:
+                            with lock, PROFILER.phase("command.total"):
+                                applied, skipped = apply_command(backend, state, data)
+                            if skipped:
+                                print(f"Channel {data.get('channel')}: already set, skipped {skipped}")
+
+                            # Tell the Electrical Computer we are finished clicking
+                            with PROFILER.phase("ack"):
+                                conn.send_json({"response": "ACK", "applied": applied, "skipped": skipped})
+
                     except Exception as e:
-                        print(f"Error during GUI automation or sending ACK: {e}")
+                        print(f"Error during GUI automation or sending the reply: {e}")
                         break # Drop this broken connection, go back to waiting
 
             finally:
                 conn.close()
                 print("Connection closed. Laser staying in last known state.")
-                
+
     finally:
         server_socket.close()
 
+def start_simulated_server(host="127.0.0.1", port=5001, latency=None, jitter=0.0):
+    """
+    Run a laser server with a SimulatedBackend in a background thread of this process.
+    The socket is listening when this returns, so a LaserController can connect right away.
+    Returns the SimulatedBackend (e.g. for pm.sim_power.SimulatedPowerMeter).
+    """
+    backend = SimulatedBackend(latency=latency, jitter=jitter)
+    server_socket = create_server(host, port)
+    t = threading.Thread(target=run_laser_server, args=(host, port, backend, server_socket), daemon=True)
+    t.start()
+    return backend
+
 if __name__ == "__main__":
-    run_laser_server()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="AOTF laser server")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=5001)
+    parser.add_argument("--sim", action="store_true", help="use the simulated AOTF instead of the GUI")
+    parser.add_argument("--latency", type=float, default=None, help="simulated seconds per wavelength/power change")
+    args = parser.parse_args()
+
+    if args.sim:
+        latency = None if args.latency is None else {"wavelength": args.latency, "power": args.latency}
+        run_laser_server(args.host, args.port, backend=SimulatedBackend(latency=latency))
+    else:
+        run_laser_server(args.host, args.port)
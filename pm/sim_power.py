@@ -0,0 +1,48 @@
+import time
+import numpy as np
+
+class SimulatedPowerMeter():
+    """
+    Drop-in replacement of pm.power.PowerMeter that reads the optical power
+    of a LabAuto.aotf_backend.SimulatedBackend (no PM100D / pyvisa needed).
+    """
+    def __init__(self, backend, noise=0.01, seed=None):
+        """
+        backend : SimulatedBackend that produces the light
+        noise : float, relative gaussian noise of every reading
+        """
+        self.backend = backend
+        self.noise = noise
+        self.rng = np.random.default_rng(seed)
+        self.wavelength = None
+        self.offset = 0.0
+
+    def config_meter(self, wavelength, average_count):
+        self.wavelength = wavelength
+
+    def zero_sensor(self):
+        print("Zeroing simulated sensor...")
+        self.offset = 0.0
+        print("Zeroing complete.")
+
+    def read_power(self):
+        power = self.backend.optical_power(self.wavelength)
+        return power * (1 + self.noise * self.rng.standard_normal()) - self.offset
+
+    def measure_power(self, measure_interval=0.2, num_points=10):
+        time_array = np.zeros(num_points)
+        power_array = np.zeros(num_points)
+
+        t0 = time.perf_counter()
+
+        for i in range(num_points):
+            time_array[i] = time.perf_counter() - t0
+            power_array[i] = self.read_power()
+
+            if i < num_points - 1:
+                time.sleep(measure_interval)
+
+        return time_array, power_array
+
+    def close_meter(self):
+        pass
@@ -1,10 +1,9 @@
-from pm.power import PowerMeter
-import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 import time
 import json
 import os
+import argparse
 from pathlib import Path
 from LabAuto.laser_remote import LaserController
 
@@ -20,7 +19,8 @@ def find_pp_for_target_power(laser,
                              pp_min=1, 
                              pp_max=150, 
                              tolerance=2 * 1e-9, 
-                             max_iter=10):
+                             max_iter=10,
+                             settle_time=1):
     
     pm.config_meter(wavelength, average_count)
 
@@ -32,22 +32,22 @@ def find_pp_for_target_power(laser,
     channel = str(channel) 
     
     laser.send_cmd({"channel": channel, "wavelength": wavelength}, wait_for_reply=True)
-    time.sleep(1)
+    time.sleep(settle_time)
 
     for _ in range(max_iter):
         
         mid = (low + high) / 2 
         print(f'target power = {target_power * 1e+9:.3f} nW')
-        laser.send_cmd({"channel": channel, "power": mid, "on": 1}, wait_for_reply=True)
-        time.sleep(1)
+        laser.send_cmd({"channel": channel, "power": mid, "set_on": 1}, wait_for_reply=True)
+        time.sleep(settle_time)
 
         _, p = pm.measure_power(measure_interval, num_points) 
         measured_power = np.mean(p[-3:])   
         print(f'measured power = {measured_power * 1e+9:.3f} nW')
         if abs(measured_power - target_power) <= tolerance:
             best_pp = mid
-            laser.send_cmd({"channel": channel, "on": 1}, wait_for_reply=True)
-            time.sleep(1)
+            laser.send_cmd({"channel": channel, "set_on": 0}, wait_for_reply=True)
+            time.sleep(settle_time)
             break
 
         if measured_power > target_power:
@@ -57,13 +57,17 @@ def find_pp_for_target_power(laser,
 
         best_pp = mid
 
-        laser.send_cmd({"channel": channel, "on": 1}, wait_for_reply=True)
-        time.sleep(1)
+        laser.send_cmd({"channel": channel, "set_on": 0}, wait_for_reply=True)
+        time.sleep(settle_time)
 
     return best_pp, measured_power
 
 
-def multi_power_multi_wavelength(laser, channel_arr, wavelength_arr, power_arr):
+def multi_power_multi_wavelength(laser, channel_arr, wavelength_arr, power_arr, pm=None, settle_time=1):
+    """
+    pm: power meter, default the real PM100D (pm.power.PowerMeter).
+        Pass a pm.sim_power.SimulatedPowerMeter to calibrate against the simulated AOTF.
+    """
 
     n_wavelength = len(wavelength_arr)
     n_power = len(power_arr)
@@ -74,7 +78,9 @@ def multi_power_multi_wavelength(laser, channel_arr, wavelength_arr, power_arr):
     # --- MODIFIED: Sort powers ascending to allow dynamic bounding ---
     sorted_powers = sorted(power_arr)
 
-    pm = PowerMeter()
+    if pm is None:
+        from pm.power import PowerMeter
+        pm = PowerMeter()
     try:
         pm.zero_sensor() 
         for i, wavelength in enumerate(wavelength_arr):
@@ -89,7 +95,8 @@ def multi_power_multi_wavelength(laser, channel_arr, wavelength_arr, power_arr):
                 # Pass the dynamic current_pp_min instead of a hardcoded 1
                 pp, measured_power = find_pp_for_target_power(
                     laser=laser, pm=pm, channel=channel, target_power=target_power, 
-                    wavelength=wavelength, pp_min=current_pp_min, pp_max=150
+                    wavelength=wavelength, pp_min=current_pp_min, pp_max=150,
+                    settle_time=settle_time
                 )
                 
                 # --- OPTIMIZATION: Update the minimum bound for the next target power ---
@@ -125,7 +132,23 @@ def multi_power_multi_wavelength(laser, channel_arr, wavelength_arr, power_arr):
 
 
 if __name__ == "__main__":
-    LIGHT_IP = "10.0.0.2" 
+    parser = argparse.ArgumentParser(description="pp calibration of the AOTF with the power meter")
+    parser.add_argument("--sim", action="store_true", help="calibrate the simulated AOTF (no laser PC, no power meter)")
+    args = parser.parse_args()
+
+    pm = None
+    settle_time = 1
+    output_prefix = ""
+    if args.sim:
+        from laser_control import start_simulated_server
+        from pm.sim_power import SimulatedPowerMeter
+        backend = start_simulated_server("127.0.0.1", 5001)
+        pm = SimulatedPowerMeter(backend)
+        LIGHT_IP = "127.0.0.1"
+        settle_time = 0
+        output_prefix = "sim_" # never overwrite the real calibration
+    else:
+        LIGHT_IP = "10.0.0.2" 
     print("Connecting to Laser PC...")
     laser = LaserController(LIGHT_IP, 5001)
     print("Laser connected.")
@@ -137,11 +160,11 @@ if __name__ == "__main__":
     channel_arr = parameters["channel_arr"] 
     power_arr = parameters["power_arr"] 
 
-    pp_df, measured_power_df = multi_power_multi_wavelength(laser, channel_arr, wavelength_arr, power_arr)
+    pp_df, measured_power_df = multi_power_multi_wavelength(laser, channel_arr, wavelength_arr, power_arr, pm=pm, settle_time=settle_time)
     
     os.makedirs("calibration", exist_ok=True)
-    pp_df.to_csv(Path("calibration") / Path('pp_df.csv'), index=True)
-    measured_power_df.to_csv(Path("calibration") / Path('measured_power_df.csv'), index=True)
+    pp_df.to_csv(Path("calibration") / Path(f'{output_prefix}pp_df.csv'), index=True)
+    measured_power_df.to_csv(Path("calibration") / Path(f'{output_prefix}measured_power_df.csv'), index=True)
     
     laser.close()
     print("Laser closed")
\ No newline at end of file
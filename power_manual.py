@@ -38,7 +38,7 @@ def find_pp_for_target_power(laser,
         
         mid = (low + high) / 2 
         print(f'target power = {target_power * 1e+9:.3f} nW')
-        laser.send_cmd({"channel": channel, "power": mid, "on": 1}, wait_for_reply=True)
+        laser.send_cmd({"channel": channel, "power": mid, "set_on": 1}, wait_for_reply=True)
         time.sleep(1)
 
         _, p = pm.measure_power(measure_interval, num_points) 
@@ -46,7 +46,7 @@ def find_pp_for_target_power(laser,
         print(f'measured power = {measured_power * 1e+9:.3f} nW')
         if abs(measured_power - target_power) <= tolerance:
             best_pp = mid
-            laser.send_cmd({"channel": channel, "on": 1}, wait_for_reply=True)
+            laser.send_cmd({"channel": channel, "set_on": 0}, wait_for_reply=True)
             time.sleep(1)
             break
 
@@ -57,7 +57,7 @@ def find_pp_for_target_power(laser,
 
         best_pp = mid
 
-        laser.send_cmd({"channel": channel, "on": 1}, wait_for_reply=True)
+        laser.send_cmd({"channel": channel, "set_on": 0}, wait_for_reply=True)
         time.sleep(1)
 
     return best_pp, measured_power
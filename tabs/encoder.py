@@ -1,7 +1,9 @@
 import streamlit as st
 import json
 from pathlib import Path
-from tabs.helper import launch_in_terminal
+from tabs.helper import launch_in_terminal, show_plan
+from LabAuto.line_codes import LINE_CODES
+from LabAuto.sequences import encode_sequence
 
 def render_encoder_tab():
     st.markdown("Transmit custom ASCII messages or binary sequences using your laser and Keithley to test optical communication.")
@@ -12,8 +14,9 @@ def render_encoder_tab():
         "enc_wait_time": 5, "enc_current_limit_a": 1e-3, "enc_current_limit_b": 1e-3, 
         "enc_current_range_a": 1e-5, "enc_current_range_b": 1e-5,
         "enc_nplc_a": 1.0, "enc_nplc_b": 1.0, "enc_vd_const": 1.0, "enc_vg_on": 1.0, "enc_vg_off": -1.0,
-        "enc_binary_string": "01001000", "enc_bit_duration": 1.0,
-        "enc_raw_message": "Hi"  # <--- NEW: Add this line!
+        "enc_binary_string": "01001000", "enc_bit_duration": 1.0, "enc_line_code": "rz",
+        "enc_raw_message": "Hi",  # <--- NEW: Add this line!
+        "enc_laser_schedule": False
     }
 
     for k, v in default_cfg.items():
@@ -84,10 +87,13 @@ def render_encoder_tab():
             st.caption(f"⚠️ *Filtered invalid characters. Actually transmitting:* `{final_bin}`")
             
     col_e2.number_input("Bit Duration (s)", step=0.1, key="enc_bit_duration")
+    # rz: 4 bit durations per bit; the other codes send one light level per bit duration (LabAuto.line_codes)
+    col_e2.selectbox("Line Code", ["rz", *LINE_CODES], key="enc_line_code")
     
-    # Calculate Total Expected Time
-    # 1.5 multiplier accounts for the Return-to-Zero rest period
-    total_time = len(final_bin) * (st.session_state["enc_bit_duration"] * 1.5) + 10 
+    # Calculate Total Expected Time from the sequence that will run
+    timing_params = {"line_code": st.session_state["enc_line_code"], "bit_duration": st.session_state["enc_bit_duration"],
+                     "binary_string": final_bin, "vg_on": 0.0, "vg_off": 0.0}
+    total_time = sum(step["duration"] for step in encode_sequence(timing_params, None))
     st.info(f"⏱️ **Estimated Transmission Time:** ~{total_time:.1f} seconds")
 
     st.divider()
@@ -126,6 +132,7 @@ def render_encoder_tab():
     col4.text_input("Wavelength (nm)", key="enc_wavelength_str")
     col5.text_input("Channel", key="enc_channel_str")
     col6.text_input("Power (nW)", key="enc_power_str")
+    st.checkbox("Run light timeline on the laser PC (upload schedule, no network lag on ON/OFF edges)", key="enc_laser_schedule")
 
     st.divider()
 
@@ -165,6 +172,8 @@ def render_encoder_tab():
                     "raw_message": st.session_state.get("enc_raw_message", ""),
                     "binary_string": final_bin, # Write the active binary string!
                     "bit_duration": st.session_state["enc_bit_duration"], 
+                    "line_code": st.session_state["enc_line_code"],
+                    "laser_schedule": st.session_state["enc_laser_schedule"],
                     "wait_time": st.session_state["enc_wait_time"]
                 }
                 
@@ -186,6 +195,7 @@ def render_encoder_tab():
 
     with col_btn2:
         st.markdown("**Run Keithley Measurement**")
+        show_plan("time_dep_servo_encode_app.py", Path("config") / "FORMAL_time_dependent_config_encode_app.json")
         if st.button("▶ Run Encoder in Terminal", type="secondary", use_container_width=True, key="enc_run_btn"):
             success, msg = launch_in_terminal("time_dep_servo_encode_app.py")
             if success: st.success(msg)
@@ -2,6 +2,26 @@ import os
 import subprocess 
 import sys
 import platform
+from pathlib import Path
+import streamlit as st
+from LabAuto.warm_pool import WarmPool
+from LabAuto.planner import History, plan_queue, format_duration, format_size
+
+DATA_DIR = Path("data")
+
+# pre-warmed interpreters (heavy imports already loaded), started from the sidebar of app2.py.
+# module level: kept across Streamlit reruns of the page.
+WARM_POOL = None
+
+def set_warm_start(enabled, size=1):
+    """Start / stop the pool of warm interpreters used by launch_in_terminal."""
+    global WARM_POOL
+    if enabled and WARM_POOL is None:
+        WARM_POOL = WarmPool(size=size)
+        WARM_POOL.start()
+    elif not enabled and WARM_POOL is not None:
+        WARM_POOL.close()
+        WARM_POOL = None
 
 def launch_in_terminal(script_name):
     """Launches a given Python script in a new OS-level terminal window."""
@@ -10,6 +30,11 @@ def launch_in_terminal(script_name):
     
     current_dir = os.getcwd()
     try:
+        if WARM_POOL is not None:
+            # the warm worker already has its own console (Windows) and the imports done
+            WARM_POOL.run(script_name)
+            return True, f"🚀 Started {script_name} in a warm interpreter!"
+
         if platform.system() == "Windows":
             command = f'start cmd /K "{sys.executable} {script_name}"'
             subprocess.Popen(command, shell=True)
@@ -29,3 +54,25 @@ def launch_in_terminal(script_name):
             return False, "Opening a new terminal is currently only supported on Windows and Mac."
     except Exception as e:
         return False, f"Failed to launch script: {e}"
+
+@st.cache_resource(max_entries=1, show_spinner=False)
+def _load_history(data_mtime):
+    """History of the runs in data/, parsed again only when data_mtime changes (a run added its files)."""
+    return History(DATA_DIR)
+
+def run_history():
+    """History shared by every rerun and tab, instead of parsing every _timing.json on each widget change."""
+    return _load_history(DATA_DIR.stat().st_mtime if DATA_DIR.is_dir() else None)
+
+def show_plan(script_name, config_path):
+    """Estimated duration, samples and csv size of a saved config (LabAuto.planner), under the Run button."""
+    try:
+        plan = plan_queue(script_name, [config_path], history=run_history())
+    except FileNotFoundError:
+        st.caption("Save the config to see how long it takes.")
+        return
+    except (KeyError, ValueError, TypeError) as e:
+        st.caption(f"No estimate: {e}")
+        return
+    source = "" if plan["history"] else " (default latencies, no earlier runs in data/)"
+    st.caption(f"⏱ ~{format_duration(plan['duration'])} · {plan['samples']:,} samples · {format_size(plan['bytes'])}{source}")
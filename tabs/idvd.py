@@ -1,7 +1,7 @@
 import streamlit as st
 import json
 from pathlib import Path
-from tabs.helper import launch_in_terminal
+from tabs.helper import launch_in_terminal, show_plan
 
 def render_idvd_tab():
     st.markdown("Configure and run your Id-Vd output characteristic sweeps.")
@@ -165,6 +165,7 @@ def render_idvd_tab():
 
     with col_btn2:
         st.markdown("**Run Keithley Measurement**")
+        show_plan("idvd.py", Path("config") / "FORMAL_idvd_config_app.json")
         if st.button("▶ Run idvd.py in Terminal", type="secondary", use_container_width=True, key="idvd_run_btn"):
             # Update this to run idvd.py instead of idvg.py
             success, msg = launch_in_terminal("idvd.py")
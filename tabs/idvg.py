@@ -1,7 +1,7 @@
 import streamlit as st
 import json
 from pathlib import Path
-from tabs.helper import launch_in_terminal
+from tabs.helper import launch_in_terminal, show_plan
 
 def render_idvg_tab():
     st.markdown("Configure and run your Id-Vg transfer characteristic sweeps.")
@@ -171,6 +171,7 @@ def render_idvg_tab():
             ("idvg.py", "idvg_pulse.py"), 
             label_visibility="collapsed"
         )
+        show_plan(script_to_run, Path("config") / "FORMAL_idvg_config_app.json")
         if st.button("▶ Run idvg.py in Terminal", type="secondary", use_container_width=True, key="idvg_run_btn"):
             success, msg = launch_in_terminal(script_to_run)
             if success: st.success(msg)
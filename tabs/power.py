@@ -1,7 +1,5 @@
 import streamlit as st
 import json
-import pandas as pd
-import numpy as np
 # import matplotlib.pyplot as plt
 from pathlib import Path
 from tabs.helper import launch_in_terminal
@@ -64,6 +62,7 @@ def render_power_tab():
         pass 
 
     data_col1, data_col2, data_col3 = st.columns(3)
+    import pandas as pd  # only needed from here on (deferred, see benchmarks/startup.py)
     
     with data_col1:
         st.markdown("**1. `pp_df.csv` (Percent Power)**")
@@ -1,7 +1,7 @@
 import streamlit as st
 import json
 from pathlib import Path
-from tabs.helper import launch_in_terminal
+from tabs.helper import launch_in_terminal, show_plan
 
 def render_vg_pulse_tab():
     st.markdown("Configure Time-Dependent sequences using ultra-fast $V_G$ pulses to prevent charge trapping.")
@@ -176,6 +176,7 @@ def render_vg_pulse_tab():
             ("time_dep_dark_pulse_app.py", "time_dep_servo_pulse_app.py"), 
             label_visibility="collapsed"
         )
+        show_plan(script_to_run, Path("config") / "FORMAL_time_dependent_config_pulse_app.json")
         if st.button("▶ Run Script in Terminal", type="secondary", use_container_width=True, key="td_pulse_run"):
             success, msg = launch_in_terminal(script_to_run)
             if success: st.success(msg)
@@ -1,7 +1,7 @@
 import streamlit as st
 import json
 from pathlib import Path
-from tabs.helper import launch_in_terminal
+from tabs.helper import launch_in_terminal, show_plan
 
 def render_time_dependent_tab():
     st.markdown("Load an existing config, tweak your parameters, and launch the measurement.")
@@ -13,7 +13,8 @@ def render_time_dependent_tab():
         "current_limit_a": 0.001, "current_limit_b": 0.001, "current_range_a": 1e-05, "current_range_b": 1e-05,
         "nplc_a": 1.0, "nplc_b": 1.0, "vd_const": 2.0, "vg_on": 1.0, "vg_off": -1.0,
         "duration_1": 5.0, "duration_2": 5.0, "duration_3": 5.0, "duration_4": 5.0,
-        "cycle_number": 5, "on_off_number": 3, "servo_time": 20.0
+        "cycle_number": 5, "on_off_number": 3, "servo_time": 20.0,
+        "laser_schedule": False
     }
 
     # Load standard defaults on the very first run
@@ -115,6 +116,7 @@ def render_time_dependent_tab():
     col5.number_input("Cycle Number", min_value=1, step=1, key="cycle_number")
     col6.number_input("ON/OFF Number", min_value=1, step=1, key="on_off_number")
     col7.number_input("Servo Time (s)", step=0.5, key="servo_time")
+    st.checkbox("Run light timeline on the laser PC (upload schedule, no network lag on ON/OFF edges)", key="laser_schedule")
 
     st.divider()
 
@@ -157,6 +159,7 @@ def render_time_dependent_tab():
                     "cycle_number": st.session_state["cycle_number"],
                     "on_off_number": st.session_state["on_off_number"],
                     "servo_time": st.session_state["servo_time"],
+                    "laser_schedule": st.session_state["laser_schedule"],
                     "wait_time": st.session_state["wait_time"]
                 }
                 
@@ -186,6 +189,7 @@ def render_time_dependent_tab():
             ("time_dep_app.py", "time_dep_servo_app.py", "time_dep_dark_app.py", "time_dep_servo_pulse_app.py"), 
             label_visibility="collapsed"
         )
+        show_plan(script_to_run, Path("config") / "FORMAL_time_dependent_config_app.json")
         if st.button("▶ Run Script in Terminal", type="secondary", use_container_width=True, key="td_run"):
             success, msg = launch_in_terminal(script_to_run)
             if success: st.success(msg)
@@ -3,12 +3,12 @@ import numpy as np
 import time
 import json
 import os
+import argparse
 from pathlib import Path
 
-from pm.power import PowerMeter
 from LabAuto.laser_remote import LaserController
 
-def verify_pp_table(laser, pm, config_path, pp_df_path):
+def verify_pp_table(laser, pm, config_path, pp_df_path, settle_time=1):
     # 1. Load the configuration to get the channel mapping
     with open(config_path, "r") as f:
         parameters = json.load(f)
@@ -38,15 +38,15 @@ def verify_pp_table(laser, pm, config_path, pp_df_path):
             
             # Tell the laser to switch to this wavelength
             laser.send_cmd({"channel": channel, "wavelength": wavelength}, wait_for_reply=True)
-            time.sleep(1)
+            time.sleep(settle_time)
             
             for j, target_power_str in enumerate(target_powers):
                 # Grab the calculated PP from the dataframe
                 pp = float(pp_df.loc[wavelength, target_power_str])
                 
                 # Send the specific PP to the laser and turn it on
-                laser.send_cmd({"channel": channel, "power": pp, "on": 1}, wait_for_reply=True)
-                time.sleep(1) # Give the AOTF a moment to stabilize
+                laser.send_cmd({"channel": channel, "power": pp, "set_on": 1}, wait_for_reply=True)
+                time.sleep(settle_time) # Give the AOTF a moment to stabilize
                 
                 # Measure the optical power
                 _, p = pm.measure_power(measure_interval=0.2, num_points=10)
@@ -56,8 +56,8 @@ def verify_pp_table(laser, pm, config_path, pp_df_path):
                 
                 print(f"Target: {target_power_str:>5} nW | Used PP: {pp:>6.2f}% | Actual: {measured_power_nw:>8.2f} nW")
 
-                laser.send_cmd({"channel": channel, "on": 1}, wait_for_reply=True)
-                time.sleep(1)
+                laser.send_cmd({"channel": channel, "set_on": 0}, wait_for_reply=True)
+                time.sleep(settle_time)
                 
 
     finally:
@@ -75,21 +75,39 @@ def verify_pp_table(laser, pm, config_path, pp_df_path):
 
 
 if __name__ == "__main__":
-    LIGHT_IP = "10.0.0.2" 
-    
+    parser = argparse.ArgumentParser(description="verify the pp table with the power meter")
+    parser.add_argument("--sim", action="store_true", help="verify against the simulated AOTF (uses calibration/sim_pp_df.csv)")
+    args = parser.parse_args()
+
     config_path = Path("config") / "power_config.json"
-    pp_df_path = Path("calibration") / "pp_df.csv"
-    output_path = Path("calibration") / "verified_power_df.csv"
+    settle_time = 1
+
+    if args.sim:
+        from laser_control import start_simulated_server
+        from pm.sim_power import SimulatedPowerMeter
+        backend = start_simulated_server("127.0.0.1", 5001)
+        LIGHT_IP = "127.0.0.1"
+        pp_df_path = Path("calibration") / "sim_pp_df.csv"
+        output_path = Path("calibration") / "sim_verified_power_df.csv"
+        settle_time = 0
+    else:
+        LIGHT_IP = "10.0.0.2" 
+        pp_df_path = Path("calibration") / "pp_df.csv"
+        output_path = Path("calibration") / "verified_power_df.csv"
     
     print("Connecting to Laser PC...")
     laser = LaserController(LIGHT_IP, 5001)
     print("Laser connected.")
     
-    pm = PowerMeter()
+    if args.sim:
+        pm = SimulatedPowerMeter(backend)
+    else:
+        from pm.power import PowerMeter
+        pm = PowerMeter()
     
     try:
         # Run the verification routine
-        verified_df = verify_pp_table(laser, pm, config_path, pp_df_path)
+        verified_df = verify_pp_table(laser, pm, config_path, pp_df_path, settle_time=settle_time)
         
         # Save the results
         os.makedirs("calibration", exist_ok=True)